@@ -0,0 +1,329 @@
+"""
+Пакетный (колоночный) движок генерации датасета на NumPy.
+
+Вместо построчной генерации в generate_dataset каждая колонка
+разыгрывается сразу для целого блока строк (специалисты, смещения
+дат визита и анализов, банки, платёжные системы и цифры карт).
+Блок хранится в целочисленных кодах (rows.RowBlock) и превращается
+в строки вывода только при сериализации.
+"""
+from typing import List, Dict, Iterator
+
+import numpy as np
+
+from main import (
+    bank_names, painment_system_names, DEFAULT_STREAM_CHUNK_ROWS, PASSPORT_SPACE, SNILS_SPACE, MAX_SYMPTOMS, MAX_ANALYSES,
+    build_fio_samplers, build_price_maps, decode_passport_batch, format_snils_batch
+)
+from samplers import SubsetSampler, harmonic_sampler
+from worktime import Schedule, default_schedule
+from registry import PatientRegistry, suggest_spread_days
+from unique import UniqueIdSource
+from cards import ACCOUNT_SPACE, BinTable, default_bin_table, card_numbers_batch
+from rows import RowBlock, RowVocabulary
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+class BatchEngine:
+    """
+    Предвычисленные таблицы для пакетной генерации.
+    Строится один раз на набор справочников и весов, после чего
+    генерирует блоки строк любого размера.
+    """
+
+    def __init__(
+        self,
+        specialists_list: List[str],
+        symptoms_dict: Dict[str, List[str]],
+        analyses_with_prices_dict: Dict[str, List[tuple]],
+        bank_weights: dict = None,
+        pay_system_weights: dict = None,
+        schedule: Schedule = None,
+        card_ids: UniqueIdSource = None,
+        bin_table: BinTable = None
+    ):
+        if bank_weights is None:
+            bank_weights = {b: 1 for b in bank_names}
+        if pay_system_weights is None:
+            pay_system_weights = {ps: 1 for ps in painment_system_names}
+
+        self.specialists = list(specialists_list)
+        # Первая специальность - самая популярная (веса 1/(i+1))
+        self.specialist_sampler = harmonic_sampler(self.specialists)
+        # Рабочий календарь визитов и анализов
+        self.schedule = schedule if schedule is not None else default_schedule()
+
+        # Совместная выборка префиксов карт по весам банков и платёжных систем
+        self.bin_table = bin_table if bin_table is not None else default_bin_table()
+
+        # Коды симптомов и анализов и цены анализов в копейках по специальностям
+        self.vocabulary = RowVocabulary(self.specialists, symptoms_dict, analyses_with_prices_dict,
+                                        self.bin_table.prefixes)
+        price_maps = build_price_maps(analyses_with_prices_dict)
+        self.price_kopecks = [
+            [int(round(price_maps[spec][item[0]] * 100)) for item in analyses_with_prices_dict.get(spec, [])]
+            for spec in self.specialists
+        ]
+        # Общие пулы кодов (группа - специальность) для векторного выбора наборов
+        self.symptom_subsets = SubsetSampler.from_groups(self.vocabulary.symptom_codes, MAX_SYMPTOMS)
+        self.analysis_subsets = SubsetSampler.from_groups(self.vocabulary.analysis_codes, MAX_ANALYSES)
+        self.symptom_pool = np.array([c for codes in self.vocabulary.symptom_codes for c in codes], dtype=np.int16)
+        self.analysis_pool = np.array([c for codes in self.vocabulary.analysis_codes for c in codes], dtype=np.int16)
+        self.price_pool = np.array([p for prices in self.price_kopecks for p in prices], dtype=np.int64)
+        self.card_sampler = self.bin_table.joint_sampler(bank_weights, pay_system_weights)
+        # Источник уникальных номеров счетов карт (создаётся при первом блоке, если не передан)
+        self.card_ids = card_ids
+
+    def card_numbers(self, card_prefix: np.ndarray, card_account: np.ndarray) -> List[str]:
+        return card_numbers_batch(self.bin_table.prefixes, card_prefix, card_account)
+
+    def draw_card_columns(self, n: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """
+        Префикс (индекс в таблице BIN) и уникальный номер счёта для n новых карт
+        """
+        if self.card_ids is None:
+            self.card_ids = UniqueIdSource(ACCOUNT_SPACE, keys=rng.integers(0, 2 ** 63, size=4).tolist())
+        return {
+            'card_prefix': self.card_sampler.sample_indices(n, rng),
+            'card_account': self.card_ids.next_batch(n),
+        }
+
+    def draw_columns(self, n: int, personal_count: int, rng: np.random.Generator,
+                     registry: PatientRegistry = None) -> Dict[str, np.ndarray]:
+        """
+        Разыгрывает все числовые колонки блока из n строк одним проходом.
+        С реестром пациентов пациент, даты и карта берутся из его состояния.
+        """
+        specialist = self.specialist_sampler.sample_indices(n, rng)
+
+        if registry is not None:
+            columns = registry.assign(specialist, self.specialists, rng)
+            columns['specialist'] = specialist
+            # Номера для карт, впервые выданных в этом блоке
+            pending = registry.pending_cards
+            if pending:
+                new_cards = self.draw_card_columns(pending, rng)
+                registry.add_cards(columns, new_cards['card_prefix'], new_cards['card_account'])
+            return columns
+
+        person = rng.integers(0, personal_count, size=n)
+
+        # Визит - рабочий слот 2025 года, анализ - рабочий слот через 24-72 часа
+        visit, analysis = self.schedule.draw_batch(specialist, self.specialists, rng)
+
+        columns = {
+            'person': person,
+            'specialist': specialist,
+            'visit': visit,
+            'analysis': analysis,
+        }
+        columns.update(self.draw_card_columns(n, rng))
+        return columns
+
+    def draw_block(self, columns: Dict[str, np.ndarray], rng: np.random.Generator) -> RowBlock:
+        """
+        Разыгрывает наборы симптомов и анализов и собирает блок в целочисленных кодах
+        """
+        # Наборы симптомов и анализов разной длины - сразу для всего блока (CSR)
+        specialist = columns['specialist']
+        symptom_offsets, symptom_idx = self.symptom_subsets.sample(specialist, rng)
+        analysis_offsets, analysis_idx = self.analysis_subsets.sample(specialist, rng)
+        # Стоимость строки - сумма цен её анализов (разность накопленных сумм)
+        price_sums = np.zeros(len(analysis_idx) + 1, dtype=np.int64)
+        np.cumsum(self.price_pool[analysis_idx], out=price_sums[1:])
+        cost_kopecks = price_sums[analysis_offsets[1:]] - price_sums[analysis_offsets[:-1]]
+
+        return RowBlock(
+            self.vocabulary,
+            person=columns['person'].astype(np.int32),
+            specialist=specialist.astype(np.int16),
+            symptom_offsets=symptom_offsets.astype(np.int32),
+            symptom_codes=self.symptom_pool[symptom_idx],
+            visit=columns['visit'].astype(np.int32),
+            analysis_offsets=analysis_offsets.astype(np.int32),
+            analysis_codes=self.analysis_pool[analysis_idx],
+            analysis=columns['analysis'].astype(np.int32),
+            cost_kopecks=cost_kopecks,
+            card_prefix=columns['card_prefix'].astype(np.int16),
+            card_account=columns['card_account'],
+        )
+
+    def format_rows(
+        self,
+        columns: Dict[str, np.ndarray],
+        personal_data: List[List[str]],
+        rng: np.random.Generator
+    ) -> List[List[str]]:
+        """
+        Превращает колонки блока в строки вывода
+        """
+        return self.draw_block(columns, rng).to_rows(personal_data)
+
+    def iter_blocks(
+        self,
+        n: int,
+        personal_count: int,
+        chunk_size: int = DEFAULT_STREAM_CHUNK_ROWS,
+        rng: np.random.Generator = None,
+        registry: PatientRegistry = None
+    ) -> Iterator[RowBlock]:
+        """
+        Выдаёт датасет блоками RowBlock (целочисленные коды) не больше chunk_size строк
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        if registry is not None and len(registry) != personal_count:
+            raise ValueError("Размер реестра не совпадает с количеством пациентов")
+        for start in range(0, n, chunk_size):
+            size = min(chunk_size, n - start)
+            columns = self.draw_columns(size, personal_count, rng, registry)
+            yield self.draw_block(columns, rng)
+
+    def iter_chunks(
+        self,
+        n: int,
+        personal_data: List[List[str]],
+        chunk_size: int = DEFAULT_STREAM_CHUNK_ROWS,
+        rng: np.random.Generator = None,
+        registry: PatientRegistry = None
+    ) -> Iterator[List[List[str]]]:
+        """
+        Выдаёт датасет блоками не больше chunk_size строк.
+        registry: реестр пациентов для согласованных повторных визитов и карт
+        """
+        for block in self.iter_blocks(n, len(personal_data), chunk_size, rng, registry):
+            yield block.to_rows(personal_data)
+
+    def generate(
+        self,
+        n: int,
+        personal_data: List[List[str]],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        rng: np.random.Generator = None
+    ) -> List[List[str]]:
+        dataset = []
+        for chunk in self.iter_chunks(n, personal_data, chunk_size, rng):
+            dataset.extend(chunk)
+        return dataset
+
+
+def generate_personal_data_batch(
+    amount: int,
+    names_dict,
+    surnames_dict,
+    patronymics_dict,
+    seed=None,
+    rng: np.random.Generator = None,
+    passport_ids: UniqueIdSource = None,
+    snils_ids: UniqueIdSource = None,
+    snils_format: str = 'plain',
+    fio_samplers: Dict = None
+) -> List[List[str]]:
+    """
+    Пакетный аналог create_personal_data: ФИО разыгрываются выборками по полу,
+    паспорта и СНИЛС - целыми массивами уникальных идентификаторов,
+    контрольные числа СНИЛС считаются векторно.
+    Возвращает список списков: [ ФИО ; паспорт ; СНИЛС ]
+    """
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    if passport_ids is None:
+        passport_ids = UniqueIdSource(PASSPORT_SPACE, keys=rng.integers(0, 2 ** 63, size=4).tolist())
+    if snils_ids is None:
+        snils_ids = UniqueIdSource(SNILS_SPACE, keys=rng.integers(0, 2 ** 63, size=4).tolist())
+
+    samplers = fio_samplers if fio_samplers is not None else build_fio_samplers(names_dict, surnames_dict, patronymics_dict)
+    names = samplers["names"]
+    name_idx = names.sampler.sample_indices(amount, rng)
+    genders = np.array(names.genders, dtype=object)[name_idx]
+
+    surnames = np.full(amount, "", dtype=object)
+    patronymics = np.full(amount, "", dtype=object)
+    for gender in names.by_gender:
+        mask = genders == gender
+        count = int(mask.sum())
+        if gender in samplers["surnames"]:
+            surnames[mask] = samplers["surnames"][gender].sample(count, rng)
+        if gender in samplers["patronymics"]:
+            patronymics[mask] = samplers["patronymics"][gender].sample(count, rng)
+
+    name_values = names.sampler.values
+    fio = [f"{s} {name_values[n]} {p}" for s, n, p in zip(surnames.tolist(), name_idx.tolist(), patronymics.tolist())]
+    passports = decode_passport_batch(passport_ids.next_batch(amount))
+    snils = format_snils_batch(snils_ids.next_batch(amount), snils_format)
+    return [list(row) for row in zip(fio, passports, snils)]
+
+
+def generate_dataset_batch(
+    n: int,
+    specialists_list: List[str],
+    symptoms_dict: Dict[str, List[str]],
+    analyses_with_prices_dict: Dict[str, List[tuple]],
+    personal_data: List[List[str]],
+    bank_weights: dict = None,
+    pay_system_weights: dict = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    seed=None,
+    schedule: Schedule = None
+) -> List[List[str]]:
+    """
+    Аналог generate_dataset на пакетном движке: тот же формат строк,
+    но колонки разыгрываются блоками по chunk_size строк
+    """
+    engine = BatchEngine(specialists_list, symptoms_dict, analyses_with_prices_dict,
+                         bank_weights, pay_system_weights, schedule)
+    return engine.generate(n, personal_data, chunk_size, np.random.default_rng(seed))
+
+
+def iter_dataset_blocks(
+    n: int,
+    specialists_list: List[str],
+    symptoms_dict: Dict[str, List[str]],
+    analyses_with_prices_dict: Dict[str, List[tuple]],
+    personal_count: int,
+    bank_weights: dict = None,
+    pay_system_weights: dict = None,
+    chunk_size: int = DEFAULT_STREAM_CHUNK_ROWS,
+    seed=None,
+    schedule: Schedule = None,
+    consistent: bool = False
+) -> Iterator[RowBlock]:
+    """
+    Потоковый режим пакетного движка в целочисленных кодах: блоки RowBlock
+    для personal_count пациентов (для колоночного экспорта, см. columnar.py).
+    Параметры - как у iter_dataset_chunks; одинаковый сид даёт те же строки.
+    """
+    engine = BatchEngine(specialists_list, symptoms_dict, analyses_with_prices_dict,
+                         bank_weights, pay_system_weights, schedule)
+    registry = None
+    if consistent:
+        registry = PatientRegistry(personal_count, engine.schedule,
+                                   spread_days=suggest_spread_days(personal_count, n))
+    return engine.iter_blocks(n, personal_count, chunk_size, np.random.default_rng(seed), registry)
+
+
+def iter_dataset_chunks(
+    n: int,
+    specialists_list: List[str],
+    symptoms_dict: Dict[str, List[str]],
+    analyses_with_prices_dict: Dict[str, List[tuple]],
+    personal_data: List[List[str]],
+    bank_weights: dict = None,
+    pay_system_weights: dict = None,
+    chunk_size: int = DEFAULT_STREAM_CHUNK_ROWS,
+    seed=None,
+    schedule: Schedule = None,
+    consistent: bool = False
+) -> Iterator[List[List[str]]]:
+    """
+    Потоковый режим пакетного движка: генератор блоков строк для write_csv_stream.
+    Память ограничена одним блоком независимо от n.
+    seed: сид numpy-генератора; одинаковый сид даёт одинаковый датасет
+    consistent: вести реестр пациентов (повторные визиты не раньше чем через 24 ч
+    после анализов, одна карта на пациента, не больше 5 оплат картой)
+    """
+    blocks = iter_dataset_blocks(n, specialists_list, symptoms_dict, analyses_with_prices_dict,
+                                 len(personal_data), bank_weights, pay_system_weights, chunk_size,
+                                 seed, schedule, consistent)
+    return (block.to_rows(personal_data) for block in blocks)
@@ -0,0 +1,533 @@
+"""
+Замеры производительности генератора по этапам.
+
+Каждый этап (справочники, персональные данные, ФИО, даты, карты,
+сборка строк, запись CSV) замеряется на нескольких масштабах
+в скалярной и пакетной реализации. Результат - строк в секунду
+и пиковая память - сохраняется в JSON, чтобы сравнивать прогоны
+между собой (--compare).
+
+Пример:
+    python bench.py --scales 10000 1000000 --profile output/profiles -o output/bench.json
+
+Каждый замер по умолчанию выполняется в отдельном процессе: пиковая
+память (RSS) тогда относится к одному этапу, а не ко всему прогону.
+"""
+import argparse
+import cProfile
+import json
+import os
+import platform
+import pstats
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from main import (
+    DEFAULT_STREAM_CHUNK_ROWS, PASSPORT_SPACE, SNILS_SPACE, bank_names, painment_system_names, create_personal_data, generate_fio,
+    generate_visit_and_analysis_datetimes, generate_one_card_2, iter_dataset_rows, write_into_csv_file
+)
+from batch import BatchEngine, generate_personal_data_batch, iter_dataset_chunks
+from reference import CACHE_PATH, DATA_DIR, ReferenceData, load_reference
+from worktime import default_schedule, format_minutes_batch
+from cards import ACCOUNT_SPACE
+from unique import UniqueIdSource, memory_report
+from writers import write_csv_fast
+
+try:
+    import resource
+except ImportError:
+    # В Windows модуля resource нет - пиковая память не измеряется
+    resource = None
+
+DEFAULT_SCALES = (10_000, 1_000_000, 10_000_000)
+
+# Скалярные реализации выше этого масштаба пропускаются (10 млн строк - десятки минут)
+DEFAULT_MAX_SCALAR_ROWS = 1_000_000
+
+# Пациентов в пуле для сборки строк и строк в пуле для замеров записи
+PERSONAL_POOL_ROWS = 100_000
+WRITE_POOL_ROWS = 100_000
+
+# Строк профиля cProfile в JSON (полный профиль - в файле .prof)
+PROFILE_TOP = 15
+
+# Пространства идентификаторов для --id-memory
+ID_SPACES = {'passport': PASSPORT_SPACE, 'snils': SNILS_SPACE, 'card_account': ACCOUNT_SPACE}
+
+
+class BenchContext:
+    """
+    Общие параметры замеров: справочники, сид, каталог временных файлов
+    """
+    __slots__ = ('reference', 'seed', 'tmp_dir', 'chunk_size')
+
+    def __init__(self, reference: ReferenceData, seed: int, tmp_dir: str, chunk_size: int = DEFAULT_STREAM_CHUNK_ROWS):
+        self.reference = reference
+        self.seed = seed
+        self.tmp_dir = tmp_dir
+        self.chunk_size = chunk_size
+
+    def chunk_sizes(self, n: int):
+        for start in range(0, n, self.chunk_size):
+            yield min(self.chunk_size, n - start)
+
+    def personal_pool(self, n: int) -> List[List[str]]:
+        reference = self.reference
+        return generate_personal_data_batch(
+            max(1, min(n // 10, PERSONAL_POOL_ROWS)), reference.names_dict, reference.surnames_dict,
+            reference.patronymics_dict, seed=self.seed, fio_samplers=reference.fio_samplers
+        )
+
+    def row_pool(self, n: int) -> List[List[str]]:
+        reference = self.reference
+        rows = []
+        for chunk in iter_dataset_chunks(
+            min(n, WRITE_POOL_ROWS), reference.specialists_list, reference.symptoms_dict,
+            reference.analyses_with_prices_dict, self.personal_pool(n), seed=self.seed, consistent=True
+        ):
+            rows.extend(chunk)
+        return rows
+
+    def engine(self) -> BatchEngine:
+        reference = self.reference
+        return BatchEngine(reference.specialists_list, reference.symptoms_dict, reference.analyses_with_prices_dict,
+                           bin_table=reference.bin_table)
+
+
+# Этап замера: prepare(n, ctx) готовит данные (не замеряется) и возвращает
+# функцию без аргументов, которая выполняет этап и возвращает количество строк.
+
+def _reference_parse(n: int, ctx: BenchContext) -> Callable[[], int]:
+    def run():
+        load_reference(ctx.reference.data_dir, use_cache=False)
+        return 0
+    return run
+
+
+def _reference_cache(n: int, ctx: BenchContext) -> Callable[[], int]:
+    # Первый вызов создаёт кэш, если его нет
+    load_reference(ctx.reference.data_dir, ctx.reference.cache_path)
+
+    def run():
+        load_reference(ctx.reference.data_dir, ctx.reference.cache_path)
+        return 0
+    return run
+
+
+def _personal_data_scalar(n: int, ctx: BenchContext) -> Callable[[], int]:
+    reference = ctx.reference
+
+    def run():
+        return len(create_personal_data(n, reference.names_dict, reference.surnames_dict, reference.patronymics_dict,
+                                        seed=ctx.seed, fio_samplers=reference.fio_samplers))
+    return run
+
+
+def _personal_data_batch(n: int, ctx: BenchContext) -> Callable[[], int]:
+    reference = ctx.reference
+
+    def run():
+        return len(generate_personal_data_batch(n, reference.names_dict, reference.surnames_dict,
+                                                reference.patronymics_dict, seed=ctx.seed,
+                                                fio_samplers=reference.fio_samplers))
+    return run
+
+
+def _fio_scalar(n: int, ctx: BenchContext) -> Callable[[], int]:
+    reference = ctx.reference
+    names, surnames, patronymics = reference.names_dict, reference.surnames_dict, reference.patronymics_dict
+    samplers = reference.fio_samplers
+    rng = random.Random(ctx.seed)
+
+    def run():
+        for _ in range(n):
+            generate_fio(names, surnames, patronymics, samplers, rng)
+        return n
+    return run
+
+
+def _datetimes_scalar(n: int, ctx: BenchContext) -> Callable[[], int]:
+    rng = random.Random(ctx.seed)
+
+    def run():
+        for _ in range(n):
+            generate_visit_and_analysis_datetimes(rng)
+        return n
+    return run
+
+
+def _datetimes_batch(n: int, ctx: BenchContext) -> Callable[[], int]:
+    specialists = ctx.reference.specialists_list
+    sampler = ctx.reference.specialist_sampler
+    schedule = default_schedule()
+    rng = np.random.default_rng(ctx.seed)
+
+    def run():
+        for size in ctx.chunk_sizes(n):
+            visit, analysis = schedule.draw_batch(sampler.sample_indices(size, rng), specialists, rng)
+            format_minutes_batch(visit)
+            format_minutes_batch(analysis)
+        return n
+    return run
+
+
+def _cards_scalar(n: int, ctx: BenchContext) -> Callable[[], int]:
+    bank_weights = {b: 1 for b in bank_names}
+    pay_system_weights = {ps: 1 for ps in painment_system_names}
+    rng = random.Random(ctx.seed)
+    card_ids = UniqueIdSource(ACCOUNT_SPACE, rng=rng)
+
+    def run():
+        for _ in range(n):
+            generate_one_card_2(bank_weights, pay_system_weights, rng, card_ids)
+        return n
+    return run
+
+
+def _cards_batch(n: int, ctx: BenchContext) -> Callable[[], int]:
+    engine = ctx.engine()
+    rng = np.random.default_rng(ctx.seed)
+
+    def run():
+        for size in ctx.chunk_sizes(n):
+            columns = engine.draw_card_columns(size, rng)
+            engine.card_numbers(columns['card_prefix'], columns['card_account'])
+        return n
+    return run
+
+
+def _rows_scalar(n: int, ctx: BenchContext) -> Callable[[], int]:
+    reference = ctx.reference
+    personal_data = ctx.personal_pool(n)
+
+    def run():
+        rows = iter_dataset_rows(n, reference.specialists_list, reference.symptoms_dict,
+                                 reference.analyses_with_prices_dict, personal_data, seed=ctx.seed)
+        deque(rows, maxlen=0)
+        return n
+    return run
+
+
+def _rows_batch(n: int, ctx: BenchContext) -> Callable[[], int]:
+    reference = ctx.reference
+    personal_data = ctx.personal_pool(n)
+
+    def run():
+        chunks = iter_dataset_chunks(n, reference.specialists_list, reference.symptoms_dict,
+                                     reference.analyses_with_prices_dict, personal_data,
+                                     chunk_size=ctx.chunk_size, seed=ctx.seed, consistent=True)
+        return sum(len(chunk) for chunk in chunks)
+    return run
+
+
+def _rows_blocks(n: int, ctx: BenchContext) -> Callable[[], int]:
+    # Только целочисленные коды (RowBlock), без сборки строк вывода
+    engine = ctx.engine()
+    personal_count = len(ctx.personal_pool(n))
+
+    def run():
+        blocks = engine.iter_blocks(n, personal_count, ctx.chunk_size, np.random.default_rng(ctx.seed))
+        return sum(len(block) for block in blocks)
+    return run
+
+
+def _write_csv_module(n: int, ctx: BenchContext) -> Callable[[], int]:
+    pool = ctx.row_pool(n)
+    # Список ссылок на строки пула: данные n строк без n копий в памяти
+    data = (pool * -(-n // len(pool)))[:n]
+    path = os.path.join(ctx.tmp_dir, 'write_into_csv_file.csv')
+
+    def run():
+        if os.path.exists(path):
+            os.remove(path)
+        write_into_csv_file(data, path)
+        return n
+    return run
+
+
+def _write_fast(n: int, ctx: BenchContext) -> Callable[[], int]:
+    pool = ctx.row_pool(n)
+    path = os.path.join(ctx.tmp_dir, 'write_csv_fast.csv')
+
+    def chunks():
+        for size in ctx.chunk_sizes(n):
+            for start in range(0, size, len(pool)):
+                yield pool[:min(len(pool), size - start)]
+
+    def run():
+        return write_csv_fast(chunks(), path)
+    return run
+
+
+# (этап, реализация) -> (prepare, скалярная ли реализация, зависит ли от масштаба)
+STAGES = {
+    ('reference', 'parse'): (_reference_parse, False, False),
+    ('reference', 'cache'): (_reference_cache, False, False),
+    ('personal_data', 'scalar'): (_personal_data_scalar, True, True),
+    ('personal_data', 'batch'): (_personal_data_batch, False, True),
+    ('fio', 'scalar'): (_fio_scalar, True, True),
+    ('datetimes', 'scalar'): (_datetimes_scalar, True, True),
+    ('datetimes', 'batch'): (_datetimes_batch, False, True),
+    ('cards', 'scalar'): (_cards_scalar, True, True),
+    ('cards', 'batch'): (_cards_batch, False, True),
+    ('rows', 'scalar'): (_rows_scalar, True, True),
+    ('rows', 'batch'): (_rows_batch, False, True),
+    ('rows', 'blocks'): (_rows_blocks, False, True),
+    ('write', 'csv_module'): (_write_csv_module, False, True),
+    ('write', 'fast'): (_write_fast, False, True),
+}
+
+STAGE_NAMES = list(dict.fromkeys(stage for stage, _ in STAGES))
+
+
+def peak_rss() -> int:
+    """
+    Пиковая память (байт) текущего процесса или None, если измерить нельзя
+    """
+    if resource is None:
+        return None
+    # ru_maxrss - в килобайтах в Linux и в байтах в macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def profile_top(profiler: cProfile.Profile, limit: int = PROFILE_TOP) -> List[Dict]:
+    """
+    Самые дорогие функции профиля по суммарному времени (с вложенными вызовами)
+    """
+    stats = pstats.Stats(profiler).stats
+    top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            'function': f"{os.path.basename(filename)}:{line}({name})",
+            'calls': calls,
+            'tottime': round(tottime, 6),
+            'cumtime': round(cumtime, 6),
+        }
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in top
+    ]
+
+
+def measure(stage: str, impl: str, n: int, ctx: BenchContext, repeat: int = 1,
+            profile_dir: str = None, trace_memory: bool = False) -> Dict:
+    """
+    Один замер этапа: лучшее время из repeat запусков, пиковая память,
+    по запросу - профиль cProfile и пик выделений tracemalloc
+    """
+    prepare, _, scaled = STAGES[(stage, impl)]
+    run = prepare(n, ctx)
+    setup_rss = peak_rss()
+
+    profiler = cProfile.Profile() if profile_dir else None
+    if trace_memory:
+        tracemalloc.start()
+    best = None
+    rows = 0
+    for _ in range(max(1, repeat)):
+        if profiler is not None:
+            profiler.enable()
+        started = time.perf_counter()
+        rows = run()
+        elapsed = time.perf_counter() - started
+        if profiler is not None:
+            profiler.disable()
+        best = elapsed if best is None else min(best, elapsed)
+
+    result = {
+        'stage': stage,
+        'impl': impl,
+        'rows': n if scaled else None,
+        'seconds': round(best, 6),
+        'rows_per_second': round(rows / best, 1) if scaled and best > 0 else None,
+        'setup_rss_bytes': setup_rss,
+        'peak_rss_bytes': peak_rss(),
+    }
+    if trace_memory:
+        result['tracemalloc_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    if profiler is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+        suffix = f"-{n}" if scaled else ""
+        path = os.path.join(profile_dir, f"{stage}-{impl}{suffix}.prof")
+        profiler.dump_stats(path)
+        result['profile'] = path
+        result['profile_top'] = profile_top(profiler)
+    return result
+
+
+def plan(scales: List[int], stages: List[str], max_scalar_rows: int, include_scalar: bool = True) -> List[tuple]:
+    """
+    Список замеров (этап, реализация, строк) в порядке выполнения
+    """
+    runs = []
+    for (stage, impl), (_, scalar, scaled) in STAGES.items():
+        if stage not in stages or (scalar and not include_scalar):
+            continue
+        if not scaled:
+            runs.append((stage, impl, 0))
+            continue
+        for n in scales:
+            if scalar and n > max_scalar_rows:
+                continue
+            runs.append((stage, impl, n))
+    return runs
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+    }
+
+
+def format_result(result: Dict) -> str:
+    rows = f"{result['rows']:>10}" if result['rows'] is not None else f"{'-':>10}"
+    rate = f"{result['rows_per_second']:>14,.0f}".replace(',', ' ') if result['rows_per_second'] else f"{'-':>14}"
+    memory = f"{result['peak_rss_bytes'] / 2 ** 20:>8.0f} МБ" if result['peak_rss_bytes'] else f"{'-':>11}"
+    return f"{result['stage']:<14}{result['impl']:<12}{rows}{result['seconds']:>11.3f} с{rate} строк/с{memory}"
+
+
+def compare(results: List[Dict], baseline: List[Dict]) -> List[str]:
+    """
+    Ускорение относительно прежнего прогона для совпадающих замеров
+    """
+    previous = {(r['stage'], r['impl'], r['rows']): r for r in baseline}
+    lines = []
+    for result in results:
+        old = previous.get((result['stage'], result['impl'], result['rows']))
+        if old is None or not result['seconds']:
+            continue
+        lines.append(f"{result['stage']:<14}{result['impl']:<12}{str(result['rows'] or '-'):>10}"
+                     f"{old['seconds'] / result['seconds']:>8.2f}x")
+    return lines
+
+
+def id_memory(count: int) -> Dict[str, Dict[str, float]]:
+    """
+    Память под дедупликацию миллиона идентификаторов каждого пространства ID_SPACES
+    каждым способом (см. unique.memory_report)
+    """
+    return {name: memory_report(space, count) for name, space in ID_SPACES.items()}
+
+
+def format_id_memory(report: Dict[str, Dict[str, float]]) -> List[str]:
+    return [f"{name:<14}{mode:<12}{size / 2 ** 20:>10.1f} МБ на 1 млн"
+            for name, modes in report.items() for mode, size in modes.items()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Замеры производительности генератора по этапам")
+    parser.add_argument('--scales', type=int, nargs='+', default=list(DEFAULT_SCALES),
+                        help="количество строк в замерах (по умолчанию 10000 1000000 10000000)")
+    parser.add_argument('--stages', nargs='+', choices=STAGE_NAMES, default=STAGE_NAMES, help="замеряемые этапы")
+    parser.add_argument('--max-scalar-rows', type=int, default=DEFAULT_MAX_SCALAR_ROWS,
+                        help="наибольший масштаб для скалярных реализаций")
+    parser.add_argument('--no-scalar', action='store_true', help="замерять только пакетные реализации")
+    parser.add_argument('--repeat', type=int, default=1, help="запусков на замер (берётся лучшее время)")
+    parser.add_argument('--seed', type=int, default=42, help="сид генерации")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_STREAM_CHUNK_ROWS, help="строк в блоке генерации")
+    parser.add_argument('--profile', metavar='КАТАЛОГ', default=None,
+                        help="сохранять профиль cProfile каждого замера в каталог")
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="измерять пик выделений памяти через tracemalloc (замедляет замеры)")
+    parser.add_argument('--id-memory', type=int, nargs='?', const=1_000_000, default=None, metavar='N',
+                        help="замерить память под уникальность паспортов, СНИЛС и счетов карт "
+                             "(множество строится на N идентификаторах, по умолчанию 1000000)")
+    parser.add_argument('--in-process', action='store_true',
+                        help="все замеры в одном процессе (пиковая RSS тогда накапливается)")
+    parser.add_argument('-o', '--output', default=None,
+                        help="файл результатов JSON (по умолчанию output/bench_ДАТА.json)")
+    parser.add_argument('--compare', metavar='JSON', default=None, help="сравнить с результатами прежнего прогона")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="каталог справочников")
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if any(n < 1 for n in args.scales) or args.repeat < 1 or args.chunk_size < 1:
+        parser.error("scales, repeat и chunk-size должны быть положительными")
+    if args.id_memory is not None and args.id_memory < 1:
+        parser.error("--id-memory должен быть положительным")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+
+    runs = plan(sorted(set(args.scales)), args.stages, args.max_scalar_rows, not args.no_scalar)
+    tmp_dir = tempfile.mkdtemp(prefix='bench-')
+    ctx = BenchContext(ReferenceData(args.data_dir, CACHE_PATH), args.seed, tmp_dir, args.chunk_size)
+    results = []
+    try:
+        for stage, impl, n in runs:
+            task = (stage, impl, n, ctx, args.repeat, args.profile, args.tracemalloc)
+            if args.in_process:
+                result = measure(*task)
+            else:
+                # Новый процесс на каждый замер: пиковая память относится к одному этапу
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    result = executor.submit(measure, *task).result()
+            results.append(result)
+            print(format_result(result), flush=True)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    memory = None
+    if args.id_memory is not None:
+        memory = id_memory(args.id_memory)
+        print("\n".join(format_id_memory(memory)))
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'settings': {
+            'scales': sorted(set(args.scales)),
+            'max_scalar_rows': args.max_scalar_rows,
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'chunk_size': args.chunk_size,
+            'isolated': not args.in_process,
+            # С tracemalloc и cProfile время замеров завышено
+            'tracemalloc': args.tracemalloc,
+            'profile': args.profile is not None,
+        },
+        'results': results,
+    }
+    if memory is not None:
+        report['id_memory'] = memory
+    output = args.output or os.path.join('output', f"bench_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, mode='w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {output}")
+
+    if baseline is not None:
+        print("Ускорение относительно", args.compare)
+        print("\n".join(compare(results, baseline)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
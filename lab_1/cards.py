@@ -0,0 +1,171 @@
+"""
+Генерация номеров банковских карт по таблице BIN.
+
+Таблица data/card_bins.csv: банк;платёжная система;префикс (6 цифр);вес.
+Веса банков и платёжных систем переводятся в совместные веса префиксов
+один раз, после чего номера карт генерируются пачкой: префикс по таблице
+псевдонимов, 9 цифр номера счёта, контрольная цифра Луна.
+"""
+import os
+import random
+from functools import lru_cache
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+from samplers import AliasSampler
+
+DEFAULT_BIN_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'card_bins.csv')
+
+# Номер карты: 6 цифр BIN + 9 цифр счёта + контрольная цифра
+ACCOUNT_DIGITS = 9
+ACCOUNT_SPACE = 10 ** ACCOUNT_DIGITS
+CARD_DIGITS = 16
+
+
+class BinTable:
+    """
+    Таблица (банк, платёжная система) -> список префиксов с весами
+    """
+    __slots__ = ('banks', 'pay_systems', 'prefixes', 'bank_of', 'pay_system_of', 'weights')
+
+    def __init__(self, rows: List[Tuple[str, str, str, float]]):
+        if not rows:
+            raise ValueError("Таблица BIN пуста")
+        self.banks = sorted({row[0] for row in rows})
+        self.pay_systems = sorted({row[1] for row in rows})
+        self.prefixes = [row[2] for row in rows]
+        self.bank_of = np.array([self.banks.index(row[0]) for row in rows], dtype=np.int64)
+        self.pay_system_of = np.array([self.pay_systems.index(row[1]) for row in rows], dtype=np.int64)
+        self.weights = [row[3] for row in rows]
+
+    def __len__(self) -> int:
+        return len(self.prefixes)
+
+    def pair_of(self, i: int) -> Tuple[str, str]:
+        return self.banks[self.bank_of[i]], self.pay_systems[self.pay_system_of[i]]
+
+    def joint_weights(self, bank_weights: Dict[str, float], pay_system_weights: Dict[str, float]) -> List[float]:
+        """
+        Совместный вес каждого префикса: вес банка * вес платёжной системы *
+        доля префикса среди префиксов той же пары (банк, платёжная система)
+        """
+        pair_totals = {}
+        for i, weight in enumerate(self.weights):
+            pair = self.pair_of(i)
+            pair_totals[pair] = pair_totals.get(pair, 0.0) + weight
+
+        joint = []
+        for i, weight in enumerate(self.weights):
+            bank, pay_system = self.pair_of(i)
+            pair_weight = bank_weights.get(bank, 0) * pay_system_weights.get(pay_system, 0)
+            joint.append(pair_weight * weight / pair_totals[(bank, pay_system)])
+        return joint
+
+    def joint_sampler(self, bank_weights: Dict[str, float], pay_system_weights: Dict[str, float]) -> AliasSampler:
+        """
+        Выборка индексов префиксов по весам банков и платёжных систем
+        """
+        joint = self.joint_weights(bank_weights, pay_system_weights)
+        if sum(joint) <= 0:
+            raise ValueError("Ни один префикс карты не подходит под заданные веса банков и платёжных систем")
+        return AliasSampler(list(range(len(self.prefixes))), joint)
+
+
+def load_bin_table(path: str = DEFAULT_BIN_TABLE_PATH, delimiter: str = ';') -> BinTable:
+    rows = []
+    with open(path, mode='r', encoding='utf-8') as file:
+        for line in file:
+            parts = [part.strip() for part in line.split(delimiter)]
+            if len(parts) < 3 or not parts[0]:
+                continue
+            prefix = parts[2].replace(' ', '')
+            if len(prefix) != CARD_DIGITS - ACCOUNT_DIGITS - 1 or not prefix.isdigit():
+                raise ValueError(f"Некорректный BIN {parts[2]!r} в {path}")
+            weight = float(parts[3]) if len(parts) >= 4 and parts[3] else 1.0
+            rows.append((parts[0], parts[1], prefix, weight))
+    return BinTable(rows)
+
+
+@lru_cache(maxsize=None)
+def default_bin_table() -> BinTable:
+    return load_bin_table()
+
+
+def luhn_check_digit(payload: str) -> int:
+    """
+    Контрольная цифра Луна для строки цифр без контрольной цифры
+    """
+    total = 0
+    for i, ch in enumerate(reversed(payload)):
+        digit = int(ch)
+        if i % 2 == 0:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return (10 - total % 10) % 10
+
+
+def is_luhn_valid(number: str) -> bool:
+    digits = number.replace(' ', '')
+    return digits.isdigit() and luhn_check_digit(digits[:-1]) == int(digits[-1])
+
+
+def format_card_number(digits: str) -> str:
+    return f"{digits[0:4]} {digits[4:8]} {digits[8:12]} {digits[12:16]}"
+
+
+def card_number(prefix: str, account: int) -> str:
+    payload = f"{prefix}{account:0{ACCOUNT_DIGITS}d}"
+    return format_card_number(payload + str(luhn_check_digit(payload)))
+
+
+def card_numbers_batch(prefixes: List[str], prefix_idx: np.ndarray, accounts: np.ndarray) -> List[str]:
+    """
+    Номера карт пачкой: матрица цифр, контрольные цифры Луна одним
+    векторным проходом и форматирование "dddd dddd dddd dddd" через байтовое представление
+    """
+    n = len(prefix_idx)
+    prefix_digits = np.array([[int(ch) for ch in prefix] for prefix in prefixes], dtype=np.int64)
+
+    digits = np.empty((n, CARD_DIGITS), dtype=np.int64)
+    digits[:, :CARD_DIGITS - ACCOUNT_DIGITS - 1] = prefix_digits[prefix_idx]
+    powers = 10 ** np.arange(ACCOUNT_DIGITS - 1, -1, -1, dtype=np.int64)
+    digits[:, CARD_DIGITS - ACCOUNT_DIGITS - 1:-1] = (np.asarray(accounts, dtype=np.int64)[:, None] // powers) % 10
+
+    # Удваиваются цифры на чётных позициях слева (через одну от контрольной)
+    payload = digits[:, :-1]
+    doubled = payload[:, 0::2] * 2
+    doubled -= 9 * (doubled > 9)
+    total = doubled.sum(axis=1) + payload[:, 1::2].sum(axis=1)
+    digits[:, -1] = (10 - total % 10) % 10
+
+    chars = np.full((n, CARD_DIGITS + 3), ord(' '), dtype=np.uint8)
+    for group in range(4):
+        chars[:, group * 5:group * 5 + 4] = digits[:, group * 4:group * 4 + 4] + ord('0')
+    return [value.decode('ascii') for value in chars.view(f'S{CARD_DIGITS + 3}').ravel().tolist()]
+
+
+@lru_cache(maxsize=64)
+def _cached_joint_sampler(bank_items: tuple, pay_system_items: tuple) -> AliasSampler:
+    return default_bin_table().joint_sampler(dict(bank_items), dict(pay_system_items))
+
+
+def joint_card_sampler(bank_weights: Dict[str, float], pay_system_weights: Dict[str, float]) -> AliasSampler:
+    """
+    Совместная выборка префиксов для таблицы по умолчанию; кэшируется по набору весов
+    """
+    return _cached_joint_sampler(tuple(sorted(bank_weights.items())), tuple(sorted(pay_system_weights.items())))
+
+
+def draw_card_number(bank_weights: Dict[str, float], pay_system_weights: Dict[str, float], rng=random,
+                     card_ids=None) -> str:
+    """
+    Один номер карты по весам. card_ids - источник уникальных номеров счёта
+    (unique.UniqueIdSource над ACCOUNT_SPACE), общий для всех карт датасета;
+    без него номер счёта случайный и уникальность номеров не гарантируется.
+    """
+    prefix_idx = joint_card_sampler(bank_weights, pay_system_weights).draw(rng)
+    account = card_ids.next() if card_ids is not None else rng.randrange(ACCOUNT_SPACE)
+    return card_number(default_bin_table().prefixes[prefix_idx], account)
@@ -0,0 +1,246 @@
+"""
+Генерация с контрольными точками: продолжение прерванного запуска
+и дописывание строк в уже готовый датасет.
+
+Рядом с файлом результата ведётся небольшой JSON-файл контрольной
+точки (<файл>.checkpoint.json): параметры запуска, количество
+записанных строк, длина файла в байтах на этот момент, состояние
+генератора numpy и ключи источника номеров карт. Состояние реестра
+пациентов хранится отдельно в npz-файле, на который ссылается контрольная
+точка: компактные массивы по пациентам, без строк и номеров счетов карт
+(они выводятся из ключей и порядковых номеров выдачи).
+
+Контрольная точка пишется после блока строк, когда данные уже сброшены
+на диск, - по умолчанию не чаще раза в checkpoint_seconds секунд, чтобы
+запись реестра не стоила заметной доли времени генерации. При продолжении
+файл обрезается до сохранённой длины (недописанный блок отбрасывается),
+состояние восстанавливается и генерация идёт дальше с той же строки. Продолжение с тем же
+chunk_size даёт тот же файл, что и запуск без прерывания.
+"""
+import codecs
+import json
+import os
+import time
+from typing import Dict
+
+import numpy as np
+
+from main import CSV_HEADERS, DEFAULT_STREAM_CHUNK_ROWS
+from batch import BatchEngine, generate_personal_data_batch
+from registry import PatientRegistry, check_capacity, suggest_spread_days
+from unique import UniqueIdSource
+from cards import ACCOUNT_SPACE
+from reference import ReferenceData, default_reference
+from writers import BulkCsvWriter, DEFAULT_WRITE_BUFFER, infer_compression
+
+# Увеличивается при изменении формата контрольной точки
+CHECKPOINT_VERSION = 3
+
+CHECKPOINT_SUFFIX = '.checkpoint.json'
+
+# Интервал между контрольными точками по умолчанию, секунд
+DEFAULT_CHECKPOINT_SECONDS = 30.0
+
+
+def checkpoint_path(path: str) -> str:
+    return path + CHECKPOINT_SUFFIX
+
+
+def read_checkpoint(path: str) -> Dict:
+    """
+    Контрольная точка для файла результата path или None, если её нет
+    """
+    try:
+        with open(checkpoint_path(path), encoding='utf-8') as file:
+            state = json.load(file)
+    except FileNotFoundError:
+        return None
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия контрольной точки: {state.get('version')}")
+    return state
+
+
+def _replace_atomic(tmp_path: str, path: str):
+    with open(tmp_path, mode='rb') as file:
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_checkpoint(path: str, state: Dict, registry: PatientRegistry = None):
+    """
+    Атомарная запись контрольной точки: сначала реестр в новый npz-файл,
+    затем JSON со ссылкой на него; прежний npz удаляется последним
+    """
+    previous = read_checkpoint(path)
+    sidecar = checkpoint_path(path)
+    state = dict(state, version=CHECKPOINT_VERSION, registry=None)
+    if registry is not None:
+        # Имя с номером строки: сбой между записями не смешает реестр и JSON разных точек
+        state['registry'] = f"{os.path.basename(path)}.registry.{state['rows_written']}.npz"
+        registry_path = os.path.join(os.path.dirname(sidecar), state['registry'])
+        with open(registry_path + '.tmp', mode='wb') as file:
+            np.savez(file, **registry.state())
+        _replace_atomic(registry_path + '.tmp', registry_path)
+
+    with open(sidecar + '.tmp', mode='w', encoding='utf-8') as file:
+        json.dump(state, file, ensure_ascii=False, indent=1)
+    _replace_atomic(sidecar + '.tmp', sidecar)
+
+    if previous is not None and previous.get('registry') and previous['registry'] != state['registry']:
+        old_path = os.path.join(os.path.dirname(sidecar), previous['registry'])
+        if os.path.exists(old_path):
+            os.remove(old_path)
+
+
+def load_registry(path: str, state: Dict, schedule=None, account_of=None) -> PatientRegistry:
+    if not state.get('registry'):
+        return None
+    registry_path = os.path.join(os.path.dirname(checkpoint_path(path)), state['registry'])
+    with np.load(registry_path) as data:
+        return PatientRegistry.from_state({key: data[key] for key in data.files}, schedule, account_of)
+
+
+def remove_checkpoint(path: str):
+    """
+    Удаляет контрольную точку и файл реестра (например, когда дописывать датасет больше не нужно)
+    """
+    state = read_checkpoint(path)
+    if state is None:
+        return
+    if state.get('registry'):
+        registry_path = os.path.join(os.path.dirname(checkpoint_path(path)), state['registry'])
+        if os.path.exists(registry_path):
+            os.remove(registry_path)
+    os.remove(checkpoint_path(path))
+
+
+def generate_checkpointed(
+    n: int,
+    path: str = 'output/medical_dataset.csv',
+    people: int = None,
+    reference: ReferenceData = None,
+    bank_weights: dict = None,
+    pay_system_weights: dict = None,
+    seed: int = None,
+    chunk_size: int = DEFAULT_STREAM_CHUNK_ROWS,
+    consistent: bool = True,
+    snils_format: str = 'plain',
+    resume: bool = False,
+    checkpoint_every: int = None,
+    checkpoint_seconds: float = DEFAULT_CHECKPOINT_SECONDS,
+    on_chunk=None
+) -> int:
+    """
+    Генерация n строк в CSV path с контрольными точками: после каждых checkpoint_every
+    блоков, а без него - после первого блока, завершённого через checkpoint_seconds
+    секунд после предыдущей точки.
+    resume=True - продолжить по контрольной точке: прерванный запуск
+    дописывается с места остановки, завершённый - дополняется до n строк.
+    Параметры генерации при этом берутся из контрольной точки.
+    Персональные данные заново строятся из сохранённого сида, строки не перегенерируются.
+    Возвращает общее количество строк в файле.
+    """
+    if infer_compression(path) is not None:
+        raise ValueError("Контрольные точки поддерживаются только для несжатого CSV")
+    if checkpoint_every is not None and checkpoint_every < 1:
+        raise ValueError("checkpoint_every должен быть положительным")
+    if checkpoint_seconds < 0:
+        raise ValueError("checkpoint_seconds не может быть отрицательным")
+    reference = reference if reference is not None else default_reference()
+
+    state = read_checkpoint(path) if resume else None
+    if resume and state is None:
+        raise ValueError(f"Нет контрольной точки для {path}")
+    if state is not None:
+        if n < state['rows_written']:
+            raise ValueError(f"В файле уже {state['rows_written']} строк, запрошено {n}")
+        settings = state['settings']
+    else:
+        people = people if people is not None else max(1, n // 10)
+        settings = {
+            'people': people,
+            # Без сида сохраняется случайная энтропия - продолжение всё равно воспроизводимо
+            'entropy': np.random.SeedSequence(seed).entropy,
+            'chunk_size': chunk_size,
+            'consistent': consistent,
+            'snils_format': snils_format,
+            'bank_weights': bank_weights,
+            'pay_system_weights': pay_system_weights,
+            'spread_days': suggest_spread_days(people, n),
+        }
+    # До открытия файла: при дополнении до большего n реестр продолжает с тем же
+    # количеством пациентов, и отказ в середине генерации испортил бы готовый файл
+    if settings['consistent']:
+        check_capacity(settings['people'], n)
+
+    # Те же потоки сида, что и у cli.py: один сид - один датасет
+    personal_seed, rows_seed = np.random.SeedSequence(settings['entropy']).spawn(2)
+    personal_data = generate_personal_data_batch(
+        settings['people'], reference.names_dict, reference.surnames_dict, reference.patronymics_dict,
+        rng=np.random.default_rng(personal_seed), snils_format=settings['snils_format'],
+        fio_samplers=reference.fio_samplers
+    )
+    engine = BatchEngine(reference.specialists_list, reference.symptoms_dict, reference.analyses_with_prices_dict,
+                         settings['bank_weights'], settings['pay_system_weights'], bin_table=reference.bin_table)
+    rng = np.random.default_rng(rows_seed)
+
+    if state is None:
+        rows_written = 0
+        registry = None
+        if settings['consistent']:
+            registry = PatientRegistry(settings['people'], engine.schedule, spread_days=settings['spread_days'])
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file = open(path, mode='w+b', buffering=DEFAULT_WRITE_BUFFER)
+    else:
+        rows_written = state['rows_written']
+        rng.bit_generator.state = state['rng_state']
+        if state['card_ids'] is not None:
+            engine.card_ids = UniqueIdSource(ACCOUNT_SPACE, keys=state['card_ids']['keys'],
+                                             start=state['card_ids']['issued'])
+        # Номер счёта карты с номером выдачи c - значение перестановки источника в точке c
+        account_of = None if engine.card_ids is None else engine.card_ids.permutation.batch
+        registry = load_registry(path, state, engine.schedule, account_of)
+        file = open(path, mode='r+b', buffering=DEFAULT_WRITE_BUFFER)
+        # Строки, записанные после контрольной точки, отбрасываются
+        file.truncate(state['byte_offset'])
+        file.seek(state['byte_offset'])
+
+    def save():
+        file.flush()
+        os.fsync(file.fileno())
+        card_ids = engine.card_ids
+        write_checkpoint(path, {
+            'settings': settings,
+            'rows_written': rows_written,
+            'byte_offset': file.tell(),
+            'rng_state': rng.bit_generator.state,
+            'card_ids': None if card_ids is None else {
+                'keys': list(card_ids.permutation.keys), 'issued': card_ids.issued
+            },
+        }, registry)
+        return time.monotonic()
+
+    with file:
+        writer = BulkCsvWriter(file)
+        if state is None:
+            writer.write_bytes(codecs.BOM_UTF8)
+            writer.writerow(CSV_HEADERS)
+            last_saved = save()
+        else:
+            last_saved = time.monotonic()
+        blocks = engine.iter_blocks(n - rows_written, settings['people'], settings['chunk_size'], rng, registry)
+        for number, block in enumerate(blocks, start=1):
+            writer.writerows(block.to_rows(personal_data))
+            rows_written += len(block)
+            if checkpoint_every is not None:
+                due = number % checkpoint_every == 0
+            else:
+                due = time.monotonic() - last_saved >= checkpoint_seconds
+            if due:
+                last_saved = save()
+            if on_chunk is not None:
+                on_chunk(rows_written)
+        save()
+    return rows_written
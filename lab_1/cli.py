@@ -0,0 +1,232 @@
+"""
+Запуск генератора из командной строки (без графического интерфейса).
+
+Пример:
+    python cli.py --rows 1000000 --people 100000 --seed 42 --workers 4 -o output/medical_dataset.csv.gz
+
+По завершении печатается сводка: строк в секунду, МБ в секунду
+и пиковая память (RSS) основного и дочерних процессов.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+from main import bank_names, painment_system_names, parse_weights, DEFAULT_STREAM_CHUNK_ROWS
+from batch import iter_dataset_blocks, iter_dataset_chunks, generate_personal_data_batch
+from parallel import generate_dataset_parallel
+from checkpoint import DEFAULT_CHECKPOINT_SECONDS, generate_checkpointed
+from indexed import generate_indexed, read_settings
+from reference import ReferenceData, DATA_DIR
+from writers import write_csv_fast, infer_compression, COMPRESSIONS
+
+try:
+    import resource
+except ImportError:
+    # В Windows модуля resource нет - пиковая память не выводится
+    resource = None
+
+OUTPUT_FORMATS = ('csv', 'parquet', 'arrow', 'npy')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Генератор синтетического датасета визитов в платную поликлинику")
+    parser.add_argument('-n', '--rows', type=int, default=50_000, help="количество строк (по умолчанию 50000)")
+    parser.add_argument('--people', type=int, default=None, help="количество пациентов (по умолчанию rows / 10)")
+    parser.add_argument('--seed', type=int, default=None, help="сид для воспроизводимого датасета")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="количество процессов (больше 1 - шардовая генерация, только csv)")
+    parser.add_argument('--shards', type=int, default=None, help="количество шардов (по умолчанию = workers)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_STREAM_CHUNK_ROWS, help="строк в блоке генерации")
+    parser.add_argument('-o', '--output', default='output/medical_dataset.csv',
+                        help="файл результата (для npy - каталог)")
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default='csv', help="формат вывода")
+    parser.add_argument('--compression', choices=('infer', 'none') + tuple(COMPRESSIONS), default='infer',
+                        help="сжатие csv (infer - по расширению файла)")
+    parser.add_argument('--bank-weight', action='append', metavar='БАНК=ВЕС',
+                        help="вес банка, можно указать несколько раз (например, 'VTB BANK=4')")
+    parser.add_argument('--pay-system-weight', action='append', metavar='СИСТЕМА=ВЕС',
+                        help="вес платёжной системы, можно указать несколько раз (например, MIR=3)")
+    parser.add_argument('--snils-format', choices=('plain', 'dashed'), default='plain', help="формат СНИЛС")
+    parser.add_argument('--independent-visits', action='store_true',
+                        help="не вести реестр пациентов (визиты и карты не согласованы между строками)")
+    parser.add_argument('--checkpoint', action='store_true',
+                        help="вести контрольную точку рядом с файлом (только несжатый csv в один процесс)")
+    parser.add_argument('--resume', action='store_true',
+                        help="продолжить прерванный запуск или дописать датасет до --rows строк по контрольной точке")
+    parser.add_argument('--checkpoint-every', type=int, default=None,
+                        help="блоков между контрольными точками (по умолчанию - по времени, см. --checkpoint-seconds)")
+    parser.add_argument('--checkpoint-seconds', type=float, default=DEFAULT_CHECKPOINT_SECONDS,
+                        help="секунд между контрольными точками, если не задан --checkpoint-every")
+    parser.add_argument('--indexed', action='store_true',
+                        help="индексируемый режим: строки [start, start + rows) без генерации предыдущих (только csv)")
+    parser.add_argument('--start', type=int, default=0, help="номер первой строки в индексируемом режиме")
+    parser.add_argument('--indexed-like', metavar='ФАЙЛ',
+                        help="индексируемый режим с people, сидом, весами и форматом СНИЛС датасета ФАЙЛ "
+                             "(из ФАЙЛ.indexed.json) - другой диапазон того же датасета")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="каталог справочников")
+    parser.add_argument('-q', '--quiet', action='store_true', help="не выводить прогресс")
+    return parser
+
+
+def peak_rss() -> (int, int):
+    """
+    Пиковая память (байт) текущего процесса и его завершившихся дочерних процессов
+    """
+    if resource is None:
+        return None, None
+    # ru_maxrss - в килобайтах в Linux и в байтах в macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
+
+
+def output_size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    return os.path.getsize(path)
+
+
+def format_summary(rows: int, size: int, seconds: float) -> str:
+    seconds = max(seconds, 1e-9)
+    lines = [
+        f"Строк: {rows}, файл: {size / 1e6:.1f} МБ, время: {seconds:.2f} с",
+        f"Скорость: {rows / seconds:,.0f} строк/с".replace(',', ' ') + f", {size / 1e6 / seconds:.1f} МБ/с",
+    ]
+    own, children = peak_rss()
+    if own is not None:
+        memory = f"Пиковая память (RSS): {own / 2 ** 20:.0f} МБ"
+        if children:
+            memory += f", дочерние процессы: {children / 2 ** 20:.0f} МБ"
+        lines.append(memory)
+    return "\n".join(lines)
+
+
+def run(args: argparse.Namespace) -> int:
+    """
+    Генерация по разобранным аргументам; возвращает количество строк
+    """
+    reference = ReferenceData(args.data_dir)
+    bank_weights = parse_weights(args.bank_weight, bank_names, '--bank-weight')
+    pay_system_weights = parse_weights(args.pay_system_weight, painment_system_names, '--pay-system-weight')
+    people = args.people if args.people is not None else max(1, args.rows // 10)
+    compression = None if args.compression == 'none' else args.compression
+    consistent = not args.independent_visits
+
+    directory = os.path.dirname(args.output) if args.format != 'npy' else args.output
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    def on_chunk(written):
+        if not args.quiet:
+            print(f"\r{written} / {args.rows} строк ({100 * written / max(1, args.rows):.0f}%)",
+                  end='', file=sys.stderr, flush=True)
+
+    if args.checkpoint or args.resume:
+        rows = generate_checkpointed(
+            args.rows, args.output, people, reference, bank_weights, pay_system_weights, args.seed,
+            args.chunk_size, consistent, args.snils_format, resume=args.resume,
+            checkpoint_every=args.checkpoint_every, checkpoint_seconds=args.checkpoint_seconds,
+            on_chunk=on_chunk
+        )
+        if not args.quiet:
+            print(file=sys.stderr)
+        return rows
+
+    if args.indexed_like:
+        settings = read_settings(args.indexed_like)
+        return generate_indexed(
+            args.rows, args.output, settings['people'], reference, settings['bank_weights'],
+            settings['pay_system_weights'], settings['entropy'], args.start, args.workers, args.chunk_size,
+            settings['snils_format'], compression
+        )
+    if args.indexed:
+        return generate_indexed(
+            args.rows, args.output, args.people, reference, bank_weights, pay_system_weights, args.seed,
+            args.start, args.workers, args.chunk_size, args.snils_format, compression
+        )
+
+    if args.workers > 1:
+        generate_dataset_parallel(
+            args.rows, people, reference.specialists_list, reference.symptoms_dict,
+            reference.analyses_with_prices_dict, reference.names_dict, reference.surnames_dict,
+            reference.patronymics_dict, args.output, bank_weights, pay_system_weights, args.seed,
+            args.shards, args.workers, args.chunk_size, consistent=consistent,
+            snils_format=args.snils_format, compression=compression
+        )
+        return args.rows
+
+    # Персональные данные и строки - независимые потоки одного сида
+    personal_seed, rows_seed = np.random.SeedSequence(args.seed).spawn(2)
+    personal_data = generate_personal_data_batch(
+        people, reference.names_dict, reference.surnames_dict, reference.patronymics_dict,
+        rng=np.random.default_rng(personal_seed), snils_format=args.snils_format,
+        fio_samplers=reference.fio_samplers
+    )
+    if args.format == 'csv':
+        chunks = iter_dataset_chunks(
+            args.rows, reference.specialists_list, reference.symptoms_dict, reference.analyses_with_prices_dict,
+            personal_data, bank_weights=bank_weights, pay_system_weights=pay_system_weights,
+            chunk_size=args.chunk_size, seed=rows_seed, consistent=consistent
+        )
+        rows = write_csv_fast(chunks, args.output, on_chunk=on_chunk, compression=compression)
+    else:
+        # Колоночные форматы собираются прямо из блоков кодов, без строк CSV
+        from columnar import ColumnarSchema, write_columnar
+        blocks = iter_dataset_blocks(
+            args.rows, reference.specialists_list, reference.symptoms_dict, reference.analyses_with_prices_dict,
+            people, bank_weights=bank_weights, pay_system_weights=pay_system_weights,
+            chunk_size=args.chunk_size, seed=rows_seed, consistent=consistent
+        )
+        schema = ColumnarSchema.from_reference(
+            reference.specialists_list, reference.symptoms_dict, reference.analyses_with_prices_dict
+        )
+        rows = write_columnar(blocks, personal_data, args.output, schema, args.format, n=args.rows,
+                              on_chunk=on_chunk)
+    if not args.quiet:
+        print(file=sys.stderr)
+    return rows
+
+
+def main(argv: List[str] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.rows < 0 or args.workers < 1 or args.chunk_size < 1 or (args.people is not None and args.people < 1):
+        parser.error("rows, people, workers и chunk-size должны быть положительными")
+    if args.indexed_like:
+        if args.people is not None or args.seed is not None or args.bank_weight or args.pay_system_weight:
+            parser.error("--indexed-like берёт people, сид и веса из файла параметров - не указывайте их")
+        args.indexed = True
+    elif args.indexed and args.people is None:
+        parser.error("индексируемый режим требует --people (или --indexed-like): пациенты входят в определение датасета")
+    if args.indexed and (args.format != 'csv' or args.checkpoint or args.resume or args.start < 0):
+        parser.error("индексируемый режим (--indexed) - только csv без контрольных точек, --start >= 0")
+    if args.workers > 1 and args.format != 'csv':
+        parser.error("шардовая генерация (--workers > 1) поддерживает только формат csv")
+    if (args.checkpoint or args.resume) and (args.workers > 1 or args.format != 'csv'):
+        parser.error("контрольные точки (--checkpoint, --resume) - только для csv в один процесс")
+    if (args.checkpoint or args.resume) and (
+            args.compression not in ('infer', 'none')
+            or (args.compression == 'infer' and infer_compression(args.output) is not None)):
+        parser.error("контрольные точки (--checkpoint, --resume) - только для несжатого csv, без --compression")
+
+    started = time.perf_counter()
+    try:
+        rows = run(args)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    except (ImportError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - started
+
+    print(f"Датасет сохранен в {args.output}")
+    print(format_summary(rows, output_size(args.output), elapsed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+Колоночный экспорт датасета: Parquet, Arrow IPC и каталоги .npy.
+
+Колонки собираются прямо из блоков RowBlock, без разбора строк CSV.
+Категориальные колонки (врач, симптомы, анализы) - целые коды словарей,
+построенных по справочникам; они совпадают с кодами rows.RowVocabulary,
+поэтому одинаковы во всех блоках. Стоимость - int64 в рублях.
+Даты в .npy - datetime64[m]; в Parquet/Arrow - timestamp[s] (минутной
+единицы в Arrow нет, секунды всегда нулевые). Списки симптомов и анализов
+в Parquet/Arrow - списки кодов, в .npy - матрицы кодов фиксированной
+ширины, дополненные -1. Parquet и Arrow требуют необязательной
+зависимости pyarrow; каждый блок генерации записывается отдельной
+группой строк (record batch).
+"""
+import json
+import os
+from typing import List, Dict, Iterable
+
+import numpy as np
+
+from main import CSV_HEADERS, MAX_SYMPTOMS, MAX_ANALYSES
+from rows import RowBlock
+from worktime import _EPOCH_MINUTE
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+COLUMNAR_FORMATS = ('parquet', 'arrow', 'npy')
+
+# Колонки .npy по строкам датасета: номер пациента и коды вместо строк
+NPY_ROW_COLUMNS = ['person', 'specialist', 'symptoms', 'visit', 'analyses', 'analysis', 'cost', 'card']
+# Колонки .npy по пациентам: строка i - пациент с номером i из колонки person
+NPY_PEOPLE_COLUMNS = ['fio', 'passport', 'snils']
+
+# Номер карты "dddd dddd dddd dddd" в .npy - байтовая строка фиксированной ширины
+CARD_WIDTH = 19
+
+
+class CategoryDictionary:
+    """
+    Фиксированный словарь значение -> код
+    """
+    __slots__ = ('values', 'codes')
+
+    def __init__(self, values: Iterable[str]):
+        self.values = list(dict.fromkeys(values))
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def code(self, value: str) -> int:
+        try:
+            return self.codes[value]
+        except KeyError:
+            raise ValueError(f"Значения {value!r} нет в словаре колонки") from None
+
+
+class ColumnarSchema:
+    """
+    Словари категориальных колонок, общие для всех блоков одного датасета
+    """
+    __slots__ = ('specialists', 'symptoms', 'analyses')
+
+    def __init__(self, specialists: List[str], symptoms: List[str], analyses: List[str]):
+        self.specialists = CategoryDictionary(specialists)
+        self.symptoms = CategoryDictionary(symptoms)
+        self.analyses = CategoryDictionary(analyses)
+
+    @classmethod
+    def from_reference(cls, specialists_list: List[str], symptoms_dict: Dict[str, List[str]],
+                       analyses_with_prices_dict: Dict[str, List[tuple]]) -> 'ColumnarSchema':
+        symptoms = [s for spec in specialists_list for s in symptoms_dict.get(spec, [])]
+        analyses = [item[0] for spec in specialists_list for item in analyses_with_prices_dict.get(spec, [])]
+        return cls(specialists_list, symptoms, analyses)
+
+    def dictionaries(self) -> Dict[str, List[str]]:
+        return {
+            'specialist': self.specialists.values,
+            'symptoms': self.symptoms.values,
+            'analyses': self.analyses.values,
+        }
+
+
+def list_codes_matrix(offsets: np.ndarray, codes: np.ndarray, width: int) -> np.ndarray:
+    """
+    CSR-список -> матрица (n, width) с кодами, свободные ячейки заполнены -1
+    """
+    n = len(offsets) - 1
+    lengths = np.diff(offsets)
+    if n and lengths.max() > width:
+        raise ValueError(f"В строке больше {width} элементов списка")
+    matrix = np.full((n, width), -1, dtype=np.int32)
+    positions = np.arange(len(codes)) - np.repeat(offsets[:-1], lengths)
+    matrix[np.repeat(np.arange(n), lengths), positions] = codes
+    return matrix
+
+
+def encode_block(block: RowBlock, personal_data: List[List[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    Блок RowBlock -> колонки numpy. Коды симптомов, анализов и врачей берутся из блока как есть.
+    Списки возвращаются парами '<имя>_offsets' и '<имя>_codes'.
+    С personal_data добавляются строковые колонки fio, passport и snils.
+    """
+    columns = {
+        'person': block.person.astype(np.int32),
+        'symptoms_offsets': block.symptom_offsets.astype(np.int32),
+        'symptoms_codes': block.symptom_codes.astype(np.int32),
+        'specialist': block.specialist.astype(np.int32),
+        'visit': _EPOCH_MINUTE + block.visit.astype(np.int64),
+        'analyses_offsets': block.analysis_offsets.astype(np.int32),
+        'analyses_codes': block.analysis_codes.astype(np.int32),
+        'analysis': _EPOCH_MINUTE + block.analysis.astype(np.int64),
+        'cost': block.cost_kopecks // 100,
+        'card': block.card_strings(),
+    }
+    if personal_data is not None:
+        persons = [personal_data[p] for p in block.person.tolist()]
+        for field, name in enumerate(NPY_PEOPLE_COLUMNS):
+            columns[name] = [person[field] for person in persons]
+    return columns
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Для форматов parquet и arrow нужен пакет pyarrow (pip install pyarrow)")
+
+
+def arrow_schema(schema: ColumnarSchema):
+    _require_pyarrow()
+    category = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        (CSV_HEADERS[0], pa.string()),
+        (CSV_HEADERS[1], pa.string()),
+        (CSV_HEADERS[2], pa.string()),
+        (CSV_HEADERS[3], pa.list_(category)),
+        (CSV_HEADERS[4], category),
+        (CSV_HEADERS[5], pa.timestamp('s')),
+        (CSV_HEADERS[6], pa.list_(category)),
+        (CSV_HEADERS[7], pa.timestamp('s')),
+        (CSV_HEADERS[8], pa.int64()),
+        (CSV_HEADERS[9], pa.string()),
+    ])
+
+
+def to_record_batch(columns: Dict[str, np.ndarray], schema: ColumnarSchema):
+    """
+    Колонки блока -> pyarrow.RecordBatch с общими для всех блоков словарями
+    """
+    _require_pyarrow()
+    specialists = pa.array(schema.specialists.values, pa.string())
+    symptoms = pa.array(schema.symptoms.values, pa.string())
+    analyses = pa.array(schema.analyses.values, pa.string())
+
+    def category_list(name, dictionary):
+        values = pa.DictionaryArray.from_arrays(pa.array(columns[name + '_codes'], pa.int32()), dictionary)
+        return pa.ListArray.from_arrays(pa.array(columns[name + '_offsets'], pa.int32()), values)
+
+    arrays = [
+        pa.array(columns['fio'], pa.string()),
+        pa.array(columns['passport'], pa.string()),
+        pa.array(columns['snils'], pa.string()),
+        category_list('symptoms', symptoms),
+        pa.DictionaryArray.from_arrays(pa.array(columns['specialist'], pa.int32()), specialists),
+        pa.array(columns['visit'].astype('datetime64[s]')),
+        category_list('analyses', analyses),
+        pa.array(columns['analysis'].astype('datetime64[s]')),
+        pa.array(columns['cost'], pa.int64()),
+        pa.array(columns['card'], pa.string()),
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=arrow_schema(schema))
+
+
+def write_parquet(blocks: Iterable[RowBlock], personal_data: List[List[str]], path: str,
+                  schema: ColumnarSchema, compression: str = 'snappy', on_chunk=None) -> int:
+    """
+    Parquet: одна группа строк на блок генерации. Возвращает количество строк.
+    """
+    _require_pyarrow()
+    rows_written = 0
+    with pq.ParquetWriter(path, arrow_schema(schema), compression=compression) as writer:
+        for block in blocks:
+            batch = to_record_batch(encode_block(block, personal_data), schema)
+            writer.write_batch(batch, row_group_size=max(1, batch.num_rows))
+            rows_written += batch.num_rows
+            if on_chunk is not None:
+                on_chunk(rows_written)
+    return rows_written
+
+
+def write_arrow(blocks: Iterable[RowBlock], personal_data: List[List[str]], path: str,
+                schema: ColumnarSchema, on_chunk=None) -> int:
+    """
+    Arrow IPC (файл .arrow / Feather v2): один record batch на блок генерации
+    """
+    _require_pyarrow()
+    rows_written = 0
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, arrow_schema(schema)) as writer:
+        for block in blocks:
+            batch = to_record_batch(encode_block(block, personal_data), schema)
+            writer.write_batch(batch)
+            rows_written += batch.num_rows
+            if on_chunk is not None:
+                on_chunk(rows_written)
+    return rows_written
+
+
+def _npy_dtypes(schema: ColumnarSchema) -> Dict[str, tuple]:
+    """
+    Тип и форма строки каждой колонки NPY_ROW_COLUMNS
+    """
+    code = np.int16 if max(len(schema.specialists), len(schema.symptoms), len(schema.analyses)) < 2 ** 15 else np.int32
+    return {
+        'person': (np.int32, ()),
+        'specialist': (code, ()),
+        'symptoms': (code, (MAX_SYMPTOMS,)),
+        'visit': ('datetime64[m]', ()),
+        'analyses': (code, (MAX_ANALYSES,)),
+        'analysis': ('datetime64[m]', ()),
+        'cost': (np.int64, ()),
+        'card': (f'S{CARD_WIDTH}', ()),
+    }
+
+
+def write_npy(blocks: Iterable[RowBlock], personal_data: List[List[str]], directory: str,
+              schema: ColumnarSchema, n: int, on_chunk=None) -> int:
+    """
+    Каталог с файлом <колонка>.npy на каждую колонку и dictionaries.json со словарями.
+    Колонки строк (NPY_ROW_COLUMNS) создаются сразу на n строк через open_memmap
+    и заполняются по блокам, поэтому память не зависит от n. Врач, симптомы
+    и анализы - коды словарей (симптомы и анализы - матрицы (n, MAX_SYMPTOMS)
+    и (n, MAX_ANALYSES)), пациент - номер строки в колонках NPY_PEOPLE_COLUMNS.
+    """
+    os.makedirs(directory, exist_ok=True)
+    arrays = {
+        name: np.lib.format.open_memmap(os.path.join(directory, name + '.npy'), mode='w+',
+                                        dtype=dtype, shape=(n,) + shape)
+        for name, (dtype, shape) in _npy_dtypes(schema).items()
+    }
+    rows_written = 0
+    for block in blocks:
+        size = len(block)
+        if rows_written + size > n:
+            raise ValueError(f"Блоки содержат больше {n} строк")
+        columns = encode_block(block)
+        part = slice(rows_written, rows_written + size)
+        arrays['symptoms'][part] = list_codes_matrix(columns['symptoms_offsets'], columns['symptoms_codes'],
+                                                     MAX_SYMPTOMS)
+        arrays['analyses'][part] = list_codes_matrix(columns['analyses_offsets'], columns['analyses_codes'],
+                                                     MAX_ANALYSES)
+        for name in ('person', 'specialist', 'visit', 'analysis', 'cost'):
+            arrays[name][part] = columns[name]
+        arrays['card'][part] = np.array(columns['card'], dtype=f'S{CARD_WIDTH}')
+        rows_written += size
+        if on_chunk is not None:
+            on_chunk(rows_written)
+    if rows_written != n:
+        raise ValueError(f"Записано {rows_written} строк вместо {n}")
+    for array in arrays.values():
+        array.flush()
+    del arrays
+
+    # Пациентов на порядок меньше, чем строк: их колонки пишутся целиком
+    for field, name in enumerate(NPY_PEOPLE_COLUMNS):
+        values = [person[field] for person in personal_data]
+        np.save(os.path.join(directory, name + '.npy'), np.array(values, dtype=str if name == 'fio' else 'S'))
+    with open(os.path.join(directory, 'dictionaries.json'), mode='w', encoding='utf-8') as file:
+        json.dump(schema.dictionaries(), file, ensure_ascii=False, indent=1)
+    return rows_written
+
+
+def load_npy(directory: str, mmap_mode: str = None) -> (Dict[str, np.ndarray], Dict[str, List[str]]):
+    """
+    Колонки и словари, сохранённые write_npy; mmap_mode='r' - колонки без чтения в память
+    """
+    columns = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode)
+               for name in NPY_ROW_COLUMNS + NPY_PEOPLE_COLUMNS}
+    with open(os.path.join(directory, 'dictionaries.json'), mode='r', encoding='utf-8') as file:
+        return columns, json.load(file)
+
+
+def write_columnar(blocks: Iterable[RowBlock], personal_data: List[List[str]], path: str,
+                   schema: ColumnarSchema, fmt: str = 'parquet', n: int = None, on_chunk=None) -> int:
+    """
+    Колоночный аналог write_csv_fast для блоков RowBlock: fmt - 'parquet', 'arrow' или 'npy'
+    (для npy path - каталог, n - количество строк). Возвращает количество строк.
+    """
+    if fmt == 'parquet':
+        return write_parquet(blocks, personal_data, path, schema, on_chunk=on_chunk)
+    if fmt == 'arrow':
+        return write_arrow(blocks, personal_data, path, schema, on_chunk=on_chunk)
+    if fmt == 'npy':
+        if n is None:
+            raise ValueError("Для формата npy нужно количество строк n")
+        return write_npy(blocks, personal_data, path, schema, n, on_chunk=on_chunk)
+    raise ValueError(f"Неизвестный колоночный формат: {fmt}")
@@ -0,0 +1,292 @@
+"""
+Индексируемая генерация: строка i и пациент i без генерации предыдущих.
+
+Строки и пациенты разбиты на страницы фиксированного размера
+(ROW_PAGE и PERSON_PAGE). Случайные числа страницы берутся из
+счётчикового генератора Philox: ключ выводится из сида, счётчик - номер
+страницы, поэтому любая страница строится за O(1) независимо от остальных.
+Паспорта, СНИЛС и номера карт - значения перестановок Фейстеля
+в точке "номер пациента" или "номер строки", поэтому они уникальны во всём
+датасете без общего состояния.
+
+Пациенты материализуются лениво: строятся только страницы пациентов,
+на которые ссылаются запрошенные строки, и хранятся в ограниченном кэше.
+Любой диапазон [a, b) строится отдельно - диапазоны можно генерировать
+параллельно или перегенерировать один испорченный участок; строка i
+не зависит ни от общего количества строк, ни от разбиения на диапазоны.
+
+Количество пациентов входит в определение датасета (от него зависит выбор
+пациента каждой строки), поэтому оно обязательно. Параметры, задающие
+строки (people, энтропия сида, веса, формат СНИЛС, размеры страниц),
+сохраняются рядом с файлом в <файл>.indexed.json: по ним следующий
+запуск строит другой диапазон того же датасета (cli.py --indexed-like).
+
+Реестр пациентов (согласованные повторные визиты) по своей природе
+последовательный, поэтому в этом режиме визиты независимы (как
+--independent-visits у cli.py), а у каждой строки своя карта.
+"""
+import json
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from main import DEFAULT_STREAM_CHUNK_ROWS, PASSPORT_SPACE, SNILS_SPACE
+from batch import BatchEngine, generate_personal_data_batch
+from cards import ACCOUNT_SPACE
+from unique import UniqueIdSource
+from rows import RowBlock
+from reference import ReferenceData, default_reference
+from parallel import shared_id_keys, split_evenly, part_path, merge_parts
+from writers import BulkCsvWriter
+
+# Размеры страниц входят в определение датасета: при их изменении меняются строки
+ROW_PAGE = 1024
+PERSON_PAGE = 256
+
+# Страниц пациентов в кэше по умолчанию (около 260 тысяч пациентов)
+DEFAULT_CACHE_PAGES = 1024
+
+# Увеличивается при изменении формата файла параметров
+SETTINGS_VERSION = 1
+
+SETTINGS_SUFFIX = '.indexed.json'
+
+
+def settings_path(path: str) -> str:
+    return path + SETTINGS_SUFFIX
+
+
+def write_settings(path: str, settings: Dict):
+    """
+    Параметры индексируемого датасета рядом с файлом результата path
+    """
+    with open(settings_path(path), mode='w', encoding='utf-8') as file:
+        json.dump(dict(settings, version=SETTINGS_VERSION, row_page=ROW_PAGE, person_page=PERSON_PAGE),
+                  file, ensure_ascii=False, indent=1)
+
+
+def read_settings(path: str) -> Dict:
+    """
+    Параметры индексируемого датасета, сохранённые generate_indexed для файла path
+    """
+    try:
+        with open(settings_path(path), encoding='utf-8') as file:
+            settings = json.load(file)
+    except FileNotFoundError:
+        raise ValueError(f"Нет параметров индексируемого датасета: {settings_path(path)}") from None
+    if settings.get('version') != SETTINGS_VERSION:
+        raise ValueError(f"Неподдерживаемая версия параметров: {settings.get('version')}")
+    if (settings['row_page'], settings['person_page']) != (ROW_PAGE, PERSON_PAGE):
+        raise ValueError("Датасет построен с другими размерами страниц - его строки не воспроизводятся")
+    return settings
+
+
+def page_generator(key: np.ndarray, page: int) -> np.random.Generator:
+    """
+    Генератор страницы: Philox с ключом датасета и счётчиком, начинающимся с номера страницы.
+    Страница расходует намного меньше 2^128 значений, поэтому потоки страниц не пересекаются.
+    """
+    return np.random.Generator(np.random.Philox(key=key, counter=[0, 0, page, 0]))
+
+
+class IndexedDataset:
+    """
+    Датасет на people пациентов с произвольным доступом по номеру строки.
+    Экземпляр не потокобезопасен (общий кэш и движок) - для параллельной
+    генерации у каждого процесса свой экземпляр (см. generate_indexed).
+    """
+
+    def __init__(
+        self,
+        people: int,
+        reference: ReferenceData = None,
+        bank_weights: dict = None,
+        pay_system_weights: dict = None,
+        seed: int = None,
+        snils_format: str = 'plain',
+        cache_pages: int = DEFAULT_CACHE_PAGES
+    ):
+        if people < 1:
+            raise ValueError("Количество пациентов должно быть положительным")
+        self.people = people
+        self.reference = reference if reference is not None else default_reference()
+        self.snils_format = snils_format
+        self.cache_pages = max(1, cache_pages)
+        master = np.random.SeedSequence(seed)
+        # Без сида сохраняется случайная энтропия: по ней датасет можно построить заново
+        self.entropy = master.entropy
+        people_seq, rows_seq = master.spawn(2)
+        self.people_key = people_seq.generate_state(2, dtype=np.uint64)
+        self.rows_key = rows_seq.generate_state(2, dtype=np.uint64)
+        self.id_keys = shared_id_keys(master)
+        self.engine = BatchEngine(self.reference.specialists_list, self.reference.symptoms_dict,
+                                  self.reference.analyses_with_prices_dict, bank_weights, pay_system_weights,
+                                  bin_table=self.reference.bin_table)
+        self._person_pages = OrderedDict()
+
+    def _person_page(self, page: int) -> List[List[str]]:
+        cached = self._person_pages.get(page)
+        if cached is not None:
+            self._person_pages.move_to_end(page)
+            return cached
+        start = page * PERSON_PAGE
+        reference = self.reference
+        # Страница всегда полная: пациент i не зависит от общего количества пациентов
+        persons = generate_personal_data_batch(
+            PERSON_PAGE, reference.names_dict, reference.surnames_dict, reference.patronymics_dict,
+            rng=page_generator(self.people_key, page),
+            passport_ids=UniqueIdSource(PASSPORT_SPACE, keys=self.id_keys['passport'], start=start),
+            snils_ids=UniqueIdSource(SNILS_SPACE, keys=self.id_keys['snils'], start=start),
+            snils_format=self.snils_format, fio_samplers=reference.fio_samplers
+        )
+        self._person_pages[page] = persons
+        if len(self._person_pages) > self.cache_pages:
+            self._person_pages.popitem(last=False)
+        return persons
+
+    def person(self, index: int) -> List[str]:
+        """
+        Пациент index: [ ФИО ; паспорт ; СНИЛС ]
+        """
+        if not 0 <= index < self.people:
+            raise IndexError(f"Нет пациента {index} (всего {self.people})")
+        return self._person_page(index // PERSON_PAGE)[index % PERSON_PAGE]
+
+    def persons(self, indices: np.ndarray) -> (np.ndarray, List[List[str]]):
+        """
+        Пациенты по номерам без повторов: (номер каждого индекса в списке, список пациентов).
+        Страницы строятся по одной на группу пациентов со страницы.
+        """
+        unique, local = np.unique(indices, return_inverse=True)
+        pages = unique // PERSON_PAGE
+        bounds = np.flatnonzero(np.diff(pages)) + 1
+        persons = []
+        for group in np.split(unique % PERSON_PAGE, bounds):
+            page = self._person_page(int(pages[len(persons)]))
+            persons.extend([page[offset] for offset in group.tolist()])
+        return local, persons
+
+    def _row_page(self, page: int) -> RowBlock:
+        rng = page_generator(self.rows_key, page)
+        # Номер счёта карты - значение перестановки в точке "номер строки"
+        self.engine.card_ids = UniqueIdSource(ACCOUNT_SPACE, keys=self.id_keys['card'], start=page * ROW_PAGE)
+        columns = self.engine.draw_columns(ROW_PAGE, self.people, rng)
+        return self.engine.draw_block(columns, rng)
+
+    def iter_blocks(self, start: int, stop: int) -> Iterator[RowBlock]:
+        """
+        Строки [start, stop) блоками не длиннее ROW_PAGE, по границам страниц
+        """
+        if not 0 <= start <= stop:
+            raise ValueError(f"Некорректный диапазон строк [{start}, {stop})")
+        position = start
+        while position < stop:
+            page, offset = divmod(position, ROW_PAGE)
+            size = min(ROW_PAGE - offset, stop - position)
+            block = self._row_page(page)
+            yield block if size == ROW_PAGE else block.slice(offset, offset + size)
+            position += size
+
+    def iter_chunks(self, start: int, stop: int,
+                    chunk_size: int = DEFAULT_STREAM_CHUNK_ROWS) -> Iterator[List[List[str]]]:
+        """
+        Строки [start, stop) блоками примерно по chunk_size строк (для write_csv_fast)
+        """
+        chunk = []
+        for block in self.iter_blocks(start, stop):
+            # Номера пациентов блока заменяются номерами в списке материализованных пациентов
+            block.person, persons = self.persons(block.person)
+            chunk.extend(block.to_rows(persons))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def rows(self, start: int, stop: int) -> List[List[str]]:
+        rows = []
+        for chunk in self.iter_chunks(start, stop):
+            rows.extend(chunk)
+        return rows
+
+    def row(self, index: int) -> List[str]:
+        return self.rows(index, index + 1)[0]
+
+
+def _generate_range(task: Dict) -> int:
+    """
+    Пишет строки [start, stop) в файл части без заголовка. Выполняется в дочернем процессе.
+    """
+    dataset = IndexedDataset(task['people'], task['reference'], task['bank_weights'],
+                             task['pay_system_weights'], task['entropy'], task['snils_format'])
+    with open(task['path'], mode='wb') as file:
+        writer = BulkCsvWriter(file)
+        for chunk in dataset.iter_chunks(task['start'], task['stop'], task['chunk_size']):
+            writer.writerows(chunk)
+    return writer.rows_written
+
+
+def generate_indexed(
+    n: int,
+    path: str,
+    people: int,
+    reference: ReferenceData = None,
+    bank_weights: dict = None,
+    pay_system_weights: dict = None,
+    seed: int = None,
+    start: int = 0,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_STREAM_CHUNK_ROWS,
+    snils_format: str = 'plain',
+    compression: str = 'infer'
+) -> int:
+    """
+    Пишет в CSV path строки [start, start + n) индексируемого датасета
+    в workers процессах. Результат не зависит от количества процессов,
+    а строки совпадают с теми же строками любого другого диапазона
+    с теми же people, сидом, весами и форматом СНИЛС. Эти параметры
+    сохраняются в <path>.indexed.json (см. read_settings).
+    Возвращает количество строк.
+    """
+    if people is None or people < 1:
+        raise ValueError("Количество пациентов people обязательно: оно входит в определение датасета")
+    reference = reference if reference is not None else default_reference()
+    entropy = np.random.SeedSequence(seed).entropy
+    workers = max(1, min(workers, n)) if n > 0 else 1
+
+    tasks = []
+    position = start
+    for shard, count in enumerate(split_evenly(n, workers)):
+        tasks.append({
+            'path': part_path(path, shard),
+            'start': position,
+            'stop': position + count,
+            'people': people,
+            'reference': reference,
+            'bank_weights': bank_weights,
+            'pay_system_weights': pay_system_weights,
+            'entropy': entropy,
+            'snils_format': snils_format,
+            'chunk_size': chunk_size,
+        })
+        position += count
+
+    if workers == 1:
+        rows = [_generate_range(tasks[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(_generate_range, tasks))
+    merge_parts([task['path'] for task in tasks], path, compression=compression)
+    write_settings(path, {
+        'people': people,
+        # Без сида сохраняется случайная энтропия: по ней строится любой другой диапазон
+        'entropy': entropy,
+        'snils_format': snils_format,
+        'bank_weights': bank_weights,
+        'pay_system_weights': pay_system_weights,
+        'start': start,
+        'rows': n,
+    })
+    return sum(rows)
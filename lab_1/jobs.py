@@ -0,0 +1,285 @@
+"""
+Фоновое задание генерации датасета для GUI и других интерактивных клиентов.
+
+GenerationJob запускает шардовую генерацию (parallel._generate_shard)
+в пуле процессов. Шарды после каждого блока сообщают количество строк
+через очередь; поток-координатор переводит их в снимки JobProgress
+(строк в секунду, оценка оставшегося времени), которые клиент забирает
+методом poll() из своего цикла событий. Задание можно приостановить,
+продолжить и отменить; по завершении доступны длительности этапов.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from main import DEFAULT_STREAM_CHUNK_ROWS
+from parallel import build_shard_tasks, init_worker_control, merge_parts, _generate_shard
+from reference import ReferenceData, default_reference
+
+JOB_STATES = ('pending', 'running', 'paused', 'cancelled', 'done', 'failed')
+
+# Как часто координатор публикует снимок прогресса, секунд
+PROGRESS_INTERVAL = 0.1
+
+
+class JobProgress:
+    """
+    Снимок состояния задания
+    """
+    __slots__ = ('state', 'rows_done', 'rows_total', 'rows_per_second', 'eta_seconds', 'elapsed')
+
+    def __init__(self, state: str, rows_done: int, rows_total: int,
+                 rows_per_second: float, eta_seconds: float, elapsed: float):
+        self.state = state
+        self.rows_done = rows_done
+        self.rows_total = rows_total
+        self.rows_per_second = rows_per_second
+        self.eta_seconds = eta_seconds
+        self.elapsed = elapsed
+
+    @property
+    def percent(self) -> float:
+        return 100.0 * self.rows_done / self.rows_total if self.rows_total else 100.0
+
+
+class GenerationJob:
+    """
+    Генерация n строк (people пациентов) в файл path в пуле из workers процессов.
+    Управление: start(), pause(), resume(), cancel(), wait(); прогресс - poll().
+    """
+
+    def __init__(
+        self,
+        n: int,
+        path: str = 'output/medical_dataset.csv',
+        people: int = None,
+        reference: ReferenceData = None,
+        bank_weights: dict = None,
+        pay_system_weights: dict = None,
+        seed: int = None,
+        workers: int = None,
+        shards: int = None,
+        chunk_size: int = DEFAULT_STREAM_CHUNK_ROWS,
+        consistent: bool = True
+    ):
+        self.n = n
+        self.path = path
+        self.people = people if people is not None else max(1, n)
+        self.reference = reference if reference is not None else default_reference()
+        self.bank_weights = bank_weights
+        self.pay_system_weights = pay_system_weights
+        self.seed = seed
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        # Шардов больше, чем процессов: прогресс приходит равномернее
+        self.shards = shards if shards is not None else 2 * self.workers
+        self.chunk_size = chunk_size
+        self.consistent = consistent
+
+        self.state = 'pending'
+        self.error = None
+        self.timings: Dict[str, float] = {}
+        self.rows_done = 0
+        self.updates = queue.Queue()
+
+        context = multiprocessing.get_context()
+        self._context = context
+        self._progress = context.Queue()
+        self._cancel = context.Event()
+        self._running = context.Event()
+        self._running.set()
+        self._thread = None
+        self._started = None
+        # pause()/resume() вызываются из потока клиента (Tk), а координатор читает
+        # время пауз и переводит задание в конечное состояние: всё это - под замком
+        self._state_lock = threading.Lock()
+        self._paused_since = None
+        self._paused_total = 0.0
+
+    # ---------- управление ----------
+
+    def start(self) -> 'GenerationJob':
+        if self._thread is not None:
+            raise RuntimeError("Задание уже запущено")
+        self.state = 'running'
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='generation-job', daemon=True)
+        self._thread.start()
+        return self
+
+    def pause(self):
+        with self._state_lock:
+            if self.state == 'running':
+                self._running.clear()
+                self._paused_since = time.perf_counter()
+                self.state = 'paused'
+
+    def resume(self):
+        with self._state_lock:
+            if self.state == 'paused':
+                self._paused_total += time.perf_counter() - self._paused_since
+                self._paused_since = None
+                self.state = 'running'
+                self._running.set()
+
+    def cancel(self):
+        if self.state in ('pending', 'running', 'paused'):
+            self._cancel.set()
+            # Приостановленные шарды должны проснуться, чтобы увидеть отмену
+            self._running.set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Ждёт завершения; возвращает True, если задание завершилось
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.finished
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ('cancelled', 'done', 'failed')
+
+    def poll(self) -> JobProgress:
+        """
+        Последний опубликованный снимок прогресса или None, если новых нет.
+        Вызывается из цикла событий клиента (например, Tk after).
+        """
+        latest = None
+        while True:
+            try:
+                latest = self.updates.get_nowait()
+            except queue.Empty:
+                return latest
+
+    # ---------- координатор ----------
+
+    def _active_elapsed(self) -> float:
+        with self._state_lock:
+            now = time.perf_counter()
+            paused = self._paused_total
+            if self._paused_since is not None:
+                paused += now - self._paused_since
+        return max(1e-9, now - self._started - paused)
+
+    def _finish(self, state: str):
+        # Под замком: pause() не вернёт завершённое задание в состояние 'paused'
+        with self._state_lock:
+            self.state = state
+            if self._paused_since is not None:
+                self._paused_total += time.perf_counter() - self._paused_since
+                self._paused_since = None
+
+    def _publish(self):
+        elapsed = self._active_elapsed()
+        rate = self.rows_done / elapsed
+        remaining = self.n - self.rows_done
+        eta = remaining / rate if rate > 0 else None
+        self.updates.put(JobProgress(self.state, self.rows_done, self.n, rate, eta, elapsed))
+
+    def _drain_progress(self, timeout: float):
+        try:
+            _, rows = self._progress.get(timeout=timeout)
+            self.rows_done += rows
+            while True:
+                _, rows = self._progress.get_nowait()
+                self.rows_done += rows
+        except queue.Empty:
+            pass
+
+    def _run(self):
+        total_started = time.perf_counter()
+        tasks = []
+        try:
+            started = time.perf_counter()
+            reference = self.reference
+            tasks = build_shard_tasks(
+                self.n, self.people, reference.specialists_list, reference.symptoms_dict,
+                reference.analyses_with_prices_dict, reference.names_dict, reference.surnames_dict,
+                reference.patronymics_dict, self.path, self.bank_weights, self.pay_system_weights,
+                self.seed, self.shards, self.chunk_size, self.consistent
+            )
+            self.timings['reference'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            results = self._run_shards(tasks)
+            self.timings['generation'] = time.perf_counter() - started
+            self.timings['personal_data'] = max(r['timings']['personal_data'] for r in results)
+            self.timings['rows'] = max(r['timings']['rows'] for r in results)
+
+            if self._cancel.is_set():
+                self._remove_parts(tasks)
+                self._finish('cancelled')
+            else:
+                started = time.perf_counter()
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                merge_parts([task['path'] for task in tasks], self.path)
+                self.timings['merge'] = time.perf_counter() - started
+                self._finish('done')
+        except Exception as e:
+            self.error = e
+            self._remove_parts(tasks)
+            self._finish('failed')
+        finally:
+            self.timings['total'] = time.perf_counter() - total_started
+            self._publish()
+
+    def _run_shards(self, tasks: List[Dict]) -> List[Dict]:
+        for task in tasks:
+            directory = os.path.dirname(task['path'])
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context,
+                                 initializer=init_worker_control,
+                                 initargs=(self._progress, self._cancel, self._running)) as executor:
+            futures = [executor.submit(_generate_shard, task) for task in tasks]
+            last_published = 0.0
+            while not all(future.done() for future in futures):
+                self._drain_progress(PROGRESS_INTERVAL)
+                if self._cancel.is_set():
+                    for future in futures:
+                        future.cancel()
+                now = time.perf_counter()
+                if now - last_published >= PROGRESS_INTERVAL:
+                    self._publish()
+                    last_published = now
+            self._drain_progress(0)
+            cancelled = {'rows': 0, 'cancelled': True, 'timings': {'personal_data': 0.0, 'rows': 0.0}}
+            # Отменённые до запуска шарды не возвращают результата
+            return [cancelled if future.cancelled() else future.result() for future in futures]
+
+    @staticmethod
+    def _remove_parts(tasks: List[Dict]):
+        for task in tasks:
+            if os.path.exists(task['path']):
+                os.remove(task['path'])
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    """
+    Длительности этапов задания для вывода пользователю
+    """
+    labels = [
+        ('reference', "Справочники"),
+        ('personal_data', "Персональные данные (шард)"),
+        ('rows', "Строки и запись (шард)"),
+        ('generation', "Генерация в пуле"),
+        ('merge', "Склейка частей"),
+        ('total', "Всего"),
+    ]
+    return "\n".join(f"{label}: {timings[key]:.2f} с" for key, label in labels if key in timings)
+
+
+def format_eta(seconds: float) -> str:
+    if seconds is None:
+        return "--:--"
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
@@ -1,12 +1,67 @@
+import argparse
 import random
 import csv
-from datetime import datetime, timedelta
 import os
-from typing import List, Dict
+from itertools import islice
+from typing import List, Dict, Union, Iterable, Iterator
+
+import numpy as np
+
+from unique import UniqueIdSource
+from cards import ACCOUNT_SPACE, draw_card_number
+from samplers import AliasSampler, NameDictionary, build_gender_samplers, harmonic_sampler
+from worktime import Schedule, format_minutes, parse_minutes, draw_visit_minute, draw_analysis_minute, draw_visit_and_analysis
 
 bank_names = ['GAZPROMBANK','MTS BANK','SBERBANK OF RUSSIA','TINKOFF BANK','VTB BANK']
 painment_system_names = ['MIR','VISA','MASTERCARD']
 
+# Коды регионов основных фабрик Госзнака
+REGION_CODES = [
+    40,  # Москва (исторический)
+    45,  # Москва
+    50,  # Московская область
+    77,  # Москва (современный)
+    78,  # Санкт-Петербург
+    59,  # Пермский край
+    47,  # Ленинградская область
+    66   # Свердловская область
+]
+
+# Годы выпуска бланков (2007-2025)
+PASSPORT_YEARS = list(range(2007, 2026))
+
+# Номера паспортов: 100000-999999
+PASSPORT_FIRST_NUMBER = 100000
+PASSPORT_NUMBERS = 900000
+
+# Размеры пространств идентификаторов для unique.UniqueIdSource
+PASSPORT_SPACE = len(REGION_CODES) * len(PASSPORT_YEARS) * PASSPORT_NUMBERS
+SNILS_SPACE = 10 ** 9
+
+# Веса цифр СНИЛС (9 для первой, ..., 1 для девятой) и разряды 9-значной основной части
+SNILS_WEIGHTS = np.arange(9, 0, -1, dtype=np.int64)
+SNILS_POWERS = 10 ** np.arange(8, -1, -1, dtype=np.int64)
+
+# Наибольшее количество симптомов и анализов в одной строке
+MAX_SYMPTOMS = 7
+MAX_ANALYSES = 5
+
+CSV_HEADERS = ['ФИО', 'Паспорт', 'СНИЛС', 'Симптомы', 'Врач', 'Дата_посещения', 'Анализы', 'Дата_анализов', 'Стоимость', 'Карта_оплаты']
+
+# Сколько строк держать в памяти перед записью на диск в потоковом режиме
+DEFAULT_STREAM_CHUNK_ROWS = 10_000
+
+
+def make_rng(seed=None, rng=None):
+    """
+    Возвращает изолированный генератор случайных чисел:
+    переданный rng, либо новый random.Random(seed).
+    Без сида генератор инициализируется случайно, но не делит состояние с модулем random.
+    """
+    if rng is not None:
+        return rng
+    return random.Random(seed)
+
 
 def read_from_csv_file(file_path: str, delimiter: str = ';') -> List[List[str]]:
     data = []
@@ -37,7 +92,7 @@ def parse_personal_data_file(file_path: str) -> Dict[str, List[tuple]]:
     return data
 
 
-def weighted_choice(data: List[tuple]) -> str:
+def weighted_choice(data: List[tuple], rng=random) -> str:
     """
     Выбирает элемент из списка (значение, вероятность) с учетом вероятностей
     """
@@ -45,28 +100,52 @@ def weighted_choice(data: List[tuple]) -> str:
         return ""
     values = [item[0] for item in data]
     weights = [item[1] for item in data]
-    return random.choices(values, weights=weights, k=1)[0]
+    return rng.choices(values, weights=weights, k=1)[0]
+
+
+def compile_name_dictionary(names_dict) -> NameDictionary:
+    """
+    Компилирует словарь имён (индекс имя -> пол и выборки по полу)
+    и предупреждает об именах, встречающихся у обоих полов
+    """
+    if isinstance(names_dict, NameDictionary):
+        return names_dict
+    names = NameDictionary(names_dict)
+    if names.ambiguous:
+        print(f"Предупреждение: имена встречаются у обоих полов: {', '.join(names.ambiguous)}")
+    return names
 
 
-def generate_fio(names_dict, surnames_dict, patronymics_dict) -> (str, str):
+def build_fio_samplers(names_dict, surnames_dict, patronymics_dict) -> Dict:
+    """
+    Строит выборки для generate_fio один раз на все словари ФИО:
+    имена - скомпилированный словарь NameDictionary, фамилии и отчества - по каждому полу
+    names_dict может быть уже скомпилированным NameDictionary
+    """
+    return {
+        "names": compile_name_dictionary(names_dict),
+        "surnames": build_gender_samplers(surnames_dict),
+        "patronymics": build_gender_samplers(patronymics_dict),
+    }
+
+
+def generate_fio(names_dict, surnames_dict, patronymics_dict, samplers: Dict = None, rng=random) -> (str, str):
     """
     Генерирует ФИО с учетом пола и вероятностей
     Возвращает кортеж: (ФИО, gender)
+    samplers: результат build_fio_samplers (если не передан, строится заново)
     """
-    # Сначала выбираем имя
-    all_names = names_dict["M"] + names_dict["F"]
-    chosen_name = weighted_choice(all_names)
+    if samplers is None:
+        samplers = build_fio_samplers(names_dict, surnames_dict, patronymics_dict)
 
-    # Определяем пол по имени
-    gender = None
-    for g in ("M", "F"):
-        if any(chosen_name == val for val, _ in names_dict[g]):
-            gender = g
-            break
+    # Выбираем имя, пол определяется по индексу словаря
+    chosen_name, gender = samplers["names"].draw(rng)
 
     # Подбираем фамилию и отчество по полу
-    surname = weighted_choice(surnames_dict.get(gender, []))
-    patronymic = weighted_choice(patronymics_dict.get(gender, []))
+    surname_sampler = samplers["surnames"].get(gender)
+    patronymic_sampler = samplers["patronymics"].get(gender)
+    surname = surname_sampler.draw(rng) if surname_sampler else ""
+    patronymic = patronymic_sampler.draw(rng) if patronymic_sampler else ""
 
     fio = f"{surname} {chosen_name} {patronymic}"
     return fio, gender
@@ -101,197 +180,271 @@ def calculate_snils_control_number(digits: list) -> str:
     
     return f"{control_number:02d}"
 
-def generate_personal_data(amount, names_dict, surnames_dict, patronymics_dict) -> List[List[str]]:
+
+def snils_control_numbers_batch(bodies: np.ndarray) -> np.ndarray:
+    """
+    Контрольные числа СНИЛС для массива 9-значных основных частей (целые числа)
+    по тем же правилам, что и calculate_snils_control_number
+    """
+    bodies = np.asarray(bodies, dtype=np.int64)
+    digits = (bodies[:, None] // SNILS_POWERS) % 10
+    total = digits @ SNILS_WEIGHTS
+
+    # < 100 - само число, 100 и 101 - 00, иначе остаток от деления на 101 (100 -> 00)
+    control = np.where(total < 100, total, total % 101)
+    control[control == 100] = 0
+    return control
+
+
+def format_digit_fields(fields: List[tuple], separators: List[str]) -> List[str]:
+    """
+    Собирает строки из числовых колонок одним векторным проходом.
+    fields: [(массив целых, ширина с ведущими нулями), ...]
+    separators: разделители после каждого поля (последний может быть пустым)
+    """
+    n = len(fields[0][0])
+    width = sum(w for _, w in fields) + sum(len(sep) for sep in separators)
+    chars = np.empty((n, width), dtype=np.uint8)
+    pos = 0
+    for (values, field_width), sep in zip(fields, separators):
+        values = np.asarray(values, dtype=np.int64)
+        powers = 10 ** np.arange(field_width - 1, -1, -1, dtype=np.int64)
+        chars[:, pos:pos + field_width] = (values[:, None] // powers) % 10 + ord('0')
+        pos += field_width
+        for ch in sep:
+            chars[:, pos] = ord(ch)
+            pos += 1
+    return [value.decode('ascii') for value in chars.view(f'S{width}').ravel().tolist()]
+
+
+def format_snils_batch(bodies: np.ndarray, style: str = 'plain') -> List[str]:
+    """
+    СНИЛС пачкой: 'plain' - "123456789 12", 'dashed' - "123-456-789 12" (формат из README)
+    """
+    bodies = np.asarray(bodies, dtype=np.int64)
+    control = snils_control_numbers_batch(bodies)
+    if style == 'plain':
+        return format_digit_fields([(bodies, 9), (control, 2)], [' ', ''])
+    if style == 'dashed':
+        return format_digit_fields(
+            [(bodies // 1000000, 3), (bodies // 1000 % 1000, 3), (bodies % 1000, 3), (control, 2)],
+            ['-', '-', ' ', '']
+        )
+    raise ValueError(f"Неизвестный формат СНИЛС: {style}")
+
+
+def format_snils(body: int, style: str = 'plain') -> str:
+    digits = f"{body:09d}"
+    control = calculate_snils_control_number([int(digit) for digit in digits])
+    if style == 'dashed':
+        return f"{digits[0:3]}-{digits[3:6]}-{digits[6:9]} {control}"
+    if style == 'plain':
+        return f"{digits} {control}"
+    raise ValueError(f"Неизвестный формат СНИЛС: {style}")
+
+
+def generate_snils_batch(amount: int, snils_ids: UniqueIdSource, style: str = 'plain') -> List[str]:
+    """
+    amount уникальных СНИЛС без построчных вызовов randint
+    """
+    return format_snils_batch(snils_ids.next_batch(amount), style)
+
+
+def encode_passport(region_code: int, year: int, number: int) -> int:
+    """
+    Паспорт -> упакованное число из пространства [0, PASSPORT_SPACE)
+    """
+    series = REGION_CODES.index(region_code) * len(PASSPORT_YEARS) + (year - PASSPORT_YEARS[0])
+    return series * PASSPORT_NUMBERS + (number - PASSPORT_FIRST_NUMBER)
+
+
+def decode_passport(value: int) -> str:
+    """
+    Упакованное число -> "серия номер", серия = код региона + год выпуска (4023 123456)
+    """
+    series, number = divmod(value, PASSPORT_NUMBERS)
+    region_idx, year_idx = divmod(series, len(PASSPORT_YEARS))
+    year = PASSPORT_YEARS[year_idx]
+    return f"{REGION_CODES[region_idx]:02d}{year % 100:02d} {number + PASSPORT_FIRST_NUMBER:06d}"
+
+
+def decode_passport_batch(values: np.ndarray) -> List[str]:
+    """
+    Векторная версия decode_passport
+    """
+    values = np.asarray(values, dtype=np.int64)
+    series, number = np.divmod(values, PASSPORT_NUMBERS)
+    region_idx, year_idx = np.divmod(series, len(PASSPORT_YEARS))
+    regions = np.array(REGION_CODES, dtype=np.int64)[region_idx]
+    years = (np.array(PASSPORT_YEARS, dtype=np.int64) % 100)[year_idx]
+    return format_digit_fields(
+        [(regions, 2), (years, 2), (number + PASSPORT_FIRST_NUMBER, 6)], ['', ' ', '']
+    )
+
+
+def generate_personal_data(amount, names_dict, surnames_dict, patronymics_dict, rng=random,
+                           id_mode: str = 'permutation', passport_ids: UniqueIdSource = None,
+                           snils_ids: UniqueIdSource = None, snils_format: str = 'plain',
+                           fio_samplers: Dict = None) -> List[List[str]]:
     """
     Генерация ФИО, паспорта и СНИЛС с учетом пола и вероятностей появления имен, фамилий и отчеств.
+    rng: генератор случайных чисел (random.Random или модуль random)
+    id_mode: способ обеспечить уникальность паспортов и СНИЛС (см. unique.ID_MODES)
+    passport_ids/snils_ids: готовые источники идентификаторов (например, общие для шардов)
+    snils_format: 'plain' (123456789 12) или 'dashed' (123-456-789 12)
+    fio_samplers: готовые выборки build_fio_samplers (например, из кэша справочников)
     Возвращает список списков: [ ФИО ; паспорт ; СНИЛС ]
     """
-    # Коды регионов основных фабрик Госзнака
-    region_codes = [
-        40,  # Москва (исторический)
-        45,  # Москва
-        50,  # Московская область
-        77,  # Москва (современный)
-        78,  # Санкт-Петербург
-        59,  # Пермский край
-        47,  # Ленинградская область
-        66   # Свердловская область
-    ]
-    
-    # Годы выпуска бланков (2007-2025)
-    years = list(range(2007, 2026))
-    
+    if passport_ids is None:
+        passport_ids = UniqueIdSource(PASSPORT_SPACE, id_mode, rng)
+    if snils_ids is None:
+        snils_ids = UniqueIdSource(SNILS_SPACE, id_mode, rng)
+
     personal_data = []
+
+    # Выборки для ФИО строятся один раз на весь вызов
+    if fio_samplers is None:
+        fio_samplers = build_fio_samplers(names_dict, surnames_dict, patronymics_dict)
     
     for _ in range(amount):
         # Генерация ФИО по полу и вероятностям
-        fio, gender = generate_fio(names_dict, surnames_dict, patronymics_dict)
-        
-        # Генерация серии паспорта: код региона + год выпуска
-        region_code = random.choice(region_codes)
-        year = random.choice(years)
-        passport_series = f"{region_code:02d}{year % 100:02d}"  # Формат: 4023
+        fio, gender = generate_fio(names_dict, surnames_dict, patronymics_dict, fio_samplers, rng)
         
-        # Генерация номера паспорта (6 цифр)
-        passport_number = f"{random.randint(100000, 999999):06d}"
-        passport = f"{passport_series} {passport_number}"
+        # Уникальный паспорт: серия (код региона + год выпуска) и номер из 6 цифр
+        passport = decode_passport(passport_ids.next())
         
-        # Правильная генерация СНИЛС
-        main_digits = [random.randint(0, 9) for _ in range(9)]
-        control_number = calculate_snils_control_number(main_digits)
-        snils_main = ''.join(str(digit) for digit in main_digits)
-        snils = f"{snils_main} {control_number}"
+        # Правильная генерация СНИЛС с уникальной основной частью
+        snils = format_snils(snils_ids.next(), snils_format)
         
         personal_data.append([fio, passport, snils])
     
     return personal_data
 
-def generate_random_specialist(specialists_list: List[str]) -> str:
+def generate_random_specialist(specialists: Union[List[str], AliasSampler], rng=random) -> str:
     # Считается, что первая специальность - самая популярная
-    weights = [1/(i+1) for i in range(len(specialists_list))]
-    total = sum(weights)
-    normalized_weights = [w / total for w in weights]
-    return random.choices(specialists_list, weights=normalized_weights)[0]
+    # Готовую выборку (harmonic_sampler) лучше строить один раз и передавать сюда
+    if not isinstance(specialists, AliasSampler):
+        specialists = harmonic_sampler(specialists)
+    return specialists.draw(rng)
 
 
-def choose_symptoms(specialist: str, symptoms_dict: Dict[str, List[str]]) -> List[str]:
+def choose_symptoms(specialist: str, symptoms_dict: Dict[str, List[str]], rng=random) -> List[str]:
     symptoms = symptoms_dict.get(specialist, [])
-    count = random.randint(1, max(1, min(7, len(symptoms))))
-    return random.sample(symptoms, count)
+    count = rng.randint(1, max(1, min(MAX_SYMPTOMS, len(symptoms))))
+    return rng.sample(symptoms, count)
 
-def generate_random_datetime(min_time="09:00", max_time="21:00") -> str:
+def generate_random_datetime(min_time="09:00", max_time="21:00", rng=random) -> str:
     """
     Генерация случайной даты визита:
     - В пределах 2025 года
-    - В пределах рабочего времени
+    - В рабочие дни и часы (по рабочему календарю)
     - Минуты кратны 5
     """
-    start_date = datetime(2025, 1, 1)
-    end_date = datetime(2025, 12, 31)
-    delta = end_date - start_date
-    random_days = random.randint(0, delta.days)
-    random_date = start_date + timedelta(days=random_days)
-
-    min_h, min_m = map(int, min_time.split(':'))
-    max_h, max_m = map(int, max_time.split(':'))
-
-    hour = random.randint(min_h, max_h)
-    minute = random.choice(range(0, 60, 5))  # числа кратны 5 минутам
-
-    generated_datetime = datetime.combine(random_date, datetime.min.time()).replace(hour=hour, minute=minute)
-    return generated_datetime.strftime("%Y-%m-%dT%H:%M")
+    return format_minutes(draw_visit_minute(rng, min_time, max_time))
 
 
 def generate_analysis_datetime(visit_dt: str, min_hours: int = 24, max_hours: int = 72,
-                               min_work_time: str = "09:00", max_work_time: str = "12:00") -> str:
+                               min_work_time: str = "09:00", max_work_time: str = "12:00", rng=random) -> str:
     """
     Генерация даты анализа:
     - Через 24–72 часа после визита
     - Минуты кратны 5
-    - В первой половине дня
+    - В рабочие дни, в первой половине дня
     """
-    visit_dt_obj = datetime.strptime(visit_dt, "%Y-%m-%dT%H:%M")
-    delta_hours = random.randint(min_hours, max_hours)
-    analysis_dt = visit_dt_obj + timedelta(hours=delta_hours)
+    analysis = draw_analysis_minute(parse_minutes(visit_dt), rng, min_hours, max_hours, min_work_time, max_work_time)
+    return format_minutes(analysis)
 
-    # Рабочие часы
-    min_h, min_m = map(int, min_work_time.split(':'))
-    max_h, max_m = map(int, max_work_time.split(':'))
 
-    # Если анализ выпал вне рабочего времени, корректируем
-    if analysis_dt.hour < min_h or analysis_dt.hour > max_h:
-        analysis_dt = analysis_dt.replace(
-            hour=random.randint(min_h, max_h),
-            minute=random.choice(range(0, 60, 5))
-        )
+def generate_visit_and_analysis_datetimes(rng=random, specialist: str = None, schedule: Schedule = None) -> (str, str):
+    """
+    Дата визита и дата анализа одной парой: обе считаются в минутах
+    и форматируются в строки только на выходе.
+    schedule: расписание с часами приёма по специальностям (по умолчанию - общие часы)
+    """
+    if schedule is None:
+        visit, analysis = draw_visit_and_analysis(rng)
     else:
-        # Минуты кратны 5
-        analysis_dt = analysis_dt.replace(minute=(analysis_dt.minute // 5) * 5)
+        visit, analysis = schedule.draw_visit_and_analysis(specialist, rng)
+    return format_minutes(visit), format_minutes(analysis)
 
-    return analysis_dt.strftime("%Y-%m-%dT%H:%M")
 
-
-
-def generate_analyses(specialist: str, analyses_with_prices_dict: Dict[str, List[tuple]]) -> List[str]:
+def generate_analyses(specialist: str, analyses_with_prices_dict: Dict[str, List[tuple]], rng=random) -> List[str]:
     """
     Генерирует список анализов для специалиста
     analyses_with_prices_dict содержит кортежи: (название_анализа, цена)
     """
     analyses_with_prices = analyses_with_prices_dict.get(specialist, [])
-    
-    # Извлекаем только названия анализов (первый элемент кортежа)
-    analyses_names = [analysis[0] for analysis in analyses_with_prices]
-    
-    count = random.randint(1, max(1, min(5, len(analyses_names))))
-    selected_analyses = random.sample(analyses_names, count)
-    
-    return selected_analyses
 
-def calculate_cost_based_on_analyses(analyses: List[str], analyses_with_prices_dict: Dict[str, List[tuple]], specialist: str) -> float:
+    # Выбираются сами кортежи, названия (первый элемент) - только у выбранных:
+    # тот же выбор, что и по списку названий, без его построения на каждый вызов
+    count = rng.randint(1, max(1, min(MAX_ANALYSES, len(analyses_with_prices))))
+    return [analysis[0] for analysis in rng.sample(analyses_with_prices, count)]
+
+def build_price_maps(analyses_with_prices_dict: Dict[str, List[tuple]]) -> Dict[str, Dict[str, float]]:
+    """
+    Словари цен для каждой специальности: { специальность: { анализ: цена } }
+    """
+    return {
+        specialist: {analysis[0]: float(analysis[1]) for analysis in analyses}
+        for specialist, analyses in analyses_with_prices_dict.items()
+    }
+
+def calculate_cost_based_on_analyses(analyses: List[str], analyses_with_prices_dict: Dict[str, List[tuple]], specialist: str,
+                                     rng=random, price_maps: Dict[str, Dict[str, float]] = None) -> float:
     """
     Вычисляет стоимость на основе выбранных анализов
+    price_maps: готовые словари цен (build_price_maps), чтобы не строить их на каждую строку
     """
     total_cost = 0
-    available_analyses = analyses_with_prices_dict.get(specialist, [])
-    
-    # Создаем словарь для быстрого поиска цен
-    price_dict = {analysis[0]: float(analysis[1]) for analysis in available_analyses}
+    if price_maps is not None:
+        price_dict = price_maps.get(specialist, {})
+    else:
+        # Создаем словарь для быстрого поиска цен
+        available_analyses = analyses_with_prices_dict.get(specialist, [])
+        price_dict = {analysis[0]: float(analysis[1]) for analysis in available_analyses}
     
     for analysis in analyses:
         if analysis in price_dict:
             total_cost += price_dict[analysis]
         else:
             # Если цена не найдена, добавляем случайную стоимость
-            total_cost += random.uniform(500, 5000)
+            total_cost += rng.uniform(500, 5000)
     
     return round(total_cost, 2)
 
-def generate_one_card_2(bank_weights: dict, pay_system_weights: dict) -> str:
+
+def parse_weights(items: List[str], names: List[str], option: str) -> Dict[str, float]:
     """
-    Генерация карты с учетом весов банков и платежных систем.
+    Веса вида ИМЯ=ВЕС (неотрицательные); не указанные имена получают вес 1
     """
-    banks = list(bank_weights.keys())
-    pay_systems = list(pay_system_weights.keys())
-
-    bank = random.choices(banks, weights=list(bank_weights.values()))[0]
-    pay_system = random.choices(pay_systems, weights=list(pay_system_weights.values()))[0]
-
-    card_format = '{fig12} {fig3} {fig4}'
-    if pay_system == 'MIR':
-        if bank == 'SBERBANK OF RUSSIA':
-            figures = '2202 20'
-        elif bank == 'TINKOFF BANK':
-            figures = '2200 70'
-        elif bank == 'VTB BANK':
-            figures = '2200 40'
-        else:
-            figures = '2200 56'  # GAZPROMBANK
-    elif pay_system == 'MASTERCARD':
-        if bank == 'SBERBANK OF RUSSIA':
-            figures = '5228 60'
-        elif bank == 'TINKOFF BANK':
-            figures = '5389 94'
-        elif bank == 'VTB BANK':
-            figures = '5211 94'
-        else:
-            figures = '5112 23'  # GAZPROMBANK
-    else:  # VISA
-        if bank == 'SBERBANK OF RUSSIA':
-            figures = '4039 33'
-        elif bank == 'TINKOFF BANK':
-            figures = '4377 73'
-        elif bank == 'VTB BANK':
-            figures = '4986 29'
-        else:
-            figures = '4306 43'  # GAZPROMBANK
-
-    argz = {
-        'fig12': figures + str(random.randint(10, 99)),
-        'fig3': str(random.randint(1000, 9999)),
-        'fig4': str(random.randint(1000, 9999))
-    }
-
-    return card_format.format(**argz)
+    weights = {name: 1.0 for name in names}
+    for item in items or []:
+        name, sep, value = item.rpartition('=')
+        if not sep or name not in weights:
+            raise argparse.ArgumentTypeError(
+                f"{option}: ожидается ИМЯ=ВЕС, где ИМЯ одно из: {', '.join(names)} (получено {item!r})"
+            )
+        try:
+            weights[name] = float(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"{option}: вес должен быть числом (получено {item!r})") from None
+        if not weights[name] >= 0:
+            raise argparse.ArgumentTypeError(f"{option}: вес не может быть отрицательным (получено {item!r})")
+    if sum(weights.values()) <= 0:
+        raise argparse.ArgumentTypeError(f"{option}: сумма весов не может быть нулевой")
+    return weights
+
+
+def generate_one_card_2(bank_weights: dict, pay_system_weights: dict, rng=random,
+                        card_ids: UniqueIdSource = None) -> str:
+    """
+    Генерация карты с учетом весов банков и платёжных систем.
+    Префикс берётся из таблицы BIN (data/card_bins.csv) по совместным весам,
+    номер проходит проверку по алгоритму Луна.
+    card_ids: общий источник номеров счёта - номера уникальны только с ним
+    (iter_dataset_rows создаёт его на весь датасет)
+    """
+    return draw_card_number(bank_weights, pay_system_weights, rng, card_ids)
 
 def generate_one_card(
         personal: List[str], specialist: str, symptoms: List[str], visit_date: str,
@@ -311,8 +464,32 @@ def generate_one_card(
         "Карта_оплаты": payment_card
     }
 
-def create_personal_data(n=1000, names_dict=None, surnames_dict=None, patronymics_dict=None):
-    return generate_personal_data(n, names_dict, surnames_dict, patronymics_dict)
+def create_personal_data(n=1000, names_dict=None, surnames_dict=None, patronymics_dict=None, seed=None, rng=None,
+                         id_mode: str = 'permutation', passport_ids: UniqueIdSource = None,
+                         snils_ids: UniqueIdSource = None, snils_format: str = 'plain', fio_samplers: Dict = None):
+    return generate_personal_data(n, names_dict, surnames_dict, patronymics_dict, make_rng(seed, rng),
+                                  id_mode, passport_ids, snils_ids, snils_format, fio_samplers)
+
+def generate_one_row(
+        personal: List[str], specialist: str, symptoms: List[str], visit_date: str,
+        analyses: List[str], analysis_date: str, cost: float, payment_card: str
+    ) -> List[str]:
+    """
+    Строка вывода в порядке CSV_HEADERS без промежуточного словаря
+    (то же, что generate_one_output(generate_one_card(...)))
+    """
+    return [
+        personal[0],
+        personal[1],
+        personal[2],
+        ", ".join(symptoms),
+        specialist,
+        visit_date,
+        ", ".join(analyses),
+        analysis_date,
+        str(int(cost)),
+        payment_card
+    ]
 
 def generate_one_output(card: Dict) -> List[str]:
     # Форматируем словарь в список по нужному порядку
@@ -329,95 +506,126 @@ def generate_one_output(card: Dict) -> List[str]:
         card["Карта_оплаты"]
     ]
 
-def generate_dataset(
+def iter_dataset_rows(
     n: int,
     specialists_list: List[str],
     symptoms_dict: Dict[str, List[str]],
     analyses_with_prices_dict: Dict[str, List[tuple]],
     personal_data: List[List[str]],
     bank_weights: dict = None,
-    pay_system_weights: dict = None
-) -> List[List[str]]:
+    pay_system_weights: dict = None,
+    seed=None,
+    rng=None,
+    schedule: Schedule = None
+) -> Iterator[List[str]]:
+    """
+    Потоковая версия generate_dataset: выдаёт строки по одной, не накапливая датасет.
+    seed/rng: сид или готовый random.Random; одинаковый сид даёт одинаковый датасет
+    schedule: рабочий календарь визитов и анализов
+    """
+    rng = make_rng(seed, rng)
     # Если веса не заданы, создаем равные вероятности
     if bank_weights is None:
         bank_weights = {b: 1 for b in bank_names}
     if pay_system_weights is None:
         pay_system_weights = {ps: 1 for ps in painment_system_names}
 
-    dataset = []
+    specialist_sampler = harmonic_sampler(specialists_list)
+    price_maps = build_price_maps(analyses_with_prices_dict)
+    # Номера счетов карт - из перестановки: уникальны во всём датасете, как в пакетном движке
+    card_ids = UniqueIdSource(ACCOUNT_SPACE, rng=rng)
+
     for _ in range(n):
-        person = random.choice(personal_data)
-        specialist = generate_random_specialist(specialists_list)
-        visit_dt = generate_random_datetime()
-        symptoms = choose_symptoms(specialist, symptoms_dict)
+        person = rng.choice(personal_data)
+        specialist = generate_random_specialist(specialist_sampler, rng)
+        visit_dt, analysis_dt = generate_visit_and_analysis_datetimes(rng, specialist, schedule)
+        symptoms = choose_symptoms(specialist, symptoms_dict, rng)
 
-        analyses = generate_analyses(specialist, analyses_with_prices_dict)
-        analysis_dt = generate_analysis_datetime(visit_dt)
-        cost = calculate_cost_based_on_analyses(analyses, analyses_with_prices_dict, specialist)
+        analyses = generate_analyses(specialist, analyses_with_prices_dict, rng)
+        cost = calculate_cost_based_on_analyses(analyses, analyses_with_prices_dict, specialist, rng, price_maps)
 
         # Генерация карты с учетом весов
-        card = generate_one_card_2(bank_weights, pay_system_weights)
+        card = generate_one_card_2(bank_weights, pay_system_weights, rng, card_ids)
 
-        card_data = generate_one_card(person, specialist, symptoms, visit_dt, analyses, analysis_dt, cost, card)
-        output_row = generate_one_output(card_data)
-        dataset.append(output_row)
+        yield generate_one_row(person, specialist, symptoms, visit_dt, analyses, analysis_dt, cost, card)
 
-    return dataset
 
+def generate_dataset(
+    n: int,
+    specialists_list: List[str],
+    symptoms_dict: Dict[str, List[str]],
+    analyses_with_prices_dict: Dict[str, List[tuple]],
+    personal_data: List[List[str]],
+    bank_weights: dict = None,
+    pay_system_weights: dict = None,
+    seed=None,
+    rng=None
+) -> List[List[str]]:
+    return list(iter_dataset_rows(
+        n, specialists_list, symptoms_dict, analyses_with_prices_dict, personal_data,
+        bank_weights=bank_weights, pay_system_weights=pay_system_weights, seed=seed, rng=rng
+    ))
 
-def write_into_csv_file(data: List[List[str]], path: str = 'output/medical_dataset.csv'):
-    headers = ['ФИО', 'Паспорт', 'СНИЛС', 'Симптомы', 'Врач', 'Дата_посещения', 'Анализы', 'Дата_анализов', 'Стоимость', 'Карта_оплаты']
-    file_exists = os.path.isfile(path)
-    with open(path, mode='w', newline='', encoding='utf-8-sig') as file:
+
+def iter_chunks(rows: Iterable[List[str]], chunk_rows: int = DEFAULT_STREAM_CHUNK_ROWS) -> Iterator[List[List[str]]]:
+    """
+    Группирует поток строк в блоки фиксированного размера
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_into_csv_file(data: List[List[str]], path: str = 'output/medical_dataset.csv', append: bool = False):
+    """
+    Запись строк в CSV. По умолчанию файл перезаписывается вместе с заголовком;
+    append=True - строки дописываются в конец существующего файла
+    (заголовок и метка UTF-8 пишутся, только если файла ещё нет или он пуст).
+    """
+    headers = CSV_HEADERS
+    append = append and os.path.isfile(path) and os.path.getsize(path) > 0
+    # В режиме 'a' кодек utf-8-sig не пишет метку, если файл не пуст
+    with open(path, mode='a' if append else 'w', newline='', encoding='utf-8-sig') as file:
         writer = csv.writer(file, delimiter=';', quoting=csv.QUOTE_MINIMAL)
-        if not file_exists:
+        if not append:
             writer.writerow(headers)
         writer.writerows(data)
 
-if __name__ == "__main__":
-    # Пример загрузки данных
-    med_specialities = read_from_csv_file('data/medical_specialities.csv')
-    
-    # Разбор спец. в список строк для генерации
-    specialists_list = [row[1].strip() for row in med_specialities]
 
-    # Загрузить тесты и цены
-    med_tests_prices = read_from_csv_file('data/medical_tests_and_prices.csv')
-    
-    # Словарь для анализов с ценами
-    analyses_with_prices_dict = {}
+def write_csv_stream(chunks: Iterable[List[List[str]]], path: str = 'output/medical_dataset.csv',
+                     on_chunk=None) -> int:
+    """
+    Потоковая запись: блоки строк пишутся на диск по мере генерации,
+    в памяти одновременно находится только один блок.
+    on_chunk(rows_written) вызывается после записи каждого блока.
+    Возвращает количество записанных строк.
+    """
+    rows_written = 0
+    with open(path, mode='w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.writer(file, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(CSV_HEADERS)
+        for chunk in chunks:
+            writer.writerows(chunk)
+            file.flush()
+            rows_written += len(chunk)
+            if on_chunk is not None:
+                on_chunk(rows_written)
+    return rows_written
 
-    for spec_row, tests_row in zip(med_specialities, med_tests_prices):
-        spec = spec_row[1].strip()
-        
-        tests_with_prices = [item.strip() for item in tests_row if item.strip()]
-        
-        analyses = []
-        for item in tests_with_prices:
-            parts = [part.strip() for part in item.split(',', 1)]
-            if len(parts) >= 2:
-                # Сохраняем как кортеж (название, цена)
-                analyses.append((parts[0], parts[1]))
-            elif len(parts) == 1:
-                # Только название, без цены
-                analyses.append((parts[0], "0"))
-        
-        analyses_with_prices_dict[spec] = analyses
-    
-    symptoms_dict = {}
-    for row in med_specialities:
-        if len(row) >= 3:  # Проверяем, что есть симптомы
-            spec = row[1].strip()
-            symptoms = [s.strip() for s in row[2].split(',')]
-            symptoms_dict[spec] = symptoms
-        else:
-            print(f"Предупреждение: нет симптомов для специальности {row[0]}")
+if __name__ == "__main__":
+    # Справочники и выборки из скомпилированного кэша (CSV разбираются только при изменении)
+    from reference import default_reference
+    reference = default_reference()
+    specialists_list = reference.specialists_list
+    symptoms_dict = reference.symptoms_dict
+    analyses_with_prices_dict = reference.analyses_with_prices_dict
+    names_dict = reference.names_dict
+    surnames_dict = reference.surnames_dict
+    patronymics_dict = reference.patronymics_dict
 
-    # Загружаем словари для ФИО
-    names_dict = parse_personal_data_file("data/personal_data_name.csv")
-    surnames_dict = parse_personal_data_file("data/personal_data_surname.csv")
-    patronymics_dict = parse_personal_data_file("data/personal_data_patronymic.csv")
-    
     bank_weights = {
         'GAZPROMBANK': 5,
         'MTS BANK': 1,
@@ -432,20 +640,27 @@ if __name__ == "__main__":
         'MASTERCARD': 2
     }
         
+    # Сид для воспроизводимости (None - каждый запуск уникален)
+    seed = None
+
     # Генерация персональных данных (пример)
-    personal_data = create_personal_data(1000, names_dict, surnames_dict, patronymics_dict)
+    personal_data = create_personal_data(1000, names_dict, surnames_dict, patronymics_dict, seed=seed,
+                                         fio_samplers=reference.fio_samplers)
 
-    # Генерация датасета на 10 записей
-    dataset = generate_dataset(
+    # Потоковая генерация датасета на 10 записей (пакетный движок)
+    from batch import iter_dataset_chunks
+    chunks = iter_dataset_chunks(
         10,
         specialists_list,
         symptoms_dict,
         analyses_with_prices_dict,
         personal_data,
         bank_weights=bank_weights,
-        pay_system_weights=pay_system_weights
+        pay_system_weights=pay_system_weights,
+        seed=seed,
+        consistent=True
     )
 
-
-    # Запись в CSV
-    write_into_csv_file(dataset)
\ No newline at end of file
+    # Запись в CSV по мере генерации (быстрый блочный writer)
+    from writers import write_csv_fast
+    write_csv_fast(chunks)
\ No newline at end of file
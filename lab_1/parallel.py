@@ -0,0 +1,255 @@
+"""
+Многопроцессная генерация датасета по шардам.
+
+Требуемое количество строк делится на шарды, каждый шард генерируется
+в отдельном процессе со своим сидом, выведенным из одного главного сида
+через numpy.random.SeedSequence. Части склеиваются в фиксированном
+порядке шардов, поэтому при одинаковых сиде и количестве шардов
+результат побайтно совпадает независимо от количества процессов.
+
+Дочерний процесс может получить канал управления (init_worker_control):
+очередь прогресса и события отмены и паузы, которые проверяются
+после каждого блока строк (см. jobs.GenerationJob).
+"""
+import codecs
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict
+
+import numpy as np
+
+from main import CSV_HEADERS, DEFAULT_STREAM_CHUNK_ROWS, PASSPORT_SPACE, SNILS_SPACE
+from batch import BatchEngine, generate_personal_data_batch
+from cards import ACCOUNT_SPACE
+from unique import UniqueIdSource, FEISTEL_ROUNDS
+from registry import PatientRegistry, suggest_spread_days
+from writers import BulkCsvWriter, open_output
+
+
+def split_evenly(total: int, parts: int) -> List[int]:
+    """
+    Делит total на parts частей, отличающихся не больше чем на 1
+    """
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def shard_seeds(master: np.random.SeedSequence, shards: int) -> List[np.random.SeedSequence]:
+    """
+    Независимые воспроизводимые потоки сидов для каждого шарда
+    """
+    return master.spawn(shards)
+
+
+def shared_id_keys(master: np.random.SeedSequence) -> Dict[str, List[int]]:
+    """
+    Общие для всех шардов ключи перестановок паспортов, СНИЛС и карт.
+    Шарды берут из одной перестановки непересекающиеся диапазоны индексов,
+    поэтому идентификаторы уникальны во всём датасете.
+    """
+    state = master.generate_state(3 * FEISTEL_ROUNDS, dtype=np.uint64).tolist()
+    return {
+        'passport': state[:FEISTEL_ROUNDS],
+        'snils': state[FEISTEL_ROUNDS:2 * FEISTEL_ROUNDS],
+        'card': state[2 * FEISTEL_ROUNDS:],
+    }
+
+
+def part_path(path: str, shard: int) -> str:
+    return f"{path}.part{shard:04d}"
+
+
+# Канал управления дочернего процесса: (очередь прогресса, отмена, разрешение работы)
+_control = None
+
+
+def init_worker_control(progress, cancel, running):
+    """
+    Инициализатор процессов пула: после каждого блока шард отправляет
+    в progress кортеж (шард, строк в блоке), ждёт события running (пауза)
+    и прекращает работу при установленном cancel
+    """
+    global _control
+    _control = (progress, cancel, running)
+
+
+def _checkpoint(shard: int, rows: int) -> bool:
+    """
+    Сообщает о записанном блоке; возвращает False, если задание отменено
+    """
+    if _control is None:
+        return True
+    progress, cancel, running = _control
+    progress.put((shard, rows))
+    while not running.wait(0.2):
+        if cancel.is_set():
+            return False
+    return not cancel.is_set()
+
+
+def _generate_shard(task: Dict) -> Dict:
+    """
+    Генерирует один шард в файл части (без заголовка). Выполняется в дочернем процессе.
+    Возвращает количество записанных строк и длительность этапов в секундах.
+    """
+    started = time.perf_counter()
+    rng = np.random.default_rng(task['seed_seq'])
+
+    keys = task['id_keys']
+    personal_data = generate_personal_data_batch(
+        task['people'], task['names_dict'], task['surnames_dict'], task['patronymics_dict'], rng=rng,
+        passport_ids=UniqueIdSource(PASSPORT_SPACE, keys=keys['passport'], start=task['people_offset']),
+        snils_ids=UniqueIdSource(SNILS_SPACE, keys=keys['snils'], start=task['people_offset']),
+        snils_format=task['snils_format']
+    )
+    personal_done = time.perf_counter()
+    # Каждая строка выдаёт не больше одной новой карты, поэтому диапазон карт шарда - его строки
+    engine = BatchEngine(
+        task['specialists_list'], task['symptoms_dict'], task['analyses_with_prices_dict'],
+        task['bank_weights'], task['pay_system_weights'],
+        card_ids=UniqueIdSource(ACCOUNT_SPACE, keys=keys['card'], start=task['rows_offset'])
+    )
+
+    registry = None
+    if task['consistent']:
+        # Пациенты шарда не пересекаются с другими шардами, поэтому реестр локален
+        registry = PatientRegistry(len(personal_data), engine.schedule,
+                                   spread_days=suggest_spread_days(len(personal_data), task['rows']))
+
+    cancelled = False
+    with open(task['path'], mode='wb') as file:
+        writer = BulkCsvWriter(file)
+        for chunk in engine.iter_chunks(task['rows'], personal_data, task['chunk_size'], rng, registry):
+            writer.writerows(chunk)
+            if not _checkpoint(task['shard'], len(chunk)):
+                cancelled = True
+                break
+    finished = time.perf_counter()
+    return {
+        'rows': writer.rows_written,
+        'cancelled': cancelled,
+        'timings': {'personal_data': personal_done - started, 'rows': finished - personal_done},
+    }
+
+
+def merge_parts(parts: List[str], path: str, remove: bool = True, compression: str = 'infer'):
+    """
+    Склеивает файлы частей в один CSV с заголовком в порядке списка parts.
+    compression: сжатие итогового файла (см. writers.open_output)
+    """
+    with open_output(path, compression) as out:
+        out.write(codecs.BOM_UTF8)
+        BulkCsvWriter(out).writerow(CSV_HEADERS)
+        for part in parts:
+            with open(part, mode='rb') as src:
+                shutil.copyfileobj(src, out, 1 << 20)
+            if remove:
+                os.remove(part)
+
+
+def build_shard_tasks(
+    n: int,
+    people: int,
+    specialists_list: List[str],
+    symptoms_dict: Dict[str, List[str]],
+    analyses_with_prices_dict: Dict[str, List[tuple]],
+    names_dict,
+    surnames_dict,
+    patronymics_dict,
+    path: str,
+    bank_weights: dict = None,
+    pay_system_weights: dict = None,
+    seed: int = None,
+    shards: int = 1,
+    chunk_size: int = DEFAULT_STREAM_CHUNK_ROWS,
+    consistent: bool = False,
+    snils_format: str = 'plain'
+) -> List[Dict]:
+    """
+    Задания для _generate_shard: доли строк и пациентов, сиды и общие ключи идентификаторов
+    """
+    if people < 1:
+        raise ValueError("Количество пациентов должно быть положительным")
+    # У каждого шарда хотя бы одна строка и один свой пациент: шардов не больше строк и пациентов
+    shards = max(1, min(shards, n, people)) if n > 0 else 1
+
+    row_counts = split_evenly(n, shards)
+    people_counts = split_evenly(people, shards)
+    master = np.random.SeedSequence(seed)
+    seeds = shard_seeds(master, shards)
+    id_keys = shared_id_keys(master)
+
+    tasks = []
+    for shard in range(shards):
+        tasks.append({
+            'shard': shard,
+            'path': part_path(path, shard),
+            'rows': row_counts[shard],
+            'people': people_counts[shard],
+            'seed_seq': seeds[shard],
+            'id_keys': id_keys,
+            'people_offset': sum(people_counts[:shard]),
+            'rows_offset': sum(row_counts[:shard]),
+            'specialists_list': specialists_list,
+            'symptoms_dict': symptoms_dict,
+            'analyses_with_prices_dict': analyses_with_prices_dict,
+            'names_dict': names_dict,
+            'surnames_dict': surnames_dict,
+            'patronymics_dict': patronymics_dict,
+            'bank_weights': bank_weights,
+            'pay_system_weights': pay_system_weights,
+            'chunk_size': chunk_size,
+            'consistent': consistent,
+            'snils_format': snils_format,
+        })
+    return tasks
+
+
+def generate_dataset_parallel(
+    n: int,
+    people: int,
+    specialists_list: List[str],
+    symptoms_dict: Dict[str, List[str]],
+    analyses_with_prices_dict: Dict[str, List[tuple]],
+    names_dict,
+    surnames_dict,
+    patronymics_dict,
+    path: str = 'output/medical_dataset.csv',
+    bank_weights: dict = None,
+    pay_system_weights: dict = None,
+    seed: int = None,
+    shards: int = None,
+    workers: int = None,
+    chunk_size: int = DEFAULT_STREAM_CHUNK_ROWS,
+    merge: bool = True,
+    consistent: bool = False,
+    snils_format: str = 'plain',
+    compression: str = 'infer'
+) -> List[str]:
+    """
+    Генерирует n строк на people пациентов в shards шардах на workers процессах.
+    Каждый шард создаёт свою долю пациентов и строк.
+    consistent: вести реестр пациентов внутри каждого шарда.
+    snils_format: 'plain' или 'dashed' (см. format_snils_batch).
+    merge=True - части склеиваются в path, иначе остаются файлами path.partNNNN.
+    compression: сжатие склеенного файла ('infer' - по расширению path).
+    Возвращает список созданных файлов.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    tasks = build_shard_tasks(
+        n, people, specialists_list, symptoms_dict, analyses_with_prices_dict,
+        names_dict, surnames_dict, patronymics_dict, path, bank_weights, pay_system_weights,
+        seed, shards if shards is not None else workers, chunk_size, consistent, snils_format
+    )
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(_generate_shard, tasks))
+
+    parts = [task['path'] for task in tasks]
+    if not merge:
+        return parts
+    merge_parts(parts, path, compression=compression)
+    return [path]
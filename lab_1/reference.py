@@ -0,0 +1,285 @@
+"""
+Справочники генератора и их скомпилированный кэш.
+
+Разбор CSV из data/ (специальности, симптомы, анализы с ценами, словари ФИО)
+выполняется один раз; результат вместе с готовыми выборками сохраняется
+в pickle-файл .cache/reference.pickle. При следующем запуске кэш
+используется, если не изменился ни один исходный файл: сначала сравниваются
+размер и время изменения, при несовпадении - хэш содержимого (совпавший хэш
+с новым временем изменения сохраняется в кэш, чтобы не считать его снова).
+Кэш также привязан к хэшу исходного кода модулей, строящих справочники
+(CODE_MODULES): после правки разбора или выборок он строится заново.
+
+ReferenceData - ленивый доступ к справочникам: разбор (или чтение кэша)
+выполняется при первом обращении к любому полю. Объект передаётся
+в дочерние процессы только путями, каждый процесс загружает кэш сам.
+"""
+import hashlib
+import os
+import pickle
+import sys
+from functools import lru_cache
+from typing import List, Dict
+
+from main import (
+    read_from_csv_file, parse_personal_data_file, compile_name_dictionary, build_fio_samplers, build_price_maps
+)
+from samplers import harmonic_sampler
+from cards import load_bin_table
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+CACHE_PATH = os.path.join(BASE_DIR, '.cache', 'reference.pickle')
+
+# Увеличивается при изменении состава или формата кэша
+CACHE_VERSION = 3
+
+# Модули, код которых строит содержимое кэша (разбор, словари ФИО, выборки, таблица BIN).
+# Модуль, от которого начинает зависеть build_reference, добавляется сюда.
+CODE_MODULES = ('main.py', 'samplers.py', 'cards.py', 'reference.py')
+
+REFERENCE_FILES = {
+    'specialities': 'medical_specialities.csv',
+    'tests': 'medical_tests_and_prices.csv',
+    'names': 'personal_data_name.csv',
+    'surnames': 'personal_data_surname.csv',
+    'patronymics': 'personal_data_patronymic.csv',
+    'card_bins': 'card_bins.csv',
+}
+
+
+def parse_analyses(med_specialities: List[List[str]], med_tests_prices: List[List[str]]) -> Dict[str, List[tuple]]:
+    """
+    Словарь анализов с ценами: { специальность: [(анализ, цена), ...] }
+    Строки файла анализов соответствуют строкам файла специальностей.
+    """
+    analyses_with_prices_dict = {}
+    for spec_row, tests_row in zip(med_specialities, med_tests_prices):
+        spec = sys.intern(spec_row[1].strip())
+        tests_with_prices = [item.strip() for item in tests_row if item.strip()]
+        analyses = []
+        for item in tests_with_prices:
+            parts = [part.strip() for part in item.split(',', 1)]
+            if len(parts) >= 2:
+                # Сохраняем как кортеж (название, цена)
+                analyses.append((sys.intern(parts[0]), parts[1]))
+            elif len(parts) == 1:
+                # Только название, без цены
+                analyses.append((sys.intern(parts[0]), "0"))
+        analyses_with_prices_dict[spec] = analyses
+    return analyses_with_prices_dict
+
+
+def parse_symptoms(med_specialities: List[List[str]]) -> Dict[str, List[str]]:
+    """
+    Словарь симптомов: { специальность: [симптом, ...] }
+    """
+    symptoms_dict = {}
+    for row in med_specialities:
+        if len(row) >= 3:  # Проверяем, что есть симптомы
+            spec = sys.intern(row[1].strip())
+            symptoms_dict[spec] = [sys.intern(s.strip()) for s in row[2].split(',')]
+        else:
+            print(f"Предупреждение: нет симптомов для специальности {row[0]}")
+    return symptoms_dict
+
+
+def build_reference(data_dir: str = DATA_DIR) -> Dict:
+    """
+    Разбирает все справочники и строит выборки
+    """
+    def path(key):
+        return os.path.join(data_dir, REFERENCE_FILES[key])
+
+    med_specialities = read_from_csv_file(path('specialities'))
+    specialists_list = [sys.intern(row[1].strip()) for row in med_specialities]
+    analyses_with_prices_dict = parse_analyses(med_specialities, read_from_csv_file(path('tests')))
+    names_dict = compile_name_dictionary(parse_personal_data_file(path('names')))
+    surnames_dict = parse_personal_data_file(path('surnames'))
+    patronymics_dict = parse_personal_data_file(path('patronymics'))
+    return {
+        'specialists_list': specialists_list,
+        'symptoms_dict': parse_symptoms(med_specialities),
+        'analyses_with_prices_dict': analyses_with_prices_dict,
+        'price_maps': build_price_maps(analyses_with_prices_dict),
+        'names_dict': names_dict,
+        'surnames_dict': surnames_dict,
+        'patronymics_dict': patronymics_dict,
+        'fio_samplers': build_fio_samplers(names_dict, surnames_dict, patronymics_dict),
+        'specialist_sampler': harmonic_sampler(specialists_list),
+        'bin_table': load_bin_table(path('card_bins')),
+    }
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, mode='rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def code_digest() -> str:
+    """
+    sha256 исходного кода CODE_MODULES (считается один раз за процесс)
+    """
+    digest = hashlib.sha256()
+    for name in CODE_MODULES:
+        digest.update(name.encode())
+        digest.update(file_digest(os.path.join(BASE_DIR, name)).encode())
+    return digest.hexdigest()
+
+
+def source_stamps(data_dir: str = DATA_DIR, with_digest: bool = True) -> Dict[str, tuple]:
+    """
+    (размер, время изменения, sha256) каждого исходного файла
+    """
+    stamps = {}
+    for key, name in REFERENCE_FILES.items():
+        path = os.path.join(data_dir, name)
+        stat = os.stat(path)
+        stamps[key] = (stat.st_size, stat.st_mtime_ns, file_digest(path) if with_digest else None)
+    return stamps
+
+
+def _fresh_stamps(saved: Dict[str, tuple], data_dir: str) -> Dict[str, tuple]:
+    """
+    Отметки файлов, если кэш актуален, иначе None. Кэш актуален, если у каждого
+    файла совпали размер и время изменения, либо (после копирования или checkout)
+    совпал хэш содержимого - тогда в отметке файла заменяется время изменения.
+    """
+    if set(saved) != set(REFERENCE_FILES):
+        return None
+    stamps = {}
+    for key, name in REFERENCE_FILES.items():
+        path = os.path.join(data_dir, name)
+        stat = os.stat(path)
+        size, mtime, digest = saved[key]
+        if stat.st_size != size:
+            return None
+        if stat.st_mtime_ns != mtime:
+            if file_digest(path) != digest:
+                return None
+            mtime = stat.st_mtime_ns
+        stamps[key] = (size, mtime, digest)
+    return stamps
+
+
+def read_cache(cache_path: str = CACHE_PATH, data_dir: str = DATA_DIR) -> Dict:
+    """
+    Справочники из кэша или None, если кэша нет или он устарел
+    """
+    try:
+        with open(cache_path, mode='rb') as file:
+            bundle = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(bundle, dict) or bundle.get('version') != CACHE_VERSION:
+        return None
+    if bundle.get('code') != code_digest() or bundle.get('data_dir') != os.path.abspath(data_dir):
+        return None
+    stamps = _fresh_stamps(bundle['stamps'], data_dir)
+    if stamps is None:
+        return None
+    if stamps != bundle['stamps']:
+        # Изменилось только время файлов: новые отметки избавляют следующие запуски от хэширования
+        bundle['stamps'] = stamps
+        try:
+            _dump_bundle(bundle, cache_path)
+        except OSError:
+            pass
+    return bundle['reference']
+
+
+def write_cache(reference: Dict, cache_path: str = CACHE_PATH, data_dir: str = DATA_DIR):
+    """
+    Атомарная запись кэша: временный файл заменяет старый целиком
+    """
+    _dump_bundle({
+        'version': CACHE_VERSION,
+        'code': code_digest(),
+        'data_dir': os.path.abspath(data_dir),
+        'stamps': source_stamps(data_dir),
+        'reference': reference,
+    }, cache_path)
+
+
+def _dump_bundle(bundle: Dict, cache_path: str):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, mode='wb') as file:
+        pickle.dump(bundle, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+
+def load_reference(data_dir: str = DATA_DIR, cache_path: str = CACHE_PATH, use_cache: bool = True) -> Dict:
+    """
+    Справочники и выборки: из кэша, если он актуален, иначе разбором CSV
+    с последующим обновлением кэша. cache_path=None или use_cache=False - без кэша.
+    """
+    if not use_cache or cache_path is None:
+        return build_reference(data_dir)
+    reference = read_cache(cache_path, data_dir)
+    if reference is not None:
+        return reference
+    reference = build_reference(data_dir)
+    try:
+        write_cache(reference, cache_path, data_dir)
+    except OSError as e:
+        print(f"Предупреждение: не удалось сохранить кэш справочников: {e}")
+    return reference
+
+
+def _field(name: str) -> property:
+    return property(lambda self: self.bundle[name], doc=f"Поле справочников {name!r} (загружается при первом обращении)")
+
+
+class ReferenceData:
+    """
+    Ленивые справочники: загрузка при первом обращении к любому полю.
+    При передаче в другой процесс сериализуются только пути.
+    """
+    __slots__ = ('data_dir', 'cache_path', 'use_cache', '_bundle')
+
+    def __init__(self, data_dir: str = DATA_DIR, cache_path: str = CACHE_PATH, use_cache: bool = True):
+        self.data_dir = data_dir
+        self.cache_path = cache_path
+        self.use_cache = use_cache
+        self._bundle = None
+
+    def __reduce__(self):
+        return ReferenceData, (self.data_dir, self.cache_path, self.use_cache)
+
+    @property
+    def loaded(self) -> bool:
+        return self._bundle is not None
+
+    @property
+    def bundle(self) -> Dict:
+        if self._bundle is None:
+            self._bundle = load_reference(self.data_dir, self.cache_path, self.use_cache)
+        return self._bundle
+
+    def reload(self) -> 'ReferenceData':
+        self._bundle = None
+        return self
+
+    specialists_list = _field('specialists_list')
+    symptoms_dict = _field('symptoms_dict')
+    analyses_with_prices_dict = _field('analyses_with_prices_dict')
+    price_maps = _field('price_maps')
+    names_dict = _field('names_dict')
+    surnames_dict = _field('surnames_dict')
+    patronymics_dict = _field('patronymics_dict')
+    fio_samplers = _field('fio_samplers')
+    specialist_sampler = _field('specialist_sampler')
+    bin_table = _field('bin_table')
+
+
+@lru_cache(maxsize=None)
+def default_reference() -> ReferenceData:
+    """
+    Общий для процесса объект справочников из data/
+    """
+    return ReferenceData()
@@ -0,0 +1,276 @@
+"""
+Реестр пациентов: согласованные истории визитов и карт оплаты.
+
+Для каждого пациента хранится компактное состояние в массивах array:
+минута, раньше которой нельзя назначить следующий визит (анализы + 24 ч),
+и текущая карта (индекс префикса, номер счёта и счётчик использований).
+Следующий пациент выбирается из кучи по времени доступности,
+поэтому ранее сгенерированные строки никогда не пересматриваются.
+"""
+import heapq
+from array import array
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+from worktime import DAYS_IN_YEAR, MINUTES_PER_DAY, Schedule, default_schedule
+
+# Максимальное количество оплат одной картой (ограничение C.11 из README)
+MAX_CARD_USES = 5
+
+# Повторный визит - не раньше чем через 24 часа после получения анализов
+REVISIT_GAP_MINUTES = 24 * 60
+
+# Визитов на пациента, которые реестр заведомо размещает в году. Цикл визита -
+# в среднем около 4 дней (анализы через 24-72 рабочих часа, пауза 24 ч, окно выбора),
+# на практике реестр исчерпывается примерно на 90 визитах на пациента
+MAX_VISITS_PER_PATIENT = 80
+
+# Ключ кучи: (доступность << PATIENT_BITS) | номер пациента
+PATIENT_BITS = 32
+
+
+def suggest_spread_days(patients: int, rows: int) -> float:
+    """
+    Ширина окна (в днях), в котором выбирается следующий визит пациента,
+    чтобы rows визитов на patients пациентов уложились в один год
+    """
+    if rows <= 0:
+        return float(DAYS_IN_YEAR)
+    # Каждый визит занимает в среднем половину окна плюс ~4 дня на анализы и паузу
+    return min(float(DAYS_IN_YEAR), max(1.0, 2 * (DAYS_IN_YEAR * patients / rows - 4)))
+
+
+def check_capacity(patients: int, rows: int):
+    """
+    ValueError, если rows визитов не уместить в году на patients пациентов.
+    Проверка консервативна: запросы чуть ниже фактического предела тоже отклоняются.
+    """
+    if rows > patients * MAX_VISITS_PER_PATIENT:
+        raise ValueError(f"Недостаточно пациентов: {rows} визитов на {patients} пациентов, "
+                         f"в году не больше {MAX_VISITS_PER_PATIENT} визитов на пациента")
+
+
+class PatientRegistry:
+    """
+    Состояние пациентов для генерации многократных визитов:
+    - повторный визит не раньше чем через 24 часа после предыдущих анализов;
+    - у пациента одна текущая карта, карта используется не больше max_card_uses раз.
+    Номера карт создаются снаружи (add_cards); реестр хранит для каждого
+    пациента только текущую карту - индекс префикса BIN и номер счёта,
+    строка номера собирается при выводе. Память - O(пациентов), а не O(строк).
+    """
+    __slots__ = ('patients', 'schedule', 'max_card_uses', 'spread_minutes', 'available',
+                 'card_of', 'card_uses', 'card_prefix', 'card_account', 'cards_issued',
+                 '_pending', '_heap')
+
+    def __init__(self, patients: int, schedule: Schedule = None,
+                 max_card_uses: int = MAX_CARD_USES, spread_days: float = DAYS_IN_YEAR):
+        if patients <= 0:
+            raise ValueError("Количество пациентов должно быть положительным")
+        if patients >= 1 << PATIENT_BITS:
+            raise ValueError("Слишком много пациентов для реестра")
+        self.patients = patients
+        self.schedule = schedule if schedule is not None else default_schedule()
+        self.max_card_uses = max_card_uses
+        self.spread_minutes = max(1, int(spread_days * MINUTES_PER_DAY))
+
+        self.available = array('q', bytes(8 * patients))
+        # Текущая карта пациента: порядковый номер выдачи (-1 - карты нет),
+        # количество оплат, индекс префикса BIN и номер счёта
+        self.card_of = array('q', [-1]) * patients
+        self.card_uses = bytearray(patients)
+        self.card_prefix = array('q', [-1]) * patients
+        self.card_account = array('q', [-1]) * patients
+        self.cards_issued = 0
+        # Пациенты, получившие карту в текущем блоке, в порядке выдачи
+        self._pending: List[int] = []
+        # Изначально все пациенты доступны с начала года
+        self._heap = list(range(patients))
+
+    def __len__(self) -> int:
+        return self.patients
+
+    @property
+    def pending_cards(self) -> int:
+        """
+        Количество выданных в последнем блоке карт, для которых ещё не создан номер
+        """
+        return len(self._pending)
+
+    def add_cards(self, columns: Dict[str, np.ndarray], prefix: np.ndarray, account: np.ndarray):
+        """
+        Номера (индекс префикса и номер счёта) карт, выданных при назначении блока columns,
+        в порядке выдачи; заполняет колонки card_prefix и card_account этих строк
+        """
+        first = self.cards_issued - len(self._pending)
+        for offset, patient in enumerate(self._pending):
+            # Карта могла смениться ещё в этом блоке - тогда номер нужен только строкам
+            if self.card_of[patient] == first + offset:
+                self.card_prefix[patient] = int(prefix[offset])
+                self.card_account[patient] = int(account[offset])
+        self._pending = []
+        new = columns['card'] >= first
+        columns['card_prefix'][new] = np.asarray(prefix)[columns['card'][new] - first]
+        columns['card_account'][new] = np.asarray(account)[columns['card'][new] - first]
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """
+        Состояние реестра компактными массивами по пациентам (для контрольных точек,
+        см. checkpoint.py). Номера счетов карт не сохраняются: это значения перестановки
+        в точке порядкового номера выдачи, их восстанавливает from_state. Куча хранится
+        номерами пациентов - ключ собирается из available. Расписание не сохраняется -
+        при восстановлении передаётся заново.
+        """
+        if self._pending:
+            raise ValueError("Есть карты без номеров - состояние сохраняется только между блоками")
+        available = np.frombuffer(self.available, dtype=np.int64)
+        if self.patients and available.max() >= 1 << 31:
+            raise ValueError("Минута доступности не помещается в int32")
+        return {
+            'settings': np.array([self.patients, self.max_card_uses, self.spread_minutes, self.cards_issued],
+                                 dtype=np.int64),
+            'available': available.astype(np.int32),
+            'card_of': np.frombuffer(self.card_of, dtype=np.int64),
+            'card_uses': np.frombuffer(bytes(self.card_uses), dtype=np.uint8),
+            'card_prefix': np.frombuffer(self.card_prefix, dtype=np.int64).astype(np.int16),
+            'heap': (np.array(self._heap, dtype=np.int64) & ((1 << PATIENT_BITS) - 1)).astype(np.uint32),
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray], schedule: Schedule = None,
+                   account_of=None) -> 'PatientRegistry':
+        """
+        Реестр из state(). account_of - номера счетов карт по номерам выдачи
+        (например, FeistelPermutation.batch источника номеров карт);
+        без него номера счетов остаются -1, если карт ещё не выдано.
+        """
+        patients, max_card_uses, spread_minutes, cards_issued = (int(v) for v in state['settings'])
+        registry = cls(patients, schedule, max_card_uses)
+        registry.spread_minutes = spread_minutes
+        registry.cards_issued = cards_issued
+        available = state['available'].astype(np.int64)
+        card_of = state['card_of'].astype(np.int64)
+        registry.available = array('q', available.tobytes())
+        registry.card_of = array('q', card_of.tobytes())
+        registry.card_uses = bytearray(state['card_uses'].tobytes())
+        registry.card_prefix = array('q', state['card_prefix'].astype(np.int64).tobytes())
+        has_card = card_of >= 0
+        if has_card.any():
+            if account_of is None:
+                raise ValueError("Для восстановления номеров карт нужен account_of")
+            card_account = np.full(patients, -1, dtype=np.int64)
+            card_account[has_card] = account_of(card_of[has_card].astype(np.uint64))
+            registry.card_account = array('q', card_account.tobytes())
+        # Порядок кучи сохраняется как есть - heapq продолжит с того же места
+        heap = state['heap'].astype(np.int64)
+        registry._heap = ((available[heap] << PATIENT_BITS) | heap).tolist()
+        return registry
+
+    def _pop_patients(self, rows: np.ndarray, specialist_idx: np.ndarray,
+                      slot_arrays: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Пациенты для строк rows по порядку доступности и индекс первого слота приёма
+        не раньше доступности. Возвращает (ключи кучи, индексы слотов); ключ -1 -
+        строке не хватило пациентов.
+        """
+        heap = self._heap
+        keys = np.full(len(rows), -1, dtype=np.int64)
+        lo = np.zeros(len(rows), dtype=np.int64)
+        waiting = np.arange(len(rows))
+        while len(waiting) and heap:
+            waiting = waiting[:len(heap)]
+            keys[waiting] = [heapq.heappop(heap) for _ in range(len(waiting))]
+            groups = specialist_idx[rows[waiting]]
+            available = keys[waiting] >> PATIENT_BITS
+            free = np.empty(len(waiting), dtype=bool)
+            for group in np.unique(groups).tolist():
+                part = groups == group
+                slots = slot_arrays[group]
+                found = np.searchsorted(slots, available[part])
+                lo[waiting[part]] = found
+                free[part] = found < len(slots)
+            # Для этого пациента в году не осталось слотов - он выбывает, строка берёт следующего
+            keys[waiting[~free]] = -1
+            waiting = waiting[~free]
+        return keys, lo
+
+    def assign(self, specialist_idx: np.ndarray, specialists: List[str],
+               rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """
+        Назначает пациента, визит, анализ и карту каждой строке блока.
+        Возвращает колонки person, visit, analysis, card (номер выдачи карты),
+        card_prefix и card_account; у карт, выданных в этом блоке, номера
+        заполняет add_cards (их количество - pending_cards).
+
+        Строки назначаются раундами: из кучи по порядку доступности берётся
+        по пациенту на строку (не больше, чем пациентов в куче), затем визиты,
+        анализы и карты раунда разыгрываются векторно, и пациенты возвращаются
+        в кучу. Поэтому в одном раунде пациент встречается не больше одного раза.
+        """
+        n = len(specialist_idx)
+        person = np.empty(n, dtype=np.int64)
+        visit = np.empty(n, dtype=np.int64)
+        analysis = np.empty(n, dtype=np.int64)
+        card = np.empty(n, dtype=np.int64)
+
+        heap = self._heap
+        mask = (1 << PATIENT_BITS) - 1
+        schedule = self.schedule
+        slot_arrays = [schedule.visit_slot_array(spec) for spec in specialists]
+        min_delay = schedule.min_hours * 60
+        max_delay = schedule.max_hours * 60
+        available_of = np.frombuffer(self.available, dtype=np.int64)
+        card_of = np.frombuffer(self.card_of, dtype=np.int64)
+        card_uses = np.frombuffer(self.card_uses, dtype=np.uint8)
+
+        todo = np.arange(n)
+        while len(todo):
+            rows = todo[:len(heap)]
+            keys, lo = self._pop_patients(rows, specialist_idx, slot_arrays)
+            taken = keys >= 0
+            if not taken.any():
+                raise ValueError("Недостаточно пациентов: все визиты года уже распределены")
+            todo = np.concatenate((rows[~taken], todo[len(rows):]))
+            rows, keys, lo = rows[taken], keys[taken], lo[taken]
+            patient = keys & mask
+            available = keys >> PATIENT_BITS
+
+            # Визит - случайный слот в окне spread_minutes после доступности (хотя бы первый свободный)
+            round_visit = np.empty(len(rows), dtype=np.int64)
+            groups = specialist_idx[rows]
+            for group in np.unique(groups).tolist():
+                part = groups == group
+                slots = slot_arrays[group]
+                start = lo[part]
+                end = np.maximum(start + 1, np.searchsorted(slots, available[part] + self.spread_minutes))
+                round_visit[part] = slots[start + (rng.random(len(start)) * (end - start)).astype(np.int64)]
+            round_analysis = schedule.analysis_calendar.draw_between_batch(
+                round_visit + min_delay, round_visit + max_delay, rng
+            )
+
+            # Новая карта - у пациента без карты или с исчерпанным лимитом оплат,
+            # номера выдачи идут в порядке строк
+            issued = patient[(card_of[patient] < 0) | (card_uses[patient] >= self.max_card_uses)]
+            card_of[issued] = self.cards_issued + np.arange(len(issued))
+            card_uses[issued] = 0
+            self.cards_issued += len(issued)
+            self._pending.extend(issued.tolist())
+            card_uses[patient] += 1
+
+            next_available = round_analysis + REVISIT_GAP_MINUTES
+            available_of[patient] = next_available
+            for key in ((next_available << PATIENT_BITS) | patient).tolist():
+                heapq.heappush(heap, key)
+
+            person[rows] = patient
+            visit[rows] = round_visit
+            analysis[rows] = round_analysis
+            card[rows] = card_of[patient]
+
+        # Номера карт пациентов не меняются до add_cards, поэтому строкам с картами,
+        # выданными до блока, подходят текущие; номера новых карт заполнит add_cards
+        card_prefix = np.frombuffer(self.card_prefix, dtype=np.int64)[person]
+        card_account = np.frombuffer(self.card_account, dtype=np.int64)[person]
+        return {'person': person, 'visit': visit, 'analysis': analysis, 'card': card,
+                'card_prefix': card_prefix, 'card_account': card_account}
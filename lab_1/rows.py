@@ -0,0 +1,146 @@
+"""
+Компактное внутреннее представление строк датасета.
+
+Блок строк хранится параллельными массивами целых кодов: номер пациента,
+номер специальности, коды симптомов и анализов (смещения + коды, как в CSR),
+минуты визита и анализов, стоимость в копейках и номер карты.
+Строки CSV собираются только при сериализации (RowBlock.to_rows),
+поэтому промежуточная память на строку - десятки байт вместо словаря
+из десяти строк.
+"""
+from typing import List, Dict
+
+import numpy as np
+
+from worktime import format_minutes_batch
+from cards import card_numbers_batch
+
+# Разделитель элементов списков в строке вывода
+LIST_SEPARATOR = ", "
+
+
+class RowVocabulary:
+    """
+    Словари для декодирования блоков: специальности, симптомы, анализы
+    (в порядке справочников, без повторов) и префиксы карт
+    """
+    __slots__ = ('specialists', 'symptoms', 'analyses', 'card_prefixes', 'symptom_codes', 'analysis_codes')
+
+    def __init__(self, specialists: List[str], symptoms_dict: Dict[str, List[str]],
+                 analyses_with_prices_dict: Dict[str, List[tuple]], card_prefixes: List[str] = None):
+        self.specialists = list(specialists)
+        self.symptoms = list(dict.fromkeys(s for spec in self.specialists for s in symptoms_dict.get(spec, [])))
+        self.analyses = list(dict.fromkeys(
+            item[0] for spec in self.specialists for item in analyses_with_prices_dict.get(spec, [])
+        ))
+        self.card_prefixes = card_prefixes
+
+        # Коды симптомов и анализов каждой специальности в порядке справочника
+        symptom_code = {value: code for code, value in enumerate(self.symptoms)}
+        analysis_code = {value: code for code, value in enumerate(self.analyses)}
+        self.symptom_codes = [[symptom_code[s] for s in symptoms_dict.get(spec, [])] for spec in self.specialists]
+        self.analysis_codes = [
+            [analysis_code[item[0]] for item in analyses_with_prices_dict.get(spec, [])] for spec in self.specialists
+        ]
+
+
+class RowBlock:
+    """
+    Блок строк в целочисленных кодах.
+    symptoms/analyses - коды i-й строки лежат в *_codes[*_offsets[i]:*_offsets[i + 1]].
+    card_prefix (индекс BIN) и card_account (номер счёта) - номер карты,
+    строка номера собирается только при выводе.
+    """
+    __slots__ = ('vocabulary', 'person', 'specialist', 'symptom_offsets', 'symptom_codes',
+                 'visit', 'analysis_offsets', 'analysis_codes', 'analysis', 'cost_kopecks',
+                 'card_prefix', 'card_account')
+
+    def __init__(self, vocabulary: RowVocabulary, person: np.ndarray, specialist: np.ndarray,
+                 symptom_offsets: np.ndarray, symptom_codes: np.ndarray, visit: np.ndarray,
+                 analysis_offsets: np.ndarray, analysis_codes: np.ndarray, analysis: np.ndarray,
+                 cost_kopecks: np.ndarray, card_prefix: np.ndarray, card_account: np.ndarray):
+        self.vocabulary = vocabulary
+        self.person = person
+        self.specialist = specialist
+        self.symptom_offsets = symptom_offsets
+        self.symptom_codes = symptom_codes
+        self.visit = visit
+        self.analysis_offsets = analysis_offsets
+        self.analysis_codes = analysis_codes
+        self.analysis = analysis
+        self.cost_kopecks = cost_kopecks
+        self.card_prefix = card_prefix
+        self.card_account = card_account
+
+    def __len__(self) -> int:
+        return len(self.person)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Память под коды блока (без общих словарей)
+        """
+        arrays = (self.person, self.specialist, self.symptom_offsets, self.symptom_codes, self.visit,
+                  self.analysis_offsets, self.analysis_codes, self.analysis, self.cost_kopecks,
+                  self.card_prefix, self.card_account)
+        return sum(array.nbytes for array in arrays)
+
+    def slice(self, start: int, stop: int) -> 'RowBlock':
+        """
+        Строки [start, stop) блока; списки симптомов и анализов пересчитываются от нуля
+        """
+        symptom_offsets = self.symptom_offsets[start:stop + 1]
+        analysis_offsets = self.analysis_offsets[start:stop + 1]
+        part = slice(start, stop)
+        return RowBlock(
+            self.vocabulary, self.person[part], self.specialist[part],
+            symptom_offsets - symptom_offsets[0],
+            self.symptom_codes[symptom_offsets[0]:symptom_offsets[-1]],
+            self.visit[part],
+            analysis_offsets - analysis_offsets[0],
+            self.analysis_codes[analysis_offsets[0]:analysis_offsets[-1]],
+            self.analysis[part], self.cost_kopecks[part],
+            self.card_prefix[part], self.card_account[part],
+        )
+
+    def card_strings(self) -> List[str]:
+        return card_numbers_batch(self.vocabulary.card_prefixes, self.card_prefix, self.card_account)
+
+    def cost_strings(self) -> List[str]:
+        # Стоимость выводится целым числом рублей (как str(int(cost)))
+        return [str(kopecks) for kopecks in (self.cost_kopecks // 100).tolist()]
+
+    def to_rows(self, personal_data: List[List[str]]) -> List[List[str]]:
+        """
+        Декодирует блок в строки вывода в порядке CSV_HEADERS
+        """
+        vocabulary = self.vocabulary
+        specialists = vocabulary.specialists
+        symptoms = vocabulary.symptoms
+        analyses = vocabulary.analyses
+
+        visit_str = format_minutes_batch(self.visit)
+        analysis_str = format_minutes_batch(self.analysis)
+        cost_str = self.cost_strings()
+        cards = self.card_strings()
+        symptom_offsets = self.symptom_offsets.tolist()
+        symptom_codes = self.symptom_codes.tolist()
+        analysis_offsets = self.analysis_offsets.tolist()
+        analysis_codes = self.analysis_codes.tolist()
+
+        rows = []
+        for i, (p_idx, s_idx) in enumerate(zip(self.person.tolist(), self.specialist.tolist())):
+            person = personal_data[p_idx]
+            rows.append([
+                person[0],
+                person[1],
+                person[2],
+                LIST_SEPARATOR.join([symptoms[c] for c in symptom_codes[symptom_offsets[i]:symptom_offsets[i + 1]]]),
+                specialists[s_idx],
+                visit_str[i],
+                LIST_SEPARATOR.join([analyses[c] for c in analysis_codes[analysis_offsets[i]:analysis_offsets[i + 1]]]),
+                analysis_str[i],
+                cost_str[i],
+                cards[i]
+            ])
+        return rows
@@ -0,0 +1,209 @@
+"""
+Выборка элементов с весами за O(1) по предвычисленным таблицам.
+"""
+import random
+from typing import List, Dict, Sequence, Tuple
+
+import numpy as np
+
+# Наибольшее количество случайных ключей в одном проходе SubsetSampler.sample
+MAX_SUBSET_KEYS = 1 << 20
+
+
+class AliasSampler:
+    """
+    Таблица псевдонимов (метод Уолкера, построение по Воузу).
+    Строится один раз за O(N), после чего каждый выбор стоит O(1):
+    одна равномерная ячейка и одно сравнение с её порогом.
+    """
+    __slots__ = ('values', 'prob', 'alias', '_prob_np', '_alias_np')
+
+    def __init__(self, values: Sequence, weights: Sequence[float]):
+        n = len(values)
+        if n == 0:
+            raise ValueError("Нельзя построить выборку по пустому списку")
+        if len(weights) != n:
+            raise ValueError("Количество весов не совпадает с количеством значений")
+        total = float(sum(weights))
+        if total <= 0:
+            raise ValueError("Сумма весов должна быть положительной")
+
+        scaled = [w * n / total for w in weights]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+        # Оставшиеся ячейки заполнены целиком (погрешности округления)
+
+        self.values = list(values)
+        self.prob = prob
+        self.alias = alias
+        self._prob_np = np.array(prob, dtype=np.float64)
+        self._alias_np = np.array(alias, dtype=np.int64)
+
+    @classmethod
+    def from_pairs(cls, pairs: List[tuple]) -> 'AliasSampler':
+        """
+        Строит выборку по списку (значение, вероятность) - формату parse_personal_data_file
+        """
+        return cls([item[0] for item in pairs], [item[1] for item in pairs])
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def draw_index(self, rng=random) -> int:
+        u = rng.random() * len(self.prob)
+        i = int(u)
+        return i if u - i < self.prob[i] else self.alias[i]
+
+    def draw(self, rng=random):
+        return self.values[self.draw_index(rng)]
+
+    def sample_indices(self, k: int, rng: np.random.Generator = None) -> np.ndarray:
+        """
+        k независимых выборов (с возвращением) одним векторным проходом
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        i = rng.integers(0, len(self.prob), size=k)
+        u = rng.random(size=k)
+        return np.where(u < self._prob_np[i], i, self._alias_np[i])
+
+    def sample(self, k: int, rng: np.random.Generator = None) -> list:
+        values = self.values
+        return [values[i] for i in self.sample_indices(k, rng).tolist()]
+
+
+class SubsetSampler:
+    """
+    Наборы различных элементов переменной длины сразу для блока строк.
+    Элементы всех групп (например, симптомы каждой специальности) лежат
+    подряд в общем пуле: группа g занимает позиции starts[g]..starts[g] + sizes[g].
+    Размер набора - равномерно от 1 до min(max_size, размер группы),
+    состав - случайные ключи и выбор k наименьших (как random.sample).
+    """
+    __slots__ = ('starts', 'sizes', 'max_size')
+
+    def __init__(self, group_sizes: Sequence[int], max_size: int):
+        if max_size < 1:
+            raise ValueError("Размер набора должен быть положительным")
+        self.sizes = np.asarray(group_sizes, dtype=np.int64)
+        self.starts = np.concatenate(([0], np.cumsum(self.sizes)[:-1])).astype(np.int64)
+        self.max_size = max_size
+
+    @classmethod
+    def from_groups(cls, groups: List[Sequence], max_size: int) -> 'SubsetSampler':
+        return cls([len(group) for group in groups], max_size)
+
+    def sample(self, groups: np.ndarray, rng: np.random.Generator = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Набор для каждой строки с группой groups[i].
+        Возвращает (offsets, indices) в формате CSR: позиции в общем пуле
+        для строки i - indices[offsets[i]:offsets[i + 1]], в случайном порядке.
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        groups = np.asarray(groups, dtype=np.int64)
+        sizes = self.sizes[groups]
+        # Пустая группа даёт пустой набор
+        counts = np.minimum(rng.integers(1, np.maximum(1, np.minimum(self.max_size, sizes)) + 1), sizes)
+        offsets = np.zeros(len(groups) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        indices = np.empty(int(offsets[-1]), dtype=np.int64)
+
+        # Строки с группами одного размера разыгрываются вместе
+        for size in np.unique(sizes).tolist():
+            if size == 0:
+                continue
+            k = min(self.max_size, size)
+            rows = np.flatnonzero(sizes == size)
+            step = max(1, MAX_SUBSET_KEYS // size)
+            for begin in range(0, len(rows), step):
+                part = rows[begin:begin + step]
+                keys = rng.random((len(part), size))
+                if k < size:
+                    top = np.argpartition(keys, k - 1, axis=1)[:, :k]
+                    # k наименьших ключей по возрастанию: первые count - случайный набор
+                    top = np.take_along_axis(top, np.argsort(np.take_along_axis(keys, top, axis=1), axis=1), axis=1)
+                else:
+                    top = np.argsort(keys, axis=1)
+                taken = np.arange(k) < counts[part][:, None]
+                destination = (offsets[part][:, None] + np.arange(k))[taken]
+                indices[destination] = (self.starts[groups[part]][:, None] + top)[taken]
+        return offsets, indices
+
+
+def build_gender_samplers(data: Dict[str, List[tuple]]) -> Dict[str, AliasSampler]:
+    """
+    Выборки по каждому полу из словаря { "M": [(значение, вероятность), ...], "F": [...] }
+    Пустые списки пропускаются.
+    """
+    return {gender: AliasSampler.from_pairs(pairs) for gender, pairs in data.items() if pairs}
+
+
+def harmonic_sampler(values: List[str]) -> AliasSampler:
+    """
+    Выборка, в которой первый элемент самый популярный (веса 1/(i+1))
+    """
+    return AliasSampler(values, [1 / (i + 1) for i in range(len(values))])
+
+
+class NameDictionary:
+    """
+    Скомпилированный словарь имён, строится один раз при загрузке.
+    Хранит общую выборку по именам обоих полов, индекс имя -> пол,
+    выборки по каждому полу и список имён, встречающихся у обоих полов.
+    """
+    __slots__ = ('sampler', 'genders', 'gender_of', 'by_gender', 'ambiguous')
+
+    def __init__(self, names_dict: Dict[str, List[tuple]]):
+        # Порядок как в исходном names_dict["M"] + names_dict["F"]
+        order = [g for g in ("M", "F") if g in names_dict]
+        order += [g for g in names_dict if g not in order]
+
+        pairs = []
+        genders = []
+        gender_of = {}
+        seen = {}
+        for gender in order:
+            for value, prob in names_dict[gender]:
+                pairs.append((value, prob))
+                genders.append(gender)
+                # Для поиска по имени пол берётся по первому вхождению
+                gender_of.setdefault(value, gender)
+                seen.setdefault(value, set()).add(gender)
+
+        self.sampler = AliasSampler.from_pairs(pairs)
+        self.genders = genders
+        self.gender_of = gender_of
+        self.by_gender = build_gender_samplers(names_dict)
+        self.ambiguous = sorted(name for name, name_genders in seen.items() if len(name_genders) > 1)
+
+    def __len__(self) -> int:
+        return len(self.sampler)
+
+    def draw(self, rng=random) -> tuple:
+        """
+        Возвращает (имя, пол). Пол берётся у выбранной записи словаря,
+        поэтому имя, встречающееся у обоих полов, получает пол той записи,
+        которая была выбрана.
+        """
+        i = self.sampler.draw_index(rng)
+        return self.sampler.values[i], self.genders[i]
+
+    def draw_for_gender(self, gender: str, rng=random) -> str:
+        sampler = self.by_gender.get(gender)
+        return sampler.draw(rng) if sampler else ""
+
+    def gender(self, name: str) -> str:
+        return self.gender_of.get(name)
@@ -0,0 +1,443 @@
+"""
+Локальный HTTP-сервис потоковой генерации датасета.
+
+Справочники, календарь и таблица BIN загружаются один раз при старте,
+поэтому запрос сразу начинает генерацию. Строки отдаются частями
+(Transfer-Encoding: chunked) в CSV или NDJSON по мере генерации блоков:
+
+    python server.py --port 8080 --workers 4
+    curl 'http://127.0.0.1:8080/dataset?rows=1000000&seed=42&bank_weight=VTB%20BANK=4' -o data.csv
+
+Параметры запроса /dataset: rows, people, seed, format (csv или ndjson),
+chunk_size, bank_weight и pay_system_weight (ИМЯ=ВЕС, можно повторять),
+snils_format, independent_visits. Одинаковые сид и параметры дают те же строки.
+
+Пациенты строятся лениво страницами индексируемого датасета (indexed.py):
+до первого блока ничего не материализуется, а в памяти держится
+ограниченный кэш страниц. С independent_visits строки совпадают с
+cli.py --indexed с теми же people и сидом (CSV - без BOM). Согласованные
+визиты (по умолчанию) идут через реестр пациентов - компактные массивы
+O(people); невыполнимый запрос (слишком мало пациентов на rows визитов)
+отклоняется с кодом 400 до начала ответа.
+
+Блоки генерируются в пуле потоков; следующий блок запрашивается только
+после того, как предыдущий ушёл клиенту (writer.drain), поэтому медленный
+клиент не накапливает данные в памяти. Генерация - Python и numpy под GIL,
+поэтому потоки дают одновременное обслуживание запросов, но не ускорение
+одного запроса: параллельная генерация большого файла - cli.py --workers
+(процессы). Количество одновременных генераций ограничено, остальные
+запросы ждут своей очереди. /health - состояние сервиса.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Dict, List
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from main import CSV_HEADERS, DEFAULT_STREAM_CHUNK_ROWS, bank_names, painment_system_names, parse_weights
+from batch import BatchEngine
+from indexed import IndexedDataset
+from registry import PatientRegistry, check_capacity, suggest_spread_days
+from reference import ReferenceData, DATA_DIR
+from writers import BulkCsvWriter
+
+STREAM_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+# Верхняя граница блока: память под один блок строк не зависит от chunk_size клиента
+# (реестр пациентов - O(people), people ограничено max_rows)
+MAX_CHUNK_ROWS = 200_000
+
+# Строк на один запрос по умолчанию (--max-rows)
+DEFAULT_MAX_ROWS = 10_000_000
+
+# Ограничения на заголовки запроса и время их получения
+MAX_HEADER_LINE = 8192
+MAX_HEADERS = 100
+HEADER_TIMEOUT = 10.0
+
+
+class RequestError(Exception):
+    """
+    Ошибка запроса, которая отдаётся клиенту с кодом status
+    """
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _int_param(query: Dict[str, List[str]], name: str, default: int = None, minimum: int = 0) -> int:
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        value = int(values[-1])
+    except ValueError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"{name}: ожидается целое число (получено {values[-1]!r})")
+    if value < minimum:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"{name}: значение должно быть не меньше {minimum}")
+    return value
+
+
+def _flag_param(query: Dict[str, List[str]], name: str) -> bool:
+    values = query.get(name)
+    return bool(values) and values[-1].lower() in ('', '1', 'true', 'yes')
+
+
+class StreamRequest:
+    """
+    Разобранные параметры запроса /dataset
+    """
+    __slots__ = ('rows', 'people', 'seed', 'format', 'chunk_size', 'bank_weights',
+                 'pay_system_weights', 'snils_format', 'consistent')
+
+    def __init__(self, rows: int, people: int = None, seed: int = None, format: str = 'csv',
+                 chunk_size: int = DEFAULT_STREAM_CHUNK_ROWS, bank_weights: dict = None,
+                 pay_system_weights: dict = None, snils_format: str = 'plain', consistent: bool = True):
+        self.rows = rows
+        self.people = people if people is not None else max(1, rows // 10)
+        self.seed = seed
+        self.format = format
+        self.chunk_size = chunk_size
+        self.bank_weights = bank_weights
+        self.pay_system_weights = pay_system_weights
+        self.snils_format = snils_format
+        self.consistent = consistent
+
+    @classmethod
+    def from_query(cls, query: Dict[str, List[str]], max_rows: int = None) -> 'StreamRequest':
+        """
+        Параметры из строки запроса (результат urllib.parse.parse_qs)
+        """
+        rows = _int_param(query, 'rows', DEFAULT_STREAM_CHUNK_ROWS)
+        if max_rows is not None and rows > max_rows:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"rows: не больше {max_rows} строк за запрос")
+        people = _int_param(query, 'people', minimum=1)
+        if max_rows is not None and people is not None and people > max_rows:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"people: не больше {max_rows} пациентов за запрос")
+        stream_format = query.get('format', ['csv'])[-1]
+        if stream_format not in STREAM_FORMATS:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"format: ожидается {' или '.join(STREAM_FORMATS)}")
+        snils_format = query.get('snils_format', ['plain'])[-1]
+        if snils_format not in ('plain', 'dashed'):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "snils_format: ожидается plain или dashed")
+        try:
+            bank_weights = parse_weights(query.get('bank_weight'), bank_names, 'bank_weight')
+            pay_system_weights = parse_weights(query.get('pay_system_weight'), painment_system_names,
+                                               'pay_system_weight')
+        except argparse.ArgumentTypeError as e:
+            raise RequestError(HTTPStatus.BAD_REQUEST, str(e))
+        request = cls(
+            rows,
+            people=people,
+            seed=_int_param(query, 'seed'),
+            format=stream_format,
+            chunk_size=min(_int_param(query, 'chunk_size', DEFAULT_STREAM_CHUNK_ROWS, minimum=1), MAX_CHUNK_ROWS),
+            bank_weights=bank_weights,
+            pay_system_weights=pay_system_weights,
+            snils_format=snils_format,
+            consistent=not _flag_param(query, 'independent_visits'),
+        )
+        if request.consistent:
+            # Реестр исчерпывается посреди генерации - проверяется до ответа 200
+            try:
+                check_capacity(request.people, request.rows)
+            except ValueError as e:
+                raise RequestError(HTTPStatus.BAD_REQUEST, str(e))
+        return request
+
+
+def encode_csv(rows: List[List[str]], header: bool = False) -> bytes:
+    """
+    Блок строк в байтах CSV (с заголовком для первого блока)
+    """
+    writer = BulkCsvWriter(_ByteSink())
+    if header:
+        writer.writerow(CSV_HEADERS)
+    writer.writerows(rows)
+    return b''.join(writer.file.parts)
+
+
+def encode_ndjson(rows: List[List[str]]) -> bytes:
+    """
+    Блок строк в NDJSON: по объекту с ключами CSV_HEADERS на строку
+    """
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    lines = [dumps(dict(zip(CSV_HEADERS, row))) for row in rows]
+    lines.append('')
+    return '\n'.join(lines).encode('utf-8')
+
+
+class _ByteSink:
+    """
+    Приёмник для BulkCsvWriter: собирает записанные части без копирования
+    """
+    __slots__ = ('parts',)
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data: bytes):
+        self.parts.append(data)
+
+
+class DatasetStream:
+    """
+    Генерация одного запроса: итератор блоков, закодированных в байты.
+    next_chunk вызывается в потоке пула и возвращает None после последнего блока.
+    """
+    __slots__ = ('request', 'dataset', 'chunks', 'rows_sent', 'header_sent')
+
+    def __init__(self, request: StreamRequest, reference: ReferenceData):
+        self.request = request
+        # Пациенты - страницы индексируемого датасета, строятся по мере обращения
+        self.dataset = IndexedDataset(request.people, reference, request.bank_weights,
+                                      request.pay_system_weights, request.seed, request.snils_format)
+        if request.consistent:
+            # Реестр последователен: строки из пакетного движка со своим потоком сида
+            # (третий потомок: первые два - ключи пациентов и строк индексируемого датасета)
+            registry_seed = np.random.SeedSequence(self.dataset.entropy).spawn(3)[2]
+            engine = self.dataset.engine
+            registry = PatientRegistry(request.people, engine.schedule,
+                                       spread_days=suggest_spread_days(request.people, request.rows))
+            blocks = engine.iter_blocks(request.rows, request.people, request.chunk_size,
+                                        np.random.default_rng(registry_seed), registry)
+            self.chunks = self._registry_chunks(blocks)
+        else:
+            self.chunks = self.dataset.iter_chunks(0, request.rows, request.chunk_size)
+        self.rows_sent = 0
+        self.header_sent = False
+
+    def _registry_chunks(self, blocks):
+        for block in blocks:
+            block.person, persons = self.dataset.persons(block.person)
+            yield block.to_rows(persons)
+
+    def next_chunk(self) -> bytes:
+        if not self.header_sent and self.request.format == 'csv':
+            self.header_sent = True
+            rows = next(self.chunks, [])
+            self.rows_sent += len(rows)
+            return encode_csv(rows, header=True)
+        rows = next(self.chunks, None)
+        if rows is None:
+            return None
+        self.rows_sent += len(rows)
+        if self.request.format == 'csv':
+            return encode_csv(rows)
+        return encode_ndjson(rows)
+
+    def close(self):
+        self.chunks.close()
+
+
+class DatasetServer:
+    """
+    asyncio-сервер: разбор HTTP/1.1, очередь генераций и потоковая отдача.
+    workers - потоков генерации (одновременность, а не параллельность - см. описание модуля),
+    max_concurrent - одновременных генераций (лишние запросы ждут),
+    max_rows - ограничение строк и пациентов на запрос (None - без ограничения).
+    """
+
+    def __init__(self, reference: ReferenceData, workers: int = None, max_concurrent: int = None,
+                 max_rows: int = DEFAULT_MAX_ROWS, quiet: bool = False):
+        self.reference = reference
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrent = max_concurrent or self.workers
+        self.max_rows = max_rows
+        self.quiet = quiet
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dataset')
+        self.slots = None
+        self.active = 0
+        self.waiting = 0
+        self.rows_served = 0
+        self.started = time.time()
+
+    def warm_up(self):
+        """
+        Загружает справочники и строит общие таблицы до первого запроса
+        """
+        reference = self.reference
+        reference.fio_samplers
+        BatchEngine(reference.specialists_list, reference.symptoms_dict, reference.analyses_with_prices_dict,
+                    bin_table=reference.bin_table)
+
+    def log(self, message: str):
+        if not self.quiet:
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {message}", file=sys.stderr, flush=True)
+
+    async def serve(self, host: str, port: int):
+        self.slots = asyncio.Semaphore(self.max_concurrent)
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_LINE)
+        address = server.sockets[0].getsockname()
+        self.log(f"Сервис запущен на http://{address[0]}:{address[1]} "
+                 f"(потоков: {self.workers}, одновременных генераций: {self.max_concurrent})")
+        async with server:
+            await server.serve_forever()
+
+    async def read_request(self, reader: asyncio.StreamReader) -> (str, str):
+        """
+        Строка запроса и заголовки; тело запроса не поддерживается
+        """
+        line = await reader.readline()
+        if not line:
+            return None, None
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/1.'):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Некорректная строка запроса")
+        for _ in range(MAX_HEADERS):
+            header = await reader.readline()
+            if header in (b'\r\n', b'\n', b''):
+                return parts[0], parts[1]
+        raise RequestError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Слишком много заголовков")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                method, target = await asyncio.wait_for(self.read_request(reader), HEADER_TIMEOUT)
+                if method is None:
+                    return
+                if method != 'GET':
+                    raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, "Поддерживается только GET")
+                url = urlsplit(target)
+                if url.path == '/health':
+                    await self.send_json(writer, self.health())
+                elif url.path == '/dataset':
+                    request = StreamRequest.from_query(parse_qs(url.query, keep_blank_values=True), self.max_rows)
+                    await self.stream(writer, request, target)
+                else:
+                    raise RequestError(HTTPStatus.NOT_FOUND, f"Нет такого пути: {url.path}")
+            except RequestError as e:
+                await self.send_json(writer, {'error': str(e)}, e.status)
+            except (asyncio.TimeoutError, ValueError, asyncio.LimitOverrunError):
+                await self.send_json(writer, {'error': "Некорректный запрос"}, HTTPStatus.BAD_REQUEST)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def health(self) -> Dict:
+        return {
+            'status': 'ok',
+            'workers': self.workers,
+            'max_concurrent': self.max_concurrent,
+            'active': self.active,
+            'waiting': self.waiting,
+            'rows_served': self.rows_served,
+            'uptime': round(time.time() - self.started, 1),
+        }
+
+    @staticmethod
+    def _head(status: HTTPStatus, headers: Dict[str, str]) -> bytes:
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    async def send_json(self, writer: asyncio.StreamWriter, payload: Dict, status: HTTPStatus = HTTPStatus.OK):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(self._head(status, {
+            'Content-Type': 'application/json; charset=utf-8',
+            'Content-Length': str(len(body)),
+            'Connection': 'close',
+        }) + body)
+        await writer.drain()
+
+    async def stream(self, writer: asyncio.StreamWriter, request: StreamRequest, target: str):
+        """
+        Отдаёт датасет частями. Пока клиент не принял блок, следующий не генерируется
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        stream = pending = None
+        try:
+            try:
+                stream = await loop.run_in_executor(self.executor, DatasetStream, request, self.reference)
+            except ValueError as e:
+                raise RequestError(HTTPStatus.BAD_REQUEST, str(e))
+            writer.write(self._head(HTTPStatus.OK, {
+                'Content-Type': STREAM_FORMATS[request.format],
+                'Transfer-Encoding': 'chunked',
+                'Connection': 'close',
+            }))
+            # Следующий блок генерируется, пока предыдущий уходит клиенту
+            pending = loop.run_in_executor(self.executor, stream.next_chunk)
+            while True:
+                data = await pending
+                if data is None:
+                    break
+                pending = loop.run_in_executor(self.executor, stream.next_chunk)
+                if data:
+                    writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+                    await writer.drain()
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+            self.log(f"{target} - {stream.rows_sent} строк за {time.perf_counter() - started:.2f} с")
+        except ConnectionError:
+            self.log(f"{target} - клиент отключился")
+        except ValueError as e:
+            # Заголовок уже отправлен: обрыв без завершающей части сообщает клиенту об ошибке
+            self.log(f"{target} - ошибка генерации: {e}")
+        finally:
+            # Блок, который ещё генерируется, дожидается завершения до закрытия итератора
+            if pending is not None and not pending.done():
+                await asyncio.wait([pending])
+            if stream is not None:
+                self.rows_served += stream.rows_sent
+                stream.close()
+            self.active -= 1
+            self.slots.release()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="HTTP-сервис потоковой генерации датасета")
+    parser.add_argument('--host', default='127.0.0.1', help="адрес (по умолчанию 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8080, help="порт (по умолчанию 8080)")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="потоков генерации (по умолчанию - количество процессоров); потоки обслуживают "
+                             "запросы одновременно, но не ускоряют один запрос (GIL)")
+    parser.add_argument('--max-concurrent', type=int, default=None,
+                        help="одновременных генераций, остальные запросы ждут (по умолчанию = workers)")
+    parser.add_argument('--max-rows', type=int, default=DEFAULT_MAX_ROWS,
+                        help=f"ограничение строк и пациентов на один запрос (по умолчанию {DEFAULT_MAX_ROWS}, 0 - без ограничения)")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="каталог справочников")
+    parser.add_argument('-q', '--quiet', action='store_true', help="не выводить журнал запросов")
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if (args.workers is not None and args.workers < 1) or (args.max_concurrent is not None
+                                                           and args.max_concurrent < 1):
+        parser.error("workers и max-concurrent должны быть положительными")
+
+    server = DatasetServer(ReferenceData(args.data_dir), args.workers, args.max_concurrent,
+                           args.max_rows or None, args.quiet)
+    server.warm_up()
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.executor.shutdown(wait=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
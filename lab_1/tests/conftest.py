@@ -0,0 +1,24 @@
+"""
+Общие фикстуры тестов. Модули lab_1 импортируются по плоским именам (как в cli.py),
+поэтому каталог lab_1 добавляется в sys.path.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reference import default_reference  # noqa: E402
+from batch import BatchEngine  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def reference():
+    return default_reference()
+
+
+@pytest.fixture
+def engine(reference):
+    return BatchEngine(reference.specialists_list, reference.symptoms_dict, reference.analyses_with_prices_dict,
+                       bin_table=reference.bin_table)
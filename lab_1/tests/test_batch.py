@@ -0,0 +1,74 @@
+import random
+import re
+
+import numpy as np
+import pytest
+
+from main import CSV_HEADERS, MAX_ANALYSES, MAX_SYMPTOMS, generate_personal_data, iter_dataset_rows
+from batch import generate_dataset_batch, generate_personal_data_batch
+from cards import is_luhn_valid
+
+# Формат каждой колонки строки вывода, общий для скалярного и пакетного путей
+FIELD_PATTERNS = [
+    r'\S+ \S+ \S+',
+    r'\d{4} \d{6}',
+    r'\d{9} \d{2}',
+    r'[^;]+',
+    r'[^;]+',
+    r'\d{4}-\d\d-\d\dT\d\d:\d\d',
+    r'[^;]+',
+    r'\d{4}-\d\d-\d\dT\d\d:\d\d',
+    r'\d+',
+    r'\d{4} \d{4} \d{4} \d{4}',
+]
+
+
+@pytest.fixture(scope='module')
+def personal_data(reference):
+    return generate_personal_data(200, reference.names_dict, reference.surnames_dict, reference.patronymics_dict,
+                                  rng=random.Random(1), fio_samplers=reference.fio_samplers)
+
+
+def check_rows(rows, reference):
+    prices = {spec: dict(items) for spec, items in reference.analyses_with_prices_dict.items()}
+    for row in rows:
+        assert len(row) == len(CSV_HEADERS)
+        for value, pattern in zip(row, FIELD_PATTERNS):
+            assert re.fullmatch(pattern, value), (pattern, value)
+        specialist = row[4]
+        symptoms = row[3].split(', ')
+        analyses = row[6].split(', ')
+        assert 1 <= len(symptoms) <= MAX_SYMPTOMS and len(set(symptoms)) == len(symptoms)
+        assert set(symptoms) <= set(reference.symptoms_dict[specialist])
+        assert 1 <= len(analyses) <= MAX_ANALYSES and len(set(analyses)) == len(analyses)
+        assert int(row[8]) == int(sum(float(prices[specialist][a]) for a in analyses))
+        assert row[5] < row[7]
+        assert is_luhn_valid(row[9])
+
+
+def test_batch_rows_match_scalar_format(reference, personal_data):
+    scalar = list(iter_dataset_rows(300, reference.specialists_list, reference.symptoms_dict,
+                                    reference.analyses_with_prices_dict, personal_data, seed=2))
+    batch = generate_dataset_batch(3000, reference.specialists_list, reference.symptoms_dict,
+                                   reference.analyses_with_prices_dict, personal_data, chunk_size=700, seed=2)
+    check_rows(scalar, reference)
+    check_rows(batch, reference)
+    assert len(batch) == 3000
+    assert len({row[9] for row in batch}) == len(batch)
+    assert {row[4] for row in batch} <= set(reference.specialists_list)
+
+
+def test_batch_is_reproducible(reference, personal_data):
+    args = (reference.specialists_list, reference.symptoms_dict, reference.analyses_with_prices_dict, personal_data)
+    first = generate_dataset_batch(1000, *args, chunk_size=250, seed=3)
+    assert generate_dataset_batch(1000, *args, chunk_size=250, seed=3) == first
+    assert generate_dataset_batch(1000, *args, chunk_size=250, seed=4) != first
+
+
+def test_personal_data_batch_is_unique(reference):
+    persons = generate_personal_data_batch(5000, reference.names_dict, reference.surnames_dict,
+                                           reference.patronymics_dict, rng=np.random.default_rng(5),
+                                           fio_samplers=reference.fio_samplers)
+    assert len({person[1] for person in persons}) == 5000
+    assert len({person[2] for person in persons}) == 5000
+    assert all(re.fullmatch(FIELD_PATTERNS[1], person[1]) for person in persons)
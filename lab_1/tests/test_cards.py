@@ -0,0 +1,29 @@
+import numpy as np
+
+from cards import ACCOUNT_SPACE, card_number, card_numbers_batch, is_luhn_valid, luhn_check_digit
+from unique import UniqueIdSource
+
+
+def test_luhn_known_numbers():
+    assert luhn_check_digit('411111111111111') == 1
+    assert is_luhn_valid('4111 1111 1111 1111')
+    assert not is_luhn_valid('4111 1111 1111 1112')
+    assert is_luhn_valid('2200 0000 0000 0004')
+
+
+def test_card_numbers_batch_matches_scalar(engine):
+    prefixes = engine.bin_table.prefixes
+    rng = np.random.default_rng(1)
+    prefix_idx = rng.integers(0, len(prefixes), size=500)
+    accounts = UniqueIdSource(ACCOUNT_SPACE, keys=[1, 2, 3, 4]).next_batch(500)
+    numbers = card_numbers_batch(prefixes, prefix_idx, accounts)
+    assert numbers == [card_number(prefixes[p], a) for p, a in zip(prefix_idx.tolist(), accounts.tolist())]
+    assert all(is_luhn_valid(number) for number in numbers)
+    assert len(set(numbers)) == len(numbers)
+
+
+def test_joint_weights_select_only_weighted_pairs(engine):
+    table = engine.bin_table
+    sampler = table.joint_sampler({'VTB BANK': 1}, {'MIR': 1})
+    drawn = sampler.sample_indices(2000, np.random.default_rng(3))
+    assert {table.pair_of(i) for i in drawn.tolist()} == {('VTB BANK', 'MIR')}
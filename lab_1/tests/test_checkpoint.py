@@ -0,0 +1,60 @@
+import hashlib
+
+import pytest
+
+from cli import main as cli_main
+from checkpoint import generate_checkpointed, read_checkpoint
+
+
+class Interrupted(Exception):
+    pass
+
+
+def digest(path) -> str:
+    with open(path, mode='rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+@pytest.mark.parametrize('consistent', [True, False])
+def test_resume_matches_uninterrupted_run(tmp_path, consistent, capsys):
+    reference_path = str(tmp_path / 'reference.csv')
+    flags = [] if consistent else ['--independent-visits']
+    cli_main(['-n', '6000', '--seed', '11', '--chunk-size', '1000', '-q', '-o', reference_path] + flags)
+
+    path = str(tmp_path / 'dataset.csv')
+
+    def interrupt(rows):
+        if rows >= 3000:
+            raise Interrupted
+
+    with pytest.raises(Interrupted):
+        generate_checkpointed(6000, path, seed=11, chunk_size=1000, consistent=consistent,
+                              checkpoint_every=2, on_chunk=interrupt)
+    assert read_checkpoint(path)['rows_written'] == 2000
+    # Недописанный хвост после контрольной точки отбрасывается
+    with open(path, mode='ab') as file:
+        file.write(b'broken;row')
+
+    assert generate_checkpointed(6000, path, resume=True) == 6000
+    assert digest(path) == digest(reference_path)
+
+
+def test_resume_extends_finished_dataset(tmp_path):
+    path = str(tmp_path / 'dataset.csv')
+    generate_checkpointed(2000, path, people=1000, seed=12, chunk_size=500)
+    assert generate_checkpointed(3000, path, resume=True) == 3000
+    with open(path, encoding='utf-8-sig') as file:
+        assert sum(1 for _ in file) == 3001
+
+
+def test_capacity_checked_before_touching_file(tmp_path):
+    path = str(tmp_path / 'dataset.csv')
+    generate_checkpointed(1000, path, people=20, seed=13, chunk_size=500)
+    before = digest(path), read_checkpoint(path)
+    # Дополнение сохраняет 20 пациентов: 2000 визитов на них не уместить
+    with pytest.raises(ValueError, match="Недостаточно пациентов"):
+        generate_checkpointed(2000, path, resume=True)
+    assert (digest(path), read_checkpoint(path)) == before
+    with pytest.raises(ValueError, match="Недостаточно пациентов"):
+        generate_checkpointed(2000, str(tmp_path / 'fresh.csv'), people=20, seed=13)
+    assert not (tmp_path / 'fresh.csv').exists()
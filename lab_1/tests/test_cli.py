@@ -0,0 +1,33 @@
+import argparse
+
+import pytest
+
+from cli import main as cli_main
+from main import bank_names, parse_weights
+
+
+def test_parse_weights():
+    weights = parse_weights(['VTB BANK=4', 'SBERBANK OF RUSSIA=0'], bank_names, '--bank-weight')
+    assert weights['VTB BANK'] == 4 and weights['SBERBANK OF RUSSIA'] == 0
+    assert all(weights[name] == 1 for name in bank_names if name not in ('VTB BANK', 'SBERBANK OF RUSSIA'))
+
+
+@pytest.mark.parametrize('item', ['VTB BANK=-1', 'VTB BANK=nan', 'VTB BANK=x', 'UNKNOWN=1', 'VTB BANK'])
+def test_parse_weights_rejects_bad_items(item):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_weights([item], bank_names, '--bank-weight')
+
+
+def test_parse_weights_rejects_zero_sum():
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_weights([f'{name}=0' for name in bank_names], bank_names, '--bank-weight')
+
+
+@pytest.mark.parametrize('output, flags', [('data.csv', ['--compression', 'gzip']), ('data.csv.gz', []),
+                                           ('data.csv', ['--resume', '--compression', 'xz'])])
+def test_checkpoint_rejects_compression(tmp_path, output, flags):
+    argv = ['-n', '10', '-q', '--checkpoint', '-o', str(tmp_path / output)] + flags
+    with pytest.raises(SystemExit) as error:
+        cli_main(argv)
+    assert error.value.code == 2
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from batch import generate_personal_data_batch
+from columnar import ColumnarSchema, write_columnar, load_npy, NPY_PEOPLE_COLUMNS
+from main import CSV_HEADERS
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.parquet as pq  # noqa: E402
+
+
+@pytest.fixture
+def dataset(reference, engine):
+    # Блоки и строки CSV одного датасета: колоночный экспорт сравнивается с ними
+    people = generate_personal_data_batch(50, reference.names_dict, reference.surnames_dict,
+                                          reference.patronymics_dict, seed=4)
+    blocks = list(engine.iter_blocks(700, len(people), 256, np.random.default_rng(4)))
+    rows = [row for block in blocks for row in block.to_rows(people)]
+    schema = ColumnarSchema.from_reference(reference.specialists_list, reference.symptoms_dict,
+                                           reference.analyses_with_prices_dict)
+    return blocks, people, rows, schema
+
+
+def table_rows(table):
+    """
+    Таблица pyarrow -> строки в формате CSV
+    """
+    rows = []
+    for record in table.to_pylist():
+        row = []
+        for header in CSV_HEADERS:
+            value = record[header]
+            if isinstance(value, list):
+                value = ', '.join(value)
+            elif hasattr(value, 'strftime'):
+                value = value.strftime('%Y-%m-%dT%H:%M')
+            row.append(str(value))
+        rows.append(row)
+    return rows
+
+
+def test_parquet_round_trip(tmp_path, dataset):
+    blocks, people, rows, schema = dataset
+    path = str(tmp_path / 'data.parquet')
+    assert write_columnar(iter(blocks), people, path, schema, 'parquet') == len(rows)
+    assert pq.ParquetFile(path).num_row_groups == len(blocks)
+    assert table_rows(pq.read_table(path)) == rows
+
+
+def test_arrow_round_trip(tmp_path, dataset):
+    blocks, people, rows, schema = dataset
+    path = str(tmp_path / 'data.arrow')
+    assert write_columnar(iter(blocks), people, path, schema, 'arrow') == len(rows)
+    with pa.OSFile(path, 'rb') as source:
+        table = pa.ipc.open_file(source).read_all()
+    assert table_rows(table) == rows
+
+
+def test_npy_round_trip(tmp_path, dataset):
+    blocks, people, rows, schema = dataset
+    directory = str(tmp_path / 'data_npy')
+    assert write_columnar(iter(blocks), people, directory, schema, 'npy', n=len(rows)) == len(rows)
+    columns, dictionaries = load_npy(directory, mmap_mode='r')
+    people_columns = {name: columns[name].astype(str).tolist() for name in NPY_PEOPLE_COLUMNS}
+
+    restored = []
+    for i in range(len(rows)):
+        person = int(columns['person'][i])
+        restored.append([
+            *(people_columns[name][person] for name in NPY_PEOPLE_COLUMNS),
+            ', '.join(dictionaries['symptoms'][c] for c in columns['symptoms'][i] if c >= 0),
+            dictionaries['specialist'][columns['specialist'][i]],
+            str(columns['visit'][i]),
+            ', '.join(dictionaries['analyses'][c] for c in columns['analyses'][i] if c >= 0),
+            str(columns['analysis'][i]),
+            str(columns['cost'][i]),
+            columns['card'][i].decode(),
+        ])
+    assert restored == rows
+
+
+def test_npy_rejects_wrong_row_count(tmp_path, dataset):
+    blocks, people, rows, schema = dataset
+    with pytest.raises(ValueError):
+        write_columnar(iter(blocks), people, str(tmp_path / 'short'), schema, 'npy', n=len(rows) - 1)
+    with pytest.raises(ValueError):
+        write_columnar(iter(blocks), people, str(tmp_path / 'long'), schema, 'npy', n=len(rows) + 1)
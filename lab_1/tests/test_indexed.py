@@ -0,0 +1,43 @@
+import pytest
+
+from cli import main as cli_main
+from indexed import IndexedDataset, ROW_PAGE, generate_indexed, read_settings
+
+
+def read_rows(path):
+    with open(path, encoding='utf-8-sig') as file:
+        return file.read().splitlines()[1:]
+
+
+def test_range_matches_full_dataset(tmp_path, reference):
+    full = str(tmp_path / 'full.csv')
+    generate_indexed(3000, full, people=400, reference=reference, seed=21)
+    part = str(tmp_path / 'part.csv')
+    # Диапазон через границу страницы, без сида в командной строке - параметры из файла
+    cli_main(['--indexed-like', full, '--rows', '700', '--start', str(ROW_PAGE - 100), '-w', '2', '-q',
+              '-o', part])
+    assert read_rows(part) == read_rows(full)[ROW_PAGE - 100:ROW_PAGE + 600]
+
+
+def test_settings_recorded(tmp_path, reference):
+    path = str(tmp_path / 'data.csv')
+    generate_indexed(10, path, people=7, reference=reference, snils_format='dashed')
+    settings = read_settings(path)
+    assert settings['people'] == 7 and settings['snils_format'] == 'dashed'
+    # Без сида записывается энтропия: по ней строки воспроизводятся
+    dataset = IndexedDataset(7, reference, seed=settings['entropy'], snils_format='dashed')
+    assert [';'.join(row) for row in dataset.rows(0, 10)] == read_rows(path)
+
+
+def test_people_required(tmp_path, reference):
+    with pytest.raises(ValueError):
+        generate_indexed(10, str(tmp_path / 'data.csv'), people=None, reference=reference)
+    with pytest.raises(SystemExit):
+        cli_main(['--indexed', '--rows', '10', '-o', str(tmp_path / 'data.csv')])
+
+
+def test_row_does_not_depend_on_range(reference):
+    dataset = IndexedDataset(300, reference, seed=5)
+    rows = dataset.rows(0, 2 * ROW_PAGE)
+    assert dataset.row(ROW_PAGE + 17) == rows[ROW_PAGE + 17]
+    assert dataset.rows(500, 1500) == rows[500:1500]
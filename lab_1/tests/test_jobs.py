@@ -0,0 +1,30 @@
+import time
+
+from jobs import GenerationJob
+
+
+def last_progress(job):
+    progress = None
+    while True:
+        latest = job.poll()
+        if latest is None:
+            return progress
+        progress = latest
+
+
+def test_paused_time_not_counted(tmp_path, reference):
+    job = GenerationJob(2000, str(tmp_path / 'data.csv'), people=200, reference=reference, seed=1,
+                        workers=1, shards=1, chunk_size=500)
+    job.start()
+    job.pause()
+    assert job.state == 'paused'
+    time.sleep(0.5)
+    job.resume()
+    assert job.wait(120) and job.state == 'done'
+
+    progress = last_progress(job)
+    assert progress.state == 'done' and progress.rows_done == 2000
+    assert progress.elapsed <= job.timings['total'] - 0.4
+    # Завершённое задание не приостанавливается
+    job.pause()
+    assert job.state == 'done'
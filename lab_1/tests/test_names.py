@@ -0,0 +1,44 @@
+import random
+from collections import Counter
+
+from main import compile_name_dictionary, build_fio_samplers, generate_fio
+from samplers import NameDictionary
+
+NAMES = {
+    'M': [('ИВАН', 0.5), ('САША', 0.5)],
+    'F': [('АННА', 0.5), ('САША', 0.5)],
+}
+SURNAMES = {'M': [('ИВАНОВ', 1.0)], 'F': [('ИВАНОВА', 1.0)]}
+PATRONYMICS = {'M': [('ПЕТРОВИЧ', 1.0)], 'F': [('ПЕТРОВНА', 1.0)]}
+
+
+def test_gender_index():
+    names = NameDictionary(NAMES)
+    assert names.gender('ИВАН') == 'M' and names.gender('АННА') == 'F'
+    assert names.gender('НЕТ ТАКОГО') is None
+    assert names.ambiguous == ['САША']
+
+
+def test_ambiguous_name_takes_gender_of_drawn_entry():
+    names = NameDictionary(NAMES)
+    rng = random.Random(1)
+    drawn = Counter(names.draw(rng) for _ in range(20_000))
+    assert set(drawn) == {('ИВАН', 'M'), ('САША', 'M'), ('АННА', 'F'), ('САША', 'F')}
+    # Каждая запись словаря выбирается с долей 1/4
+    assert all(abs(count / 20_000 - 0.25) < 0.02 for count in drawn.values())
+
+
+def test_fio_parts_agree_in_gender(capsys):
+    samplers = build_fio_samplers(NAMES, SURNAMES, PATRONYMICS)
+    assert 'САША' in capsys.readouterr().out
+    rng = random.Random(2)
+    for _ in range(2000):
+        fio, gender = generate_fio(NAMES, SURNAMES, PATRONYMICS, samplers, rng)
+        surname, name, patronymic = fio.split(' ')
+        assert surname == SURNAMES[gender][0][0] and patronymic == PATRONYMICS[gender][0][0]
+        assert (name, gender) in {(value, g) for g, pairs in NAMES.items() for value, _ in pairs}
+
+
+def test_compile_is_idempotent():
+    names = NameDictionary(NAMES)
+    assert compile_name_dictionary(names) is names
@@ -0,0 +1,46 @@
+import hashlib
+
+import pytest
+
+from parallel import build_shard_tasks, generate_dataset_parallel
+
+
+def digest(path) -> str:
+    with open(path, mode='rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def generate(reference, path, workers, n=3000, people=300, shards=3, seed=8, consistent=True):
+    return generate_dataset_parallel(
+        n, people, reference.specialists_list, reference.symptoms_dict, reference.analyses_with_prices_dict,
+        reference.names_dict, reference.surnames_dict, reference.patronymics_dict, str(path),
+        seed=seed, shards=shards, workers=workers, chunk_size=400, consistent=consistent
+    )[0]
+
+
+@pytest.mark.parametrize('consistent', [True, False])
+def test_output_does_not_depend_on_workers(tmp_path, reference, consistent):
+    one = generate(reference, tmp_path / 'one.csv', workers=1, consistent=consistent)
+    three = generate(reference, tmp_path / 'three.csv', workers=3, consistent=consistent)
+    assert digest(one) == digest(three)
+    again = generate(reference, tmp_path / 'again.csv', workers=2, consistent=consistent)
+    assert digest(again) == digest(one)
+
+
+def test_shards_share_unique_documents(tmp_path, reference):
+    path = generate(reference, tmp_path / 'data.csv', workers=1)
+    with open(path, encoding='utf-8-sig') as file:
+        rows = [line.split(';') for line in file.read().splitlines()[1:]]
+    assert len(rows) == 3000
+    patients = {(row[1], row[2]) for row in rows}
+    assert len({passport for passport, _ in patients}) == len(patients) <= 300
+
+
+def test_shards_clamped_to_people(tmp_path, reference):
+    tasks = build_shard_tasks(100, 2, reference.specialists_list, reference.symptoms_dict,
+                              reference.analyses_with_prices_dict, reference.names_dict, reference.surnames_dict,
+                              reference.patronymics_dict, str(tmp_path / 'data.csv'), shards=5)
+    assert len(tasks) == 2 and sum(task['people'] for task in tasks) == 2
+    path = generate(reference, tmp_path / 'few.csv', workers=1, n=100, people=2, shards=5, consistent=False)
+    with open(path, encoding='utf-8-sig') as file:
+        assert len({line.split(';')[1] for line in file.read().splitlines()[1:]}) <= 2
@@ -0,0 +1,101 @@
+import os
+import pickle
+import shutil
+
+import pytest
+
+import reference as ref
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    directory = tmp_path / 'data'
+    directory.mkdir()
+    for name in ref.REFERENCE_FILES.values():
+        shutil.copy2(os.path.join(ref.DATA_DIR, name), directory / name)
+    return str(directory)
+
+
+@pytest.fixture
+def counters(monkeypatch):
+    # Сколько раз справочники разбирались заново и сколько файлов хэшировалось
+    counts = {'build': 0, 'digest': 0}
+    build, digest = ref.build_reference, ref.file_digest
+
+    def counting_build(data_dir):
+        counts['build'] += 1
+        return build(data_dir)
+
+    def counting_digest(path):
+        counts['digest'] += 1
+        return digest(path)
+
+    monkeypatch.setattr(ref, 'build_reference', counting_build)
+    monkeypatch.setattr(ref, 'file_digest', counting_digest)
+    return counts
+
+
+def touch(path, delta_ns=10 ** 9):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + delta_ns))
+
+
+def test_cache_reused_until_content_changes(tmp_path, data_dir, counters):
+    cache_path = str(tmp_path / 'cache' / 'reference.pickle')
+    first = ref.load_reference(data_dir, cache_path)
+    assert counters['build'] == 1 and os.path.isfile(cache_path)
+    cached = ref.load_reference(data_dir, cache_path)
+    assert cached['analyses_with_prices_dict'] == first['analyses_with_prices_dict']
+    assert counters['build'] == 1
+
+    # Один байт меняется без изменения размера: устаревший кэш выдаёт только хэш
+    path = os.path.join(data_dir, ref.REFERENCE_FILES['tests'])
+    with open(path, mode='rb') as file:
+        data = bytearray(file.read())
+    data[-2:] = b'9\n' if data[-2:] != b'9\n' else b'8\n'
+    with open(path, mode='wb') as file:
+        file.write(data)
+    touch(path)
+    ref.load_reference(data_dir, cache_path)
+    assert counters['build'] == 2
+
+
+def test_mtime_only_change_rewrites_stamps_once(tmp_path, data_dir, counters):
+    cache_path = str(tmp_path / 'reference.pickle')
+    ref.load_reference(data_dir, cache_path)
+    touch(os.path.join(data_dir, ref.REFERENCE_FILES['names']))
+
+    counters['digest'] = 0
+    ref.load_reference(data_dir, cache_path)
+    assert counters == {'build': 1, 'digest': 1}
+    # Новое время изменения сохранено в кэше: повторного хэширования нет
+    ref.load_reference(data_dir, cache_path)
+    assert counters == {'build': 1, 'digest': 1}
+
+
+def test_code_digest_and_version_invalidate_cache(tmp_path, data_dir, counters, monkeypatch):
+    cache_path = str(tmp_path / 'reference.pickle')
+    ref.load_reference(data_dir, cache_path)
+
+    monkeypatch.setattr(ref, 'code_digest', lambda: 'другой код')
+    assert ref.read_cache(cache_path, data_dir) is None
+    ref.load_reference(data_dir, cache_path)
+    assert counters['build'] == 2
+
+    with open(cache_path, mode='rb') as file:
+        bundle = pickle.load(file)
+    bundle['version'] = ref.CACHE_VERSION - 1
+    with open(cache_path, mode='wb') as file:
+        pickle.dump(bundle, file)
+    assert ref.read_cache(cache_path, data_dir) is None
+
+    with open(cache_path, mode='wb') as file:
+        file.write(b'not a pickle')
+    assert ref.read_cache(cache_path, data_dir) is None
+
+
+def test_cache_bound_to_data_dir(tmp_path, data_dir, counters):
+    cache_path = str(tmp_path / 'reference.pickle')
+    ref.load_reference(data_dir, cache_path)
+    other = shutil.copytree(data_dir, str(tmp_path / 'other'))
+    assert ref.read_cache(cache_path, other) is None
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from registry import MAX_CARD_USES, REVISIT_GAP_MINUTES, PatientRegistry, suggest_spread_days
+
+
+def generate_columns(engine, rows, people, seed=3, chunk_size=700):
+    registry = PatientRegistry(people, engine.schedule, spread_days=suggest_spread_days(people, rows))
+    blocks = list(engine.iter_blocks(rows, people, chunk_size, np.random.default_rng(seed), registry))
+    names = ('person', 'visit', 'analysis', 'card_prefix', 'card_account')
+    return {name: np.concatenate([getattr(block, name) for block in blocks]) for name in names}
+
+
+def test_revisit_gap_and_analysis_window(engine):
+    columns = generate_columns(engine, 5000, 300)
+    delay = columns['analysis'] - columns['visit']
+    assert delay.min() >= 24 * 60 and delay.max() <= 72 * 60
+
+    order = np.lexsort((columns['visit'], columns['person']))
+    person = columns['person'][order]
+    same = person[1:] == person[:-1]
+    gap = columns['visit'][order][1:] - columns['analysis'][order][:-1]
+    assert (gap[same] >= REVISIT_GAP_MINUTES).all()
+
+
+def test_card_uses_and_owner(engine):
+    columns = generate_columns(engine, 5000, 300)
+    cards = columns['card_prefix'].astype(np.int64) * 10 ** 12 + columns['card_account']
+    values, first, uses = np.unique(cards, return_index=True, return_counts=True)
+    assert uses.max() <= MAX_CARD_USES
+    # Карта принадлежит одному пациенту
+    owner = dict(zip(values.tolist(), columns['person'][first].tolist()))
+    assert all(owner[card] == person for card, person in zip(cards.tolist(), columns['person'].tolist()))
+
+
+def test_state_round_trip(engine):
+    registry = PatientRegistry(50, engine.schedule, spread_days=suggest_spread_days(50, 1000))
+    rng = np.random.default_rng(5)
+    blocks = engine.iter_blocks(1000, 50, 250, rng, registry)
+    next(blocks)
+    restored = PatientRegistry.from_state(registry.state(), engine.schedule, engine.card_ids.permutation.batch)
+    assert restored._heap == registry._heap
+    assert restored.available == registry.available
+    assert restored.card_account == registry.card_account
+    assert restored.card_prefix == registry.card_prefix
+
+
+
+def test_round_takes_each_patient_once(engine):
+    # Блок не больше числа пациентов назначается одним раундом: пациенты в нём различны
+    registry = PatientRegistry(400, engine.schedule, spread_days=suggest_spread_days(400, 4000))
+    rng = np.random.default_rng(6)
+    for _ in range(5):
+        columns = registry.assign(engine.specialist_sampler.sample_indices(400, rng), engine.specialists, rng)
+        assert len(np.unique(columns['person'])) == 400
+        registry.add_cards(columns, np.zeros(registry.pending_cards, dtype=np.int64),
+                           np.arange(registry.pending_cards, dtype=np.int64))
+
+
+def test_exhausted_registry_raises(engine):
+    registry = PatientRegistry(2, engine.schedule)
+    rng = np.random.default_rng(7)
+    with pytest.raises(ValueError, match="Недостаточно пациентов"):
+        list(engine.iter_blocks(1000, 2, 500, rng, registry))
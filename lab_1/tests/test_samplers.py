@@ -0,0 +1,81 @@
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from samplers import AliasSampler, NameDictionary, SubsetSampler, MAX_SUBSET_KEYS, harmonic_sampler
+
+WEIGHTS = [1, 2, 3, 4, 0]
+
+
+def assert_frequencies(counts, weights, draws):
+    expected = np.array(weights, dtype=float) / sum(weights)
+    observed = np.array([counts.get(i, 0) for i in range(len(weights))], dtype=float) / draws
+    # Отклонение доли при 200 000 выборов - порядка 0.001
+    assert np.abs(observed - expected).max() < 0.01
+
+
+def test_alias_sampler_vectorized_distribution():
+    sampler = AliasSampler(list('abcde'), WEIGHTS)
+    draws = 200_000
+    indices = sampler.sample_indices(draws, np.random.default_rng(1))
+    assert_frequencies(Counter(indices.tolist()), WEIGHTS, draws)
+
+
+def test_alias_sampler_scalar_distribution():
+    sampler = AliasSampler(list('abcde'), WEIGHTS)
+    rng = random.Random(2)
+    draws = 200_000
+    assert_frequencies(Counter(sampler.draw_index(rng) for _ in range(draws)), WEIGHTS, draws)
+    assert sampler.draw(rng) in 'abcd'
+
+
+def test_harmonic_sampler_prefers_first():
+    counts = Counter(harmonic_sampler(['x', 'y', 'z']).sample(30_000, np.random.default_rng(3)))
+    assert counts['x'] > counts['y'] > counts['z']
+
+
+@pytest.mark.parametrize('values, weights', [([], []), (['a'], [1, 2]), (['a', 'b'], [0, 0])])
+def test_alias_sampler_rejects_bad_input(values, weights):
+    with pytest.raises(ValueError):
+        AliasSampler(values, weights)
+
+
+def test_subset_sampler_distinct_picks_within_group():
+    group_sizes = [0, 1, 3, 5, 12]
+    sampler = SubsetSampler(group_sizes, max_size=4)
+    groups = np.random.default_rng(8).integers(0, len(group_sizes), size=20000)
+    offsets, indices = sampler.sample(groups, np.random.default_rng(9))
+    assert len(offsets) == len(groups) + 1 and offsets[-1] == len(indices)
+
+    starts = np.concatenate(([0], np.cumsum(group_sizes)[:-1]))
+    sizes_seen = {g: Counter() for g in range(len(group_sizes))}
+    for i, g in enumerate(groups.tolist()):
+        picks = indices[offsets[i]:offsets[i + 1]].tolist()
+        assert len(set(picks)) == len(picks)
+        assert all(starts[g] <= p < starts[g] + group_sizes[g] for p in picks)
+        sizes_seen[g][len(picks)] += 1
+    # Пустая группа - пустой набор, иначе размер равномерно от 1 до min(max_size, размер группы)
+    for g, size in enumerate(group_sizes):
+        expected = [0] if size == 0 else list(range(1, min(4, size) + 1))
+        assert sorted(sizes_seen[g]) == expected
+        total = sum(sizes_seen[g].values())
+        for count in sizes_seen[g].values():
+            assert abs(count / total - 1 / len(expected)) < 0.05
+
+
+def test_subset_sampler_members_uniform_and_chunked():
+    # Группа шире MAX_SUBSET_KEYS // строк разыгрывается частями: состав от этого не смещается
+    size = 40
+    sampler = SubsetSampler([size], max_size=3)
+    rows = MAX_SUBSET_KEYS // size * 3 + 7
+    offsets, indices = sampler.sample(np.zeros(rows, dtype=np.int64), np.random.default_rng(10))
+    assert np.all(np.diff(offsets) >= 1) and np.all(np.diff(offsets) <= 3)
+    frequencies = np.bincount(indices, minlength=size) / len(indices)
+    assert np.all(np.abs(frequencies - 1 / size) < 0.2 / size)
+
+
+def test_subset_sampler_rejects_bad_size():
+    with pytest.raises(ValueError):
+        SubsetSampler([3], max_size=0)
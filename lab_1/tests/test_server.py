@@ -0,0 +1,34 @@
+from http import HTTPStatus
+
+import pytest
+
+from registry import check_capacity
+from server import RequestError, StreamRequest
+
+
+def test_infeasible_request_is_rejected_before_streaming():
+    with pytest.raises(RequestError) as error:
+        StreamRequest.from_query({'rows': ['100'], 'people': ['1']})
+    assert error.value.status == HTTPStatus.BAD_REQUEST
+    # Без реестра пациентов ограничения нет
+    assert StreamRequest.from_query({'rows': ['100'], 'people': ['1'], 'independent_visits': ['1']}).people == 1
+
+
+def test_row_and_people_limits():
+    with pytest.raises(RequestError):
+        StreamRequest.from_query({'rows': ['1001']}, max_rows=1000)
+    with pytest.raises(RequestError):
+        StreamRequest.from_query({'rows': ['10'], 'people': ['1001']}, max_rows=1000)
+
+
+def test_registry_capacity():
+    check_capacity(10, 800)
+    with pytest.raises(ValueError):
+        check_capacity(1, 100)
+
+
+def test_bad_weights_are_rejected():
+    for weight in ('VTB BANK=-1', 'VTB BANK=x', 'NOBANK=1'):
+        with pytest.raises(RequestError) as error:
+            StreamRequest.from_query({'rows': ['10'], 'bank_weight': [weight]})
+        assert error.value.status == HTTPStatus.BAD_REQUEST
@@ -0,0 +1,22 @@
+import numpy as np
+
+from main import calculate_snils_control_number, format_snils, format_snils_batch, snils_control_numbers_batch
+
+
+def test_snils_control_number_rules():
+    # Сумма < 100 - само число, 100 и 101 - 00, иначе остаток от деления на 101
+    assert calculate_snils_control_number([0, 0, 0, 0, 0, 0, 0, 1, 0]) == '02'
+    assert calculate_snils_control_number([9, 2, 0, 0, 0, 0, 0, 0, 3]) == '00'  # 100
+    assert calculate_snils_control_number([9, 2, 0, 0, 0, 0, 0, 0, 4]) == '00'  # 101
+    assert calculate_snils_control_number([9, 9, 5, 0, 0, 0, 0, 2, 9]) == '00'  # 201 % 101 = 100
+    assert calculate_snils_control_number([9] * 9) == '01'  # 405 % 101
+    assert format_snils(112233445, 'dashed') == '112-233-445 95'
+
+
+def test_snils_batch_matches_scalar():
+    bodies = np.random.default_rng(2).integers(1001999, 999999999, size=2000)
+    control = snils_control_numbers_batch(bodies)
+    expected = [int(calculate_snils_control_number([int(d) for d in f"{body:09d}"])) for body in bodies.tolist()]
+    assert control.tolist() == expected
+    for style in ('plain', 'dashed'):
+        assert format_snils_batch(bodies, style) == [format_snils(body, style) for body in bodies.tolist()]
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from batch import generate_personal_data_batch, iter_dataset_chunks
+from validator import split_rows, validate
+from writers import write_csv_fast
+
+
+@pytest.fixture(scope='module')
+def dataset_rows(reference):
+    personal_data = generate_personal_data_batch(300, reference.names_dict, reference.surnames_dict,
+                                                 reference.patronymics_dict, rng=np.random.default_rng(1),
+                                                 fio_samplers=reference.fio_samplers)
+    chunks = iter_dataset_chunks(2000, reference.specialists_list, reference.symptoms_dict,
+                                 reference.analyses_with_prices_dict, personal_data, chunk_size=500,
+                                 seed=2, consistent=True)
+    return [row for chunk in chunks for row in chunk]
+
+
+def write_rows(path, rows):
+    write_csv_fast([rows], str(path))
+    return str(path)
+
+
+def test_generated_dataset_is_valid(tmp_path, dataset_rows):
+    report = validate(write_rows(tmp_path / 'data.csv', dataset_rows), workers=1)
+    assert report['valid'], report['violations']
+    assert report['rows'] == len(dataset_rows)
+
+
+def test_short_and_long_rows_are_not_merged(tmp_path, dataset_rows):
+    rows = [list(row) for row in dataset_rows[:10]]
+    # Строка без поля рядом со строкой с лишним полем - общее число полей верное
+    del rows[4][8]
+    rows[5].append('лишнее')
+    report = validate(write_rows(tmp_path / 'data.csv', rows), workers=1)
+    violations = report['violations']
+    assert violations['field_count']['count'] == 2
+    assert [example['line'] for example in violations['field_count']['examples']] == [6, 7]
+    # Остальные строки разобраны без сдвига колонок
+    assert set(violations) == {'field_count'}
+
+
+def test_split_rows_flat_path():
+    columns, bad, _ = split_rows('1;2;3;4;5;6;7;8;9;10\n' * 3)
+    assert bad == [] and columns[9] == ['10'] * 3
+    columns, bad, _ = split_rows('1;2;3;4;5;6;7;8;9\n1;2;3;4;5;6;7;8;9;10;11\n')
+    assert bad == [0, 1] and columns[0] == []
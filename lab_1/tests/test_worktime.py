@@ -0,0 +1,75 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from worktime import (
+    DAYS_IN_YEAR, DEFAULT_ANALYSIS_HOURS, EPOCH, RU_HOLIDAYS_2025, SLOT_MINUTES, WorkCalendar, default_schedule,
+    format_minutes, format_minutes_batch, parse_minutes, parse_minutes_batch
+)
+
+
+def test_format_and_parse_round_trip():
+    minutes = np.random.default_rng(1).integers(0, 2 * 365 * 1440, size=5000) // 5 * 5
+    strings = format_minutes_batch(minutes)
+    assert strings == [(EPOCH + timedelta(minutes=m)).strftime("%Y-%m-%dT%H:%M") for m in minutes.tolist()]
+    assert parse_minutes_batch(strings).tolist() == minutes.tolist()
+    assert [parse_minutes(s) for s in strings[:500]] == minutes[:500].tolist()
+
+
+def test_outside_lookup_table():
+    # За пределами таблиц - запасной путь через datetime
+    minute = 3 * 365 * 1440 + 75
+    expected = (EPOCH + timedelta(minutes=minute)).strftime("%Y-%m-%dT%H:%M")
+    assert format_minutes(minute) == expected
+    assert format_minutes_batch(np.array([0, minute])) == ['2025-01-01T00:00', expected]
+    assert parse_minutes(expected) == minute
+    assert parse_minutes('2024-12-31T23:55') == int((datetime(2024, 12, 31, 23, 55) - EPOCH).total_seconds()) // 60
+
+
+def day_minute(day: str) -> int:
+    return parse_minutes(day + 'T00:00')
+
+
+def test_calendar_hours_inclusive_of_closing_hour():
+    schedule = default_schedule()
+    visit_minutes = schedule.default_calendar.slots % 1440
+    assert visit_minutes.min() == 9 * 60 and visit_minutes.max() == 21 * 60 + 55
+    analysis_minutes = schedule.analysis_calendar.slots % 1440
+    assert analysis_minutes.min() == 9 * 60 and analysis_minutes.max() == 12 * 60 + 55
+    assert (schedule.default_calendar.slots % SLOT_MINUTES == 0).all()
+
+
+def test_calendar_skips_weekends_and_holidays():
+    calendar = WorkCalendar()
+    working_days = set((calendar.slots // 1440).tolist())
+    for day in RU_HOLIDAYS_2025:
+        assert day_minute(day) // 1440 not in working_days
+    assert day_minute('2025-01-11') // 1440 not in working_days  # суббота
+    assert day_minute('2025-01-09') // 1440 in working_days
+    assert day_minute('2025-11-01') // 1440 in working_days  # рабочая суббота
+    assert calendar.is_working(day_minute('2025-01-09') + 21 * 60 + 55)
+    assert not calendar.is_working(day_minute('2025-01-09') + 22 * 60)
+
+
+def test_analysis_window_and_working_slots():
+    schedule = default_schedule()
+    specialists = ['a', 'b']
+    visit, analysis = schedule.draw_batch(np.zeros(20_000, dtype=np.int64), specialists, np.random.default_rng(2))
+    delay = analysis - visit
+    assert delay.min() >= 24 * 60 and delay.max() <= 72 * 60
+    assert schedule.default_calendar.is_working_batch(visit).all()
+    assert schedule.analysis_calendar.is_working_batch(analysis).all()
+    assert visit.max() < DAYS_IN_YEAR * 1440
+    # Визиты в последний час приёма тоже разыгрываются
+    assert (visit % 1440 >= 21 * 60).any()
+
+
+def test_draw_between_without_slots():
+    calendar = WorkCalendar(*DEFAULT_ANALYSIS_HOURS)
+    with pytest.raises(ValueError):
+        calendar.draw_between(day_minute('2025-01-01'), day_minute('2025-01-08') + 1439, random.Random(1))
+    with pytest.raises(ValueError):
+        calendar.draw_between_batch(np.array([day_minute('2025-05-01')]), np.array([day_minute('2025-05-03')]),
+                                    np.random.default_rng(1))
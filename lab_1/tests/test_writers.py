@@ -0,0 +1,59 @@
+import bz2
+import csv
+import gzip
+import io
+import lzma
+
+import pytest
+
+from main import CSV_HEADERS
+from writers import BulkCsvWriter, write_csv_fast, ENCODE_BLOCK_ROWS
+
+
+def read_back(data: bytes):
+    return list(csv.reader(io.StringIO(data.decode('utf-8-sig'), newline=''), delimiter=';'))
+
+
+def write_rows(rows):
+    buffer = io.BytesIO()
+    writer = BulkCsvWriter(buffer)
+    writer.writerows(rows)
+    return writer, buffer.getvalue()
+
+
+def test_fast_path_reads_back():
+    rows = [[f'{i}', 'Иванов Иван Иванович', '', '1 000 руб'] for i in range(ENCODE_BLOCK_ROWS + 10)]
+    writer, data = write_rows(rows)
+    assert writer.fast_blocks == 2 and writer.fallback_blocks == 0
+    assert writer.rows_written == len(rows)
+    assert read_back(data) == rows
+
+
+@pytest.mark.parametrize('special', ['a;b', 'a"b', 'a\nb', 'a\r\nb', ''])
+def test_fallback_path_reads_back(special):
+    # Специальный символ в любом поле переводит блок на csv.writer
+    rows = [['1', 'x'], [special], ['2', special, 'y']]
+    writer, data = write_rows(rows)
+    assert writer.fallback_blocks == 1 and writer.fast_blocks == 0
+    assert read_back(data) == rows
+
+
+def test_non_string_fields_go_through_csv_writer():
+    writer, data = write_rows([[1, 'a'], [2.5, None]])
+    assert writer.fallback_blocks == 1
+    assert read_back(data) == [['1', 'a'], ['2.5', '']]
+
+
+@pytest.mark.parametrize('suffix, opener', [('.csv', open), ('.csv.gz', gzip.open),
+                                             ('.csv.bz2', bz2.open), ('.csv.xz', lzma.open)])
+def test_write_csv_fast_with_compression_and_append(tmp_path, suffix, opener):
+    path = str(tmp_path / f'data{suffix}')
+    first = [[str(i)] * len(CSV_HEADERS) for i in range(5)]
+    second = [['a;b'] + ['x'] * (len(CSV_HEADERS) - 1)]
+    assert write_csv_fast([first], path) == 5
+    # Дописывание - без метки и заголовка, сжатое - отдельным потоком
+    assert write_csv_fast([second], path, append=True) == 1
+    with opener(path, 'rb') as file:
+        data = file.read()
+    assert data.startswith(b'\xef\xbb\xbf') and data.count(b'\xef\xbb\xbf') == 1
+    assert read_back(data) == [CSV_HEADERS] + first + second
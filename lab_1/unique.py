@@ -0,0 +1,204 @@
+"""
+Уникальные идентификаторы (паспорта, СНИЛС, карты) без коллизий.
+
+Идентификатор кодируется целым числом в пространстве [0, space).
+Уникальность обеспечивается одним из способов:
+- 'set'         - множество Python из упакованных чисел;
+- 'bitmap'      - битовая карта на всё пространство (1 бит на значение);
+- 'permutation' - перестановка Фейстеля над пространством: i-й выданный
+                  идентификатор равен perm(i), память под дедупликацию не нужна.
+memory_report() считает расход памяти на миллион идентификаторов.
+"""
+import random
+import sys
+from typing import Dict
+
+import numpy as np
+
+ID_MODES = ('permutation', 'bitmap', 'set')
+
+_MASK64 = (1 << 64) - 1
+_MUL1 = 0xBF58476D1CE4E5B9
+_MUL2 = 0x94D049BB133111EB
+FEISTEL_ROUNDS = 4
+
+
+def _mix(x: int, key: int) -> int:
+    """
+    Раундовая функция Фейстеля (перемешивание splitmix64)
+    """
+    x = (x ^ key) & _MASK64
+    x = ((x ^ (x >> 30)) * _MUL1) & _MASK64
+    x = ((x ^ (x >> 27)) * _MUL2) & _MASK64
+    return x ^ (x >> 31)
+
+
+def _mix_batch(x: np.ndarray, key: int) -> np.ndarray:
+    x = x ^ np.uint64(key)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(_MUL1)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(_MUL2)
+    return x ^ (x >> np.uint64(31))
+
+
+class FeistelPermutation:
+    """
+    Псевдослучайная биекция [0, space) -> [0, space).
+    Сбалансированная сеть Фейстеля на 2*half_bits битах, значения за пределами
+    space отбрасываются повторным применением (cycle walking).
+    """
+    __slots__ = ('space', 'half_bits', 'half_mask', 'keys')
+
+    def __init__(self, space: int, keys=None, rng=random):
+        if space <= 0:
+            raise ValueError("Пространство идентификаторов должно быть непустым")
+        self.space = space
+        self.half_bits = max(1, ((space - 1).bit_length() + 1) // 2)
+        self.half_mask = (1 << self.half_bits) - 1
+        if keys is None:
+            keys = [rng.getrandbits(64) for _ in range(FEISTEL_ROUNDS)]
+        self.keys = tuple(int(k) & _MASK64 for k in keys)
+
+    def _permute(self, x: int) -> int:
+        left = x >> self.half_bits
+        right = x & self.half_mask
+        for key in self.keys:
+            left, right = right, left ^ (_mix(right, key) & self.half_mask)
+        return (left << self.half_bits) | right
+
+    def __call__(self, i: int) -> int:
+        if not 0 <= i < self.space:
+            raise IndexError("Индекс за пределами пространства идентификаторов")
+        x = self._permute(i)
+        while x >= self.space:
+            x = self._permute(x)
+        return x
+
+    def _permute_batch(self, x: np.ndarray) -> np.ndarray:
+        shift = np.uint64(self.half_bits)
+        mask = np.uint64(self.half_mask)
+        left = x >> shift
+        right = x & mask
+        for key in self.keys:
+            left, right = right, left ^ (_mix_batch(right, key) & mask)
+        return (left << shift) | right
+
+    def batch(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Векторная версия: perm(i) для массива индексов
+        """
+        x = self._permute_batch(np.asarray(indices, dtype=np.uint64))
+        outside = x >= np.uint64(self.space)
+        while outside.any():
+            x[outside] = self._permute_batch(x[outside])
+            outside = x >= np.uint64(self.space)
+        return x.astype(np.int64)
+
+
+class BitmapIdSet:
+    """
+    Битовая карта на всё пространство: space/8 байт независимо от количества значений
+    """
+    __slots__ = ('space', 'bits', 'count')
+
+    def __init__(self, space: int):
+        self.space = space
+        self.bits = bytearray((space + 7) // 8)
+        self.count = 0
+
+    def __contains__(self, value: int) -> bool:
+        return bool(self.bits[value >> 3] & (1 << (value & 7)))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, value: int) -> bool:
+        """
+        Добавляет значение, возвращает False, если оно уже было
+        """
+        byte = value >> 3
+        bit = 1 << (value & 7)
+        if self.bits[byte] & bit:
+            return False
+        self.bits[byte] |= bit
+        self.count += 1
+        return True
+
+    def memory_bytes(self) -> int:
+        return len(self.bits)
+
+
+class UniqueIdSource:
+    """
+    Источник уникальных идентификаторов из пространства [0, space).
+    mode: 'permutation' (по умолчанию), 'bitmap' или 'set' (см. описание модуля).
+    start: номер первого выдаваемого элемента перестановки - позволяет раздать
+    непересекающиеся диапазоны шардам с общими ключами.
+    """
+
+    def __init__(self, space: int, mode: str = 'permutation', rng=random, keys=None, start: int = 0):
+        if mode not in ID_MODES:
+            raise ValueError(f"Неизвестный режим уникальности: {mode}")
+        self.space = space
+        self.mode = mode
+        self.rng = rng
+        self.issued = start
+        self.permutation = FeistelPermutation(space, keys, rng) if mode == 'permutation' else None
+        if mode == 'bitmap':
+            self.seen = BitmapIdSet(space)
+        elif mode == 'set':
+            self.seen = set()
+        else:
+            self.seen = None
+
+    def next(self) -> int:
+        if self.issued >= self.space:
+            raise ValueError("Пространство идентификаторов исчерпано")
+        if self.permutation is not None:
+            value = self.permutation(self.issued)
+        else:
+            # Повторный выбор при коллизии
+            value = self.rng.randrange(self.space)
+            while value in self.seen:
+                value = self.rng.randrange(self.space)
+            self.seen.add(value)
+        self.issued += 1
+        return value
+
+    def next_batch(self, k: int) -> np.ndarray:
+        """
+        k следующих идентификаторов; в режиме перестановки - одним векторным проходом
+        """
+        if self.issued + k > self.space:
+            raise ValueError("Пространство идентификаторов исчерпано")
+        if self.permutation is None:
+            return np.array([self.next() for _ in range(k)], dtype=np.int64)
+        values = self.permutation.batch(np.arange(self.issued, self.issued + k, dtype=np.uint64))
+        self.issued += k
+        return values
+
+    def memory_bytes(self) -> int:
+        """
+        Память под дедупликацию (без учёта самого объекта-источника)
+        """
+        if self.mode == 'bitmap':
+            return self.seen.memory_bytes()
+        if self.mode == 'set':
+            return sys.getsizeof(self.seen) + sum(sys.getsizeof(v) for v in self.seen)
+        return 0
+
+
+def memory_report(space: int, count: int = 1_000_000) -> Dict[str, float]:
+    """
+    Память (в байтах) под дедупликацию миллиона идентификаторов из пространства space
+    каждым способом. Множество замеряется на count идентификаторах и пересчитывается
+    на миллион; битовая карта занимает всё пространство независимо от количества.
+    """
+    per_million = 1_000_000 / count
+    sample = UniqueIdSource(space, 'set', random.Random(0))
+    for _ in range(count):
+        sample.next()
+    return {
+        'set': sample.memory_bytes() * per_million,
+        'bitmap': float((space + 7) // 8),
+        'permutation': 0.0,
+    }
@@ -0,0 +1,597 @@
+"""
+Проверка готового датасета на ограничения из README и сбор статистики.
+
+Файл отображается в память (mmap) и делится на диапазоны байтов,
+выровненные по концам строк; диапазоны разбираются параллельно
+в пуле процессов. Каждый процесс проверяет свои строки векторно:
+- формат полей, контрольные числа СНИЛС (правила calculate_snils_control_number),
+  контрольные цифры карт (алгоритм Луна);
+- визит и анализы в рабочие дни и часы расписания, анализы через 24-72 часа;
+и возвращает гистограммы колонок и компактные ключи для общих проверок.
+Основной процесс проверяет то, что требует всего файла: уникальность
+паспортов и СНИЛС, не больше 5 оплат одной картой, повторный визит
+не раньше чем через 24 часа после анализов, доли банков и платёжных систем.
+
+Пример:
+    python validator.py output/medical_dataset.csv --workers 8 -o output/report.json
+"""
+import argparse
+import csv
+import json
+import mmap
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from operator import methodcaller
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from main import (
+    CSV_HEADERS, SNILS_POWERS, SNILS_SPACE, bank_names, painment_system_names, parse_weights, snils_control_numbers_batch
+)
+from cards import DEFAULT_BIN_TABLE_PATH, ACCOUNT_DIGITS, BinTable, load_bin_table
+from registry import MAX_CARD_USES, REVISIT_GAP_MINUTES
+from rows import LIST_SEPARATOR
+from worktime import MINUTES_PER_DAY, EPOCH, default_schedule, parse_minutes_batch
+
+# Размер диапазона байтов на одну задачу пула
+DEFAULT_CHUNK_BYTES = 64 << 20
+
+# Сколько примеров нарушений каждого вида попадает в отчёт
+MAX_EXAMPLES = 10
+
+# Границы гистограммы стоимости, рублей
+COST_BINS = [0, 500, 1000, 2000, 3000, 5000, 7500, 10000, 15000, 20000, 50000]
+
+# Задержка анализов в гистограмме - по часам, до этой границы
+MAX_DELAY_HOURS = 96
+
+COLUMNS = {name: i for i, name in enumerate(CSV_HEADERS)}
+
+# Номер карты (16 цифр) // BIN_DIVISOR = префикс BIN (6 цифр)
+BIN_DIVISOR = 10 ** (ACCOUNT_DIGITS + 1)
+
+
+class Violations:
+    """
+    Счётчики нарушений с несколькими примерами (номер строки данных, значение)
+    """
+    __slots__ = ('counts', 'examples')
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.examples: Dict[str, List[tuple]] = {}
+
+    def add(self, name: str, mask: np.ndarray, rows: np.ndarray, values):
+        """
+        Нарушения name в строках rows[mask]; values - значения этих строк
+        (или кортеж колонок - тогда в примере значения через " -> ")
+        """
+        bad = np.flatnonzero(mask)
+        if not len(bad):
+            return
+        self.counts[name] = self.counts.get(name, 0) + len(bad)
+        examples = self.examples.setdefault(name, [])
+        for i in bad[:MAX_EXAMPLES - len(examples)].tolist():
+            value = " -> ".join(column[i] for column in values) if isinstance(values, tuple) else values[i]
+            examples.append((int(rows[i]), value))
+
+    def merge(self, other: 'Violations', row_base: int = 0):
+        for name, count in other.counts.items():
+            self.counts[name] = self.counts.get(name, 0) + count
+            examples = self.examples.setdefault(name, [])
+            examples.extend((row + row_base, value) for row, value in other.examples[name][:MAX_EXAMPLES - len(examples)])
+
+    def report(self) -> Dict:
+        # Номер строки файла: заголовок - строка 1; у проверок по всему файлу (номер -1) строки нет
+        return {
+            name: {
+                'count': self.counts[name],
+                'examples': [{'line': row + 2, 'value': value} if row >= 0 else {'value': value}
+                             for row, value in self.examples[name]],
+            }
+            for name in sorted(self.counts)
+        }
+
+
+@lru_cache(maxsize=None)
+def _bin_table(bin_table_path: str) -> BinTable:
+    return load_bin_table(bin_table_path)
+
+
+def bin_indices(table: BinTable, card_keys: np.ndarray) -> np.ndarray:
+    """
+    Номер префикса в таблице BIN для каждой карты (-1 - префикса нет в таблице)
+    """
+    prefixes = np.array([int(p) for p in table.prefixes], dtype=np.int64)
+    order = np.argsort(prefixes)
+    sorted_prefixes = prefixes[order]
+    keys = card_keys // BIN_DIVISOR
+    pos = np.minimum(np.searchsorted(sorted_prefixes, keys), len(sorted_prefixes) - 1)
+    return np.where(sorted_prefixes[pos] == keys, order[pos], -1)
+
+
+def char_matrix(values: List[str], width: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Строки фиксированной ширины -> матрица байтов (k, width) и маска строк нужной длины.
+    Символы вне ASCII заменяются на '?', поэтому не проходят проверку цифр.
+    """
+    # Значения склеиваются через NUL: если все NUL на своих местах, все строки нужной длины
+    data = np.frombuffer('\0'.join(values).encode('ascii', errors='replace') + b'\0', dtype=np.uint8)
+    if len(data) == (width + 1) * len(values):
+        matrix = data.reshape(-1, width + 1)
+        if not matrix[:, width].any():
+            return matrix[:, :width], np.ones(len(values), dtype=bool)
+    ok = np.fromiter(map(len, values), dtype=np.int64, count=len(values)) == width
+    selected = [v for v, good in zip(values, ok.tolist()) if good]
+    data = np.frombuffer(''.join(selected).encode('ascii', errors='replace'), dtype=np.uint8)
+    return data.reshape(-1, width), ok
+
+
+def parse_digit_field(values: List[str], layout: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Поле по шаблону (d - цифра, остальные символы - как есть), например "ddd-ddd-ddd dd".
+    Возвращает цифры (n, число d) и маску строк, совпавших с шаблоном.
+    """
+    matrix, ok = char_matrix(values, len(layout))
+    pattern = np.frombuffer(layout.encode('ascii'), dtype=np.uint8)
+    digit_cols = pattern == ord('d')
+    digits = matrix[:, digit_cols].astype(np.int64) - ord('0')
+    good = ((digits >= 0) & (digits <= 9)).all(axis=1) & (matrix[:, ~digit_cols] == pattern[~digit_cols]).all(axis=1)
+    result = np.zeros((len(values), int(digit_cols.sum())), dtype=np.int64)
+    result[ok] = digits
+    valid = ok.copy()
+    valid[ok] = good
+    return result, valid
+
+
+def digits_value(digits: np.ndarray) -> np.ndarray:
+    powers = 10 ** np.arange(digits.shape[1] - 1, -1, -1, dtype=np.int64)
+    return digits @ powers
+
+
+def list_lengths(values: List[str]) -> np.ndarray:
+    """
+    Количество элементов в колонке-списке ("a, b, c" -> 3, пустая строка -> 0)
+    """
+    separators = np.fromiter(map(str.count, values, repeat(LIST_SEPARATOR)), dtype=np.int64, count=len(values))
+    return separators + (np.fromiter(map(len, values), dtype=np.int64, count=len(values)) > 0)
+
+
+def patient_keys(passport: np.ndarray, snils: np.ndarray) -> np.ndarray:
+    """
+    Пара (паспорт, СНИЛС) одним числом: 10 цифр паспорта и 9 цифр СНИЛС помещаются в uint64
+    """
+    return passport.astype(np.uint64) * np.uint64(SNILS_SPACE) + snils.astype(np.uint64)
+
+
+def parse_minutes_column(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Даты "YYYY-MM-DDTHH:MM" -> минуты от EPOCH и маска корректных значений
+    """
+    _, ok = parse_digit_field(values, 'dddd-dd-ddTdd:dd')
+    minutes = np.zeros(len(values), dtype=np.int64)
+    selected = values if ok.all() else [v for v, good in zip(values, ok.tolist()) if good]
+    try:
+        minutes[ok] = parse_minutes_batch(selected)
+        return minutes, ok
+    except ValueError:
+        pass
+    # Несуществующие даты (например, 2025-02-30) - разбор по одной
+    for i in np.flatnonzero(ok).tolist():
+        try:
+            minutes[i] = parse_minutes_batch([values[i]])[0]
+        except ValueError:
+            ok[i] = False
+    return minutes, ok
+
+
+def split_rows(text: str) -> Tuple[List[List[str]], List[int], List[str]]:
+    """
+    Текст диапазона -> колонки (списки значений), номера строк с неверным
+    количеством полей и сами эти строки. Строки без кавычек разбираются
+    прямым split, с кавычками - модулем csv.
+    """
+    terminator = '\r\n' if '\r\n' in text else '\n'
+    width = len(CSV_HEADERS)
+    lines = text.split(terminator)
+    if lines and lines[-1] == '':
+        lines.pop()
+    if '"' not in text:
+        # Один split на весь диапазон - только если в каждой строке ровно width - 1 разделителей:
+        # по общему числу полей короткая строка рядом с длинной неотличима от двух верных
+        if lines and set(map(methodcaller('count', ';'), lines)) == {width - 1}:
+            flat = ';'.join(lines).split(';')
+            return [flat[k::width] for k in range(width)], [], []
+        rows = [line.split(';') for line in lines]
+    else:
+        rows = list(csv.reader(lines, delimiter=';'))
+    bad = [i for i, row in enumerate(rows) if len(row) != width]
+    bad_set = set(bad)
+    good = [row for i, row in enumerate(rows) if i not in bad_set]
+    columns = [list(column) for column in zip(*good)] if good else [[] for _ in range(width)]
+    return columns, bad, [lines[i] for i in bad]
+
+
+def scan_range(path: str, start: int, end: int, bin_table_path: str = DEFAULT_BIN_TABLE_PATH) -> Dict:
+    """
+    Проверка строк в байтах [start, end) файла. Номера строк в результате -
+    от начала диапазона; основной процесс переводит их в номера строк файла.
+    """
+    with open(path, mode='rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode('utf-8', errors='replace')
+    columns, bad_lines, bad_values = split_rows(text)
+    rows_total = len(columns[0]) + len(bad_lines)
+    violations = Violations()
+    if bad_lines:
+        violations.add('field_count', np.ones(len(bad_lines), dtype=bool), np.array(bad_lines), bad_values)
+
+    # Номера строк с правильным количеством полей
+    good_rows = np.setdiff1d(np.arange(rows_total), np.array(bad_lines, dtype=np.int64), assume_unique=True)
+    n = len(good_rows)
+
+    # СНИЛС: "123456789 12" или "123-456-789 12"
+    snils_column = columns[COLUMNS['СНИЛС']]
+    snils_digits, plain_ok = parse_digit_field(snils_column, 'ddddddddd dd')
+    dashed_digits, dashed_ok = parse_digit_field(snils_column, 'ddd-ddd-ddd dd')
+    snils_digits[dashed_ok] = dashed_digits[dashed_ok]
+    snils_ok = plain_ok | dashed_ok
+    violations.add('snils_format', ~snils_ok, good_rows, snils_column)
+    snils_body = snils_digits[:, :9] @ SNILS_POWERS
+    snils_control = digits_value(snils_digits[:, 9:])
+    violations.add('snils_checksum', snils_ok & (snils_control_numbers_batch(snils_body) != snils_control),
+                   good_rows, snils_column)
+
+    # Паспорт: серия из 4 цифр и номер из 6 цифр
+    passport_column = columns[COLUMNS['Паспорт']]
+    passport_digits, passport_ok = parse_digit_field(passport_column, 'dddd dddddd')
+    violations.add('passport_format', ~passport_ok, good_rows, passport_column)
+    passport_key = digits_value(passport_digits)
+
+    # Карта: "dddd dddd dddd dddd", контрольная цифра Луна, BIN из таблицы
+    card_column = columns[COLUMNS['Карта_оплаты']]
+    card_digits, card_ok = parse_digit_field(card_column, 'dddd dddd dddd dddd')
+    violations.add('card_format', ~card_ok, good_rows, card_column)
+    doubled = card_digits[:, -2::-2] * 2
+    luhn = (card_digits[:, -1::-2].sum(axis=1) + (doubled - 9 * (doubled > 9)).sum(axis=1)) % 10
+    violations.add('card_luhn', card_ok & (luhn != 0), good_rows, card_column)
+    card_key = digits_value(card_digits)
+    table = _bin_table(bin_table_path)
+    card_bin = bin_indices(table, card_key)
+    violations.add('card_unknown_bin', card_ok & (card_bin < 0), good_rows, card_column)
+
+    # Даты: рабочие дни и часы расписания, анализы через 24-72 часа после визита
+    schedule = default_schedule()
+    specialist_column = columns[COLUMNS['Врач']]
+    visit_column = columns[COLUMNS['Дата_посещения']]
+    analysis_column = columns[COLUMNS['Дата_анализов']]
+    visit, visit_ok = parse_minutes_column(visit_column)
+    analysis, analysis_ok = parse_minutes_column(analysis_column)
+    violations.add('visit_format', ~visit_ok, good_rows, visit_column)
+    violations.add('analysis_format', ~analysis_ok, good_rows, analysis_column)
+
+    visit_working = np.ones(n, dtype=bool)
+    specialists = np.array(specialist_column, dtype=object)
+    calendars = {}
+    for spec in set(specialist_column):
+        calendars.setdefault(id(schedule.visit_calendar(spec)), (schedule.visit_calendar(spec), []))[1].append(spec)
+    for calendar, specs in calendars.values():
+        mask = np.isin(specialists, specs) if len(calendars) > 1 else np.ones(n, dtype=bool)
+        visit_working[mask] = calendar.is_working_batch(visit[mask])
+    violations.add('visit_off_hours', visit_ok & ~visit_working, good_rows, visit_column)
+    violations.add('analysis_off_hours', analysis_ok & ~schedule.analysis_calendar.is_working_batch(analysis),
+                   good_rows, analysis_column)
+    delay = analysis - visit
+    dates_ok = visit_ok & analysis_ok
+    violations.add('analysis_delay', dates_ok & ((delay < schedule.min_hours * 60) | (delay > schedule.max_hours * 60)),
+                   good_rows, (visit_column, analysis_column))
+
+    # Стоимость - целое число рублей
+    cost_column = columns[COLUMNS['Стоимость']]
+    cost_ok = np.fromiter(map(str.isdigit, cost_column), dtype=bool, count=n)
+    violations.add('cost_format', ~cost_ok, good_rows, cost_column)
+    cost = np.zeros(n, dtype=np.int64)
+    cost[cost_ok] = np.array([value for value, good in zip(cost_column, cost_ok.tolist()) if good],
+                             dtype=np.int64) if cost_ok.any() else []
+
+    symptoms_count = list_lengths(columns[COLUMNS['Симптомы']])
+    analyses_count = list_lengths(columns[COLUMNS['Анализы']])
+
+    visit_day = visit[dates_ok] // MINUTES_PER_DAY
+    histograms = {
+        'specialist': Counter(specialist_column),
+        'symptoms_per_row': np.bincount(symptoms_count, minlength=1),
+        'analyses_per_row': np.bincount(analyses_count, minlength=1),
+        'cost': np.histogram(cost[cost_ok], bins=COST_BINS + [np.iinfo(np.int64).max])[0],
+        # Месяцы от 1970-01: остаток от деления на 12 - номер месяца с нуля
+        'visit_month': np.bincount((np.datetime64(EPOCH.date()) + visit_day).astype('datetime64[M]').astype(np.int64) % 12,
+                                   minlength=12),
+        'visit_weekday': np.bincount((visit_day + EPOCH.weekday()) % 7, minlength=7),
+        'visit_hour': np.bincount(visit[dates_ok] % MINUTES_PER_DAY // 60, minlength=24),
+        'analysis_delay_hours': np.bincount(np.clip(delay[dates_ok] // 60, 0, MAX_DELAY_HOURS),
+                                            minlength=MAX_DELAY_HOURS + 1),
+        'card_bin': np.bincount(card_bin[card_bin >= 0], minlength=len(table)),
+    }
+
+    # Ключи для проверок по всему файлу
+    patient_ok = snils_ok & passport_ok
+    visits_ok = patient_ok & dates_ok
+    cards_ok = card_ok & (card_bin >= 0)
+    card_values, card_counts = np.unique(card_key[cards_ok], return_counts=True)
+    return {
+        'rows': rows_total,
+        'violations': violations,
+        'histograms': histograms,
+        'cost_sum': int(cost[cost_ok].sum()),
+        'patients': np.unique(patient_keys(passport_key[patient_ok], snils_body[patient_ok])),
+        'visits': (snils_body[visits_ok], visit[visits_ok], analysis[visits_ok], good_rows[visits_ok]),
+        'cards': (card_values, card_counts),
+    }
+
+
+def byte_ranges(path: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> List[Tuple[int, int]]:
+    """
+    Диапазоны данных (после заголовка) по chunk_bytes байт, выровненные по концам строк
+    """
+    with open(path, mode='rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header_end = mm.find(b'\n')
+            start = size if header_end < 0 else header_end + 1
+            ranges = []
+            while start < size:
+                end = mm.find(b'\n', min(size, start + chunk_bytes) - 1)
+                end = size if end < 0 else end + 1
+                ranges.append((start, end))
+                start = end
+    return ranges
+
+
+def _sum_histograms(total: Dict, part: Dict):
+    for name, value in part.items():
+        if name not in total:
+            total[name] = value.copy()
+        elif isinstance(value, Counter):
+            total[name].update(value)
+        else:
+            size = max(len(total[name]), len(value))
+            total[name] = np.pad(total[name], (0, size - len(total[name]))) + np.pad(value, (0, size - len(value)))
+
+
+def check_patients(keys: np.ndarray, violations: Violations):
+    """
+    Паспорт и СНИЛС привязаны к одному клиенту: у паспорта один СНИЛС и наоборот.
+    keys - пары patient_keys, уже без повторов внутри каждого диапазона.
+    """
+    keys = np.unique(keys)
+    passport, snils = np.divmod(keys, np.uint64(SNILS_SPACE))
+    formats = (('passport_shared', passport, lambda v: f"{v // 10 ** 6:04d} {v % 10 ** 6:06d}"),
+               ('snils_shared', snils, lambda v: f"{v:09d}"))
+    for name, column, label in formats:
+        values, counts = np.unique(column, return_counts=True)
+        shared = values[counts > 1]
+        if len(shared):
+            violations.counts[name] = int(len(shared))
+            violations.examples[name] = [(-1, label(v)) for v in shared[:MAX_EXAMPLES].tolist()]
+
+
+def check_revisits(visits: List[tuple], violations: Violations):
+    """
+    Повторный визит пациента - не раньше чем через 24 часа после предыдущих анализов
+    """
+    patient = np.concatenate([v[0] for v in visits])
+    visit = np.concatenate([v[1] for v in visits])
+    analysis = np.concatenate([v[2] for v in visits])
+    row = np.concatenate([v[3] for v in visits])
+    order = np.lexsort((visit, patient))
+    patient, visit, analysis, row = patient[order], visit[order], analysis[order], row[order]
+    same = patient[1:] == patient[:-1]
+    early = same & (visit[1:] < analysis[:-1] + REVISIT_GAP_MINUTES)
+    if early.any():
+        bad = np.flatnonzero(early)
+        violations.counts['revisit_gap'] = int(len(bad))
+        violations.examples['revisit_gap'] = [(int(row[i + 1]), f"СНИЛС {patient[i + 1]:09d}")
+                                              for i in bad[:MAX_EXAMPLES].tolist()]
+    return np.unique(patient, return_counts=True)[1]
+
+
+def weight_distribution(table, histogram: np.ndarray, distinct: np.ndarray,
+                        bank_weights: Dict[str, float], pay_system_weights: Dict[str, float]) -> Dict:
+    """
+    Доли банков и платёжных систем: по строкам, по различным картам и ожидаемые по весам.
+    Хи-квадрат считается по различным картам - каждая новая карта разыгрывается независимо.
+    """
+    expected = np.array(table.joint_weights(bank_weights, pay_system_weights), dtype=np.float64)
+    expected = expected / expected.sum() if expected.sum() > 0 else expected
+    report = {}
+    for name, names, index in (('bank', table.banks, table.bank_of), ('pay_system', table.pay_systems, table.pay_system_of)):
+        rows = np.bincount(index, weights=histogram, minlength=len(names))
+        cards = np.bincount(index, weights=distinct, minlength=len(names))
+        share = np.bincount(index, weights=expected, minlength=len(names))
+        total_rows, total_cards = rows.sum(), cards.sum()
+        observed = cards / total_cards if total_cards else cards
+        nonzero = share > 0
+        chi2 = float((((cards - share * total_cards) ** 2)[nonzero] / (share * total_cards)[nonzero]).sum()) \
+            if total_cards else 0.0
+        report[name] = {
+            'categories': {
+                label: {
+                    'rows': int(rows[i]),
+                    'row_share': round(float(rows[i] / total_rows), 6) if total_rows else 0.0,
+                    'card_share': round(float(observed[i]), 6),
+                    'expected_share': round(float(share[i]), 6),
+                }
+                for i, label in enumerate(names)
+            },
+            'max_abs_deviation': round(float(np.abs(observed - share).max()), 6) if total_cards else 0.0,
+            'chi2': round(chi2, 3),
+            'dof': int(nonzero.sum()) - 1,
+            'unexpected_cards': int(cards[~nonzero].sum()),
+        }
+    return report
+
+
+def validate(path: str, workers: int = None, chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+             bank_weights: Dict[str, float] = None, pay_system_weights: Dict[str, float] = None,
+             bin_table_path: str = DEFAULT_BIN_TABLE_PATH) -> Dict:
+    """
+    Проверка датасета path; возвращает отчёт (нарушения, гистограммы, доли банков и систем)
+    """
+    if bank_weights is None:
+        bank_weights = {b: 1 for b in bank_names}
+    if pay_system_weights is None:
+        pay_system_weights = {ps: 1 for ps in painment_system_names}
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    started = time.perf_counter()
+
+    with open(path, mode='rb') as file:
+        header = file.readline().decode('utf-8-sig').rstrip('\r\n').split(';')
+    ranges = byte_ranges(path, chunk_bytes)
+
+    if workers > 1 and len(ranges) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(scan_range, path, start, end, bin_table_path) for start, end in ranges]
+            parts = [future.result() for future in futures]
+    else:
+        parts = [scan_range(path, start, end, bin_table_path) for start, end in ranges]
+
+    violations = Violations()
+    if header != CSV_HEADERS:
+        violations.counts['header'] = 1
+        violations.examples['header'] = [(-1, ';'.join(header))]
+    histograms = {}
+    rows = 0
+    cost_sum = 0
+    patients = []
+    visits = []
+    card_values = []
+    card_counts = []
+    for part in parts:
+        violations.merge(part['violations'], rows)
+        _sum_histograms(histograms, part['histograms'])
+        cost_sum += part['cost_sum']
+        patients.append(part['patients'])
+        patient, visit, analysis, row = part['visits']
+        visits.append((patient, visit, analysis, row + rows))
+        card_values.append(part['cards'][0])
+        card_counts.append(part['cards'][1])
+        rows += part['rows']
+
+    check_patients(np.concatenate(patients) if patients else np.empty(0, dtype=np.uint64), violations)
+    visits_per_patient = check_revisits(visits, violations) if visits else np.empty(0, dtype=np.int64)
+
+    # Оплаты одной картой по всему файлу
+    cards = np.concatenate(card_values) if card_values else np.empty(0, dtype=np.int64)
+    uses = np.concatenate(card_counts) if card_counts else np.empty(0, dtype=np.int64)
+    cards, inverse = np.unique(cards, return_inverse=True)
+    uses = np.bincount(inverse, weights=uses, minlength=len(cards)).astype(np.int64)
+    overused = uses > MAX_CARD_USES
+    if overused.any():
+        violations.counts['card_overuse'] = int(overused.sum())
+        violations.examples['card_overuse'] = [
+            (-1, f"{card:016d} x{count}") for card, count in zip(cards[overused][:MAX_EXAMPLES].tolist(),
+                                                                 uses[overused][:MAX_EXAMPLES].tolist())
+        ]
+
+    table = _bin_table(bin_table_path)
+    distinct = np.bincount(bin_indices(table, cards), minlength=len(table))
+    card_bin = histograms.pop('card_bin', np.zeros(len(table), dtype=np.int64))
+    specialist = histograms.pop('specialist', Counter())
+
+    def as_dict(values: np.ndarray, labels=None) -> Dict:
+        labels = labels if labels is not None else range(len(values))
+        return {str(label): int(count) for label, count in zip(labels, values.tolist())}
+
+    cost_labels = [f"{lo}-{hi - 1}" for lo, hi in zip(COST_BINS, COST_BINS[1:])] + [f"{COST_BINS[-1]}+"]
+    report = {
+        'path': os.path.abspath(path),
+        'bytes': os.path.getsize(path),
+        'rows': rows,
+        'seconds': None,
+        'workers': workers,
+        'ranges': len(ranges),
+        'valid': not violations.counts,
+        'violations': violations.report(),
+        'histograms': {
+            'specialist': dict(specialist.most_common()),
+            'symptoms_per_row': as_dict(histograms.get('symptoms_per_row', np.zeros(1, np.int64))),
+            'analyses_per_row': as_dict(histograms.get('analyses_per_row', np.zeros(1, np.int64))),
+            'cost_rub': as_dict(histograms.get('cost', np.zeros(len(cost_labels), np.int64)), cost_labels),
+            'visit_month': as_dict(histograms.get('visit_month', np.zeros(12, np.int64)), range(1, 13)),
+            'visit_weekday': as_dict(histograms.get('visit_weekday', np.zeros(7, np.int64))),
+            'visit_hour': as_dict(histograms.get('visit_hour', np.zeros(24, np.int64))),
+            'analysis_delay_hours': as_dict(histograms.get('analysis_delay_hours', np.zeros(1, np.int64))),
+            'visits_per_patient': as_dict(np.bincount(visits_per_patient, minlength=1)),
+            'card_uses': as_dict(np.bincount(uses, minlength=1)),
+        },
+        'cost_mean_rub': round(cost_sum / rows, 2) if rows else 0.0,
+        'patients': int(len(visits_per_patient)),
+        'cards': int(len(cards)),
+        'distributions': weight_distribution(table, card_bin, distinct, bank_weights, pay_system_weights),
+    }
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def format_report(report: Dict) -> str:
+    lines = [f"Строк: {report['rows']}, пациентов: {report['patients']}, карт: {report['cards']}, "
+             f"время: {report['seconds']:.2f} с ({report['bytes'] / 1e6 / max(report['seconds'], 1e-9):.0f} МБ/с)"]
+    if report['valid']:
+        lines.append("Нарушений не найдено")
+    for name, item in report['violations'].items():
+        example = item['examples'][0] if item['examples'] else None
+        if example is None:
+            where = ""
+        elif 'line' in example:
+            where = f" (например, строка {example['line']}: {example['value']})"
+        else:
+            where = f" (например, {example['value']})"
+        lines.append(f"{name}: {item['count']}{where}")
+    for name, distribution in report['distributions'].items():
+        lines.append(f"{name}: наибольшее отклонение доли {distribution['max_abs_deviation']:.4f}, "
+                     f"хи-квадрат {distribution['chi2']:.1f} (степеней свободы: {distribution['dof']})")
+    return "\n".join(lines)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Проверка сгенерированного датасета на ограничения README")
+    parser.add_argument('path', nargs='?', default='output/medical_dataset.csv', help="файл датасета (csv без сжатия)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="количество процессов (по умолчанию - все ядра)")
+    parser.add_argument('--chunk-mb', type=int, default=DEFAULT_CHUNK_BYTES >> 20, help="МБ файла на одну задачу")
+    parser.add_argument('--bank-weight', action='append', metavar='БАНК=ВЕС', help="вес банка, как у cli.py")
+    parser.add_argument('--pay-system-weight', action='append', metavar='СИСТЕМА=ВЕС',
+                        help="вес платёжной системы, как у cli.py")
+    parser.add_argument('--bin-table', default=DEFAULT_BIN_TABLE_PATH, help="таблица BIN карт")
+    parser.add_argument('-o', '--output', default=None, help="файл отчёта JSON (по умолчанию <датасет>.report.json)")
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if (args.workers is not None and args.workers < 1) or args.chunk_mb < 1:
+        parser.error("workers и chunk-mb должны быть положительными")
+    try:
+        bank_weights = parse_weights(args.bank_weight, bank_names, '--bank-weight')
+        pay_system_weights = parse_weights(args.pay_system_weight, painment_system_names, '--pay-system-weight')
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    report = validate(args.path, args.workers, args.chunk_mb << 20, bank_weights, pay_system_weights, args.bin_table)
+    output = args.output or args.path + '.report.json'
+    with open(output, mode='w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(format_report(report))
+    print(f"Отчёт сохранён в {output}")
+    return 0 if report['valid'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+"""
+Работа со временем визитов и анализов в целых минутах.
+
+Все моменты времени хранятся как количество минут от EPOCH
+(2025-01-01T00:00). Строки ISO получаются только при выводе через
+предвычисленные таблицы дней и минут суток, без strptime/strftime.
+
+Рабочий календарь (WorkCalendar) - отсортированный массив всех
+допустимых 5-минутных слотов с учётом выходных, праздников и часов
+работы. Визиты и анализы выбираются по индексу в этом массиве
+и двоичным поиском, без циклов с отбраковкой.
+"""
+import random
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import List, Tuple, Dict, Iterable
+
+import numpy as np
+
+EPOCH = datetime(2025, 1, 1)
+MINUTES_PER_DAY = 1440
+DAYS_IN_YEAR = 365  # 2025-01-01 .. 2025-12-31
+
+# Таблицы покрывают два года от EPOCH - с запасом на анализы после 31 декабря
+LOOKUP_DAYS = 2 * DAYS_IN_YEAR
+
+DAY_STRINGS = [(EPOCH + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(LOOKUP_DAYS)]
+TIME_STRINGS = [f"T{m // 60:02d}:{m % 60:02d}" for m in range(MINUTES_PER_DAY)]
+DAY_INDEX = {day: d for d, day in enumerate(DAY_STRINGS)}
+
+SLOT_MINUTES = 5
+
+# Суббота и воскресенье (date.weekday())
+DEFAULT_WEEKENDS = (5, 6)
+
+# Нерабочие праздничные дни 2025 года, выпадающие на будни (с учётом переносов)
+RU_HOLIDAYS_2025 = (
+    '2025-01-01', '2025-01-02', '2025-01-03', '2025-01-06', '2025-01-07', '2025-01-08',
+    '2025-05-01', '2025-05-02', '2025-05-08', '2025-05-09',
+    '2025-06-12', '2025-06-13',
+    '2025-11-03', '2025-11-04',
+    '2025-12-31',
+)
+
+# Рабочие субботы 2025 года (перенос выходного)
+RU_WORKING_WEEKENDS_2025 = ('2025-11-01',)
+
+DEFAULT_VISIT_HOURS = ("09:00", "21:00")
+DEFAULT_ANALYSIS_HOURS = ("09:00", "12:00")
+
+_DAY_ARRAY = np.array(DAY_STRINGS, dtype=object)
+_TIME_ARRAY = np.array(TIME_STRINGS, dtype=object)
+_EPOCH_MINUTE = np.datetime64(EPOCH, 'm')
+
+
+@lru_cache(maxsize=None)
+def parse_hhmm(value: str) -> int:
+    """
+    "09:00" -> 540 (минуты от начала суток)
+    """
+    hours, minutes = map(int, value.split(':'))
+    return hours * 60 + minutes
+
+
+def format_minutes(minutes: int) -> str:
+    """
+    Минуты от EPOCH -> "YYYY-MM-DDTHH:MM"
+    """
+    day, minute = divmod(minutes, MINUTES_PER_DAY)
+    if 0 <= day < LOOKUP_DAYS:
+        return DAY_STRINGS[day] + TIME_STRINGS[minute]
+    return (EPOCH + timedelta(minutes=minutes)).strftime("%Y-%m-%dT%H:%M")
+
+
+def format_minutes_batch(minutes: np.ndarray) -> List[str]:
+    """
+    Векторное форматирование массива минут от EPOCH
+    """
+    minutes = np.asarray(minutes, dtype=np.int64)
+    days = minutes // MINUTES_PER_DAY
+    if minutes.size and (days.min() < 0 or days.max() >= LOOKUP_DAYS):
+        return [format_minutes(m) for m in minutes.tolist()]
+    return (_DAY_ARRAY[days] + _TIME_ARRAY[minutes % MINUTES_PER_DAY]).tolist()
+
+
+def parse_minutes(value: str) -> int:
+    """
+    "YYYY-MM-DDTHH:MM" -> минуты от EPOCH
+    """
+    day = DAY_INDEX.get(value[:10])
+    if day is not None and len(value) == 16:
+        return day * MINUTES_PER_DAY + int(value[11:13]) * 60 + int(value[14:16])
+    delta = datetime.strptime(value, "%Y-%m-%dT%H:%M") - EPOCH
+    return int(delta.total_seconds()) // 60
+
+
+def parse_minutes_batch(values: List[str]) -> np.ndarray:
+    """
+    Векторная версия parse_minutes для строк "YYYY-MM-DDTHH:MM".
+    Некорректная строка - ValueError (разбор всего массива в numpy).
+    """
+    return (np.array(values, dtype='datetime64[m]') - _EPOCH_MINUTE).astype(np.int64)
+
+
+class WorkCalendar:
+    """
+    Все рабочие слоты календаря: минуты от EPOCH, кратные SLOT_MINUTES,
+    в рабочие дни с open_time до конца часа close_time: час закрытия входит
+    целиком, как randint(min_h, max_h) исходной версии (09:00-21:00 - слоты
+    09:00..21:55, анализы 09:00-12:00 - 09:00..12:55).
+    Календарь строится один раз на LOOKUP_DAYS дней вперёд от EPOCH.
+    """
+    __slots__ = ('open_time', 'close_time', 'slots', '_slots_list', 'year_end')
+
+    def __init__(
+        self,
+        open_time: str = DEFAULT_VISIT_HOURS[0],
+        close_time: str = DEFAULT_VISIT_HOURS[1],
+        weekends: Iterable[int] = DEFAULT_WEEKENDS,
+        holidays: Iterable[str] = RU_HOLIDAYS_2025,
+        working_weekends: Iterable[str] = RU_WORKING_WEEKENDS_2025,
+        days: int = LOOKUP_DAYS
+    ):
+        weekends = set(weekends)
+        holidays = {date.fromisoformat(d) for d in holidays}
+        working_weekends = {date.fromisoformat(d) for d in working_weekends}
+        open_minute = parse_hhmm(open_time)
+        close_minute = parse_hhmm(close_time)
+        if close_minute < open_minute:
+            raise ValueError(f"Некорректные часы работы: {open_time}-{close_time}")
+
+        # Последний рабочий час - час close_time включительно
+        day_end = min(MINUTES_PER_DAY, (close_minute // 60 + 1) * 60)
+        day_slots = np.arange(open_minute, day_end, SLOT_MINUTES, dtype=np.int64)
+        working_days = []
+        for d in range(days):
+            current = EPOCH.date() + timedelta(days=d)
+            if current in holidays:
+                continue
+            if current.weekday() in weekends and current not in working_weekends:
+                continue
+            working_days.append(d)
+        if not working_days:
+            raise ValueError("В календаре нет ни одного рабочего дня")
+
+        self.open_time = open_time
+        self.close_time = close_time
+        self.slots = (np.array(working_days, dtype=np.int64)[:, None] * MINUTES_PER_DAY + day_slots).ravel()
+        self._slots_list = self.slots.tolist()
+        # Визиты разыгрываются только в пределах 2025 года
+        self.year_end = bisect_left(self._slots_list, DAYS_IN_YEAR * MINUTES_PER_DAY)
+
+    def __len__(self) -> int:
+        return len(self._slots_list)
+
+    def is_working(self, minute: int) -> bool:
+        i = bisect_left(self._slots_list, minute)
+        return i < len(self._slots_list) and self._slots_list[i] == minute
+
+    def is_working_batch(self, minutes: np.ndarray) -> np.ndarray:
+        """
+        Векторная версия is_working
+        """
+        minutes = np.asarray(minutes, dtype=np.int64)
+        i = np.minimum(np.searchsorted(self.slots, minutes), len(self.slots) - 1)
+        return self.slots[i] == minutes
+
+    def draw_visit(self, rng=random) -> int:
+        """
+        Случайный рабочий слот 2025 года
+        """
+        return self._slots_list[int(rng.random() * self.year_end)]
+
+    def draw_between(self, lo: int, hi: int, rng=random) -> int:
+        """
+        Случайный рабочий слот в отрезке [lo, hi].
+        Если в отрезке нет рабочих слотов (длинные праздники) - ValueError:
+        слот за пределами отрезка нарушил бы окно между визитом и анализами.
+        """
+        slots = self._slots_list
+        i = bisect_left(slots, lo)
+        j = bisect_right(slots, hi)
+        if j <= i:
+            raise ValueError(f"Нет рабочих слотов между {format_minutes(lo)} и {format_minutes(hi)}")
+        return slots[i + int(rng.random() * (j - i))]
+
+    def draw_between_batch(self, lo: np.ndarray, hi: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """
+        Векторная версия draw_between для массивов границ
+        """
+        i = np.searchsorted(self.slots, lo, side='left')
+        j = np.searchsorted(self.slots, hi, side='right')
+        width = j - i
+        if width.size and width.min() <= 0:
+            k = int(np.argmin(width))
+            raise ValueError(f"Нет рабочих слотов между {format_minutes(int(lo[k]))} и {format_minutes(int(hi[k]))}")
+        idx = i + (rng.random(size=len(i)) * width).astype(np.int64)
+        return self.slots[idx]
+
+
+@lru_cache(maxsize=None)
+def calendar_for(open_time: str, close_time: str) -> WorkCalendar:
+    """
+    Календарь со стандартными выходными и праздниками для заданных часов работы
+    """
+    return WorkCalendar(open_time, close_time)
+
+
+class Schedule:
+    """
+    Расписание поликлиники: часы приёма по специальностям и часы сдачи анализов.
+    Календари с одинаковыми часами работы строятся один раз и переиспользуются.
+    """
+
+    def __init__(
+        self,
+        visit_hours: Tuple[str, str] = DEFAULT_VISIT_HOURS,
+        analysis_hours: Tuple[str, str] = DEFAULT_ANALYSIS_HOURS,
+        specialist_hours: Dict[str, Tuple[str, str]] = None,
+        weekends: Iterable[int] = DEFAULT_WEEKENDS,
+        holidays: Iterable[str] = RU_HOLIDAYS_2025,
+        working_weekends: Iterable[str] = RU_WORKING_WEEKENDS_2025,
+        min_hours: int = 24,
+        max_hours: int = 72
+    ):
+        calendars = {}
+
+        def build(hours):
+            if hours not in calendars:
+                calendars[hours] = WorkCalendar(hours[0], hours[1], weekends, holidays, working_weekends)
+            return calendars[hours]
+
+        self.min_hours = min_hours
+        self.max_hours = max_hours
+        self.default_calendar = build(tuple(visit_hours))
+        self.analysis_calendar = build(tuple(analysis_hours))
+        self.specialist_calendars = {spec: build(tuple(hours)) for spec, hours in (specialist_hours or {}).items()}
+
+        # Допустимые слоты визита: только те, после которых в окне
+        # min_hours-max_hours есть хотя бы один слот анализа
+        self._visit_slots = {}
+        for calendar in calendars.values():
+            year_slots = calendar.slots[:calendar.year_end]
+            lo = np.searchsorted(self.analysis_calendar.slots, year_slots + min_hours * 60, side='left')
+            hi = np.searchsorted(self.analysis_calendar.slots, year_slots + max_hours * 60, side='right')
+            feasible = year_slots[hi > lo]
+            if len(feasible) == 0:
+                raise ValueError(f"Нет слотов приёма {calendar.open_time}-{calendar.close_time}, "
+                                 f"после которых успевают анализы")
+            self._visit_slots[id(calendar)] = (feasible, feasible.tolist())
+
+    def visit_calendar(self, specialist: str = None) -> WorkCalendar:
+        return self.specialist_calendars.get(specialist, self.default_calendar)
+
+    def visit_slots(self, specialist: str = None) -> List[int]:
+        """
+        Отсортированный список допустимых слотов визита для специальности
+        """
+        return self._visit_slots[id(self.visit_calendar(specialist))][1]
+
+    def visit_slot_array(self, specialist: str = None) -> np.ndarray:
+        """
+        Те же слоты визита массивом numpy (для векторного поиска)
+        """
+        return self._visit_slots[id(self.visit_calendar(specialist))][0]
+
+    def draw_visit_and_analysis(self, specialist: str = None, rng=random) -> Tuple[int, int]:
+        slots = self.visit_slots(specialist)
+        visit = slots[int(rng.random() * len(slots))]
+        analysis = self.analysis_calendar.draw_between(
+            visit + self.min_hours * 60, visit + self.max_hours * 60, rng
+        )
+        return visit, analysis
+
+    def draw_batch(self, specialist_idx: np.ndarray, specialists: List[str],
+                   rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Визиты и анализы для массива индексов специальностей.
+        Строки группируются по календарю приёма, внутри группы - один векторный выбор.
+        """
+        visit = np.empty(len(specialist_idx), dtype=np.int64)
+        if not self.specialist_calendars:
+            slots = self._visit_slots[id(self.default_calendar)][0]
+            visit[:] = slots[rng.integers(0, len(slots), size=len(specialist_idx))]
+        else:
+            calendar_of = [self.visit_calendar(spec) for spec in specialists]
+            for calendar in {id(c): c for c in calendar_of}.values():
+                members = [i for i, c in enumerate(calendar_of) if c is calendar]
+                mask = np.isin(specialist_idx, members)
+                slots = self._visit_slots[id(calendar)][0]
+                visit[mask] = slots[rng.integers(0, len(slots), size=int(mask.sum()))]
+
+        analysis = self.analysis_calendar.draw_between_batch(
+            visit + self.min_hours * 60, visit + self.max_hours * 60, rng
+        )
+        return visit, analysis
+
+
+@lru_cache(maxsize=None)
+def schedule_for(open_time: str, close_time: str) -> Schedule:
+    """
+    Расписание со стандартными часами анализов для заданных часов приёма
+    """
+    return Schedule(visit_hours=(open_time, close_time))
+
+
+def draw_visit_minute(rng=random, min_time: str = DEFAULT_VISIT_HOURS[0], max_time: str = DEFAULT_VISIT_HOURS[1]) -> int:
+    """
+    Визит: рабочий слот 2025 года в часы приёма min_time-max_time,
+    после которого в окне 24-72 часа есть слот анализа (draw_analysis_minute
+    с параметрами по умолчанию не выходит за окно)
+    """
+    slots = schedule_for(min_time, max_time).visit_slots()
+    return slots[int(rng.random() * len(slots))]
+
+
+def draw_analysis_minute(visit: int, rng=random, min_hours: int = 24, max_hours: int = 72,
+                         min_work_time: str = DEFAULT_ANALYSIS_HOURS[0],
+                         max_work_time: str = DEFAULT_ANALYSIS_HOURS[1]) -> int:
+    """
+    Анализ: рабочий слот через min_hours-max_hours часов после визита.
+    ValueError, если в этом окне нет рабочих слотов анализа.
+    """
+    return calendar_for(min_work_time, max_work_time).draw_between(
+        visit + min_hours * 60, visit + max_hours * 60, rng
+    )
+
+
+@lru_cache(maxsize=None)
+def default_schedule() -> Schedule:
+    return Schedule()
+
+
+def draw_visit_and_analysis(rng=random) -> Tuple[int, int]:
+    """
+    Пара (визит, анализ) в минутах от EPOCH по расписанию по умолчанию
+    """
+    return default_schedule().draw_visit_and_analysis(None, rng)
@@ -0,0 +1,203 @@
+"""
+Быстрая запись CSV крупными блоками.
+
+Строки датасета состоят из строковых полей, в которых обычно нет
+кавычек, переводов строк и разделителя. Для такого блока строки
+склеиваются напрямую (';'.join / '\r\n'.join), кодируются одним вызовом
+и пишутся в файл одним большим куском. Если в блоке нашёлся хотя бы один
+специальный символ, блок целиком пишется через csv.writer с QUOTE_MINIMAL,
+поэтому результат всегда читается стандартным модулем csv.
+Поддерживается сжатие gzip, bz2 и xz из стандартной библиотеки.
+"""
+import bz2
+import codecs
+import csv
+import gzip
+import io
+import lzma
+import os
+from typing import List, Iterable, BinaryIO
+
+from main import CSV_HEADERS
+
+# Размер буфера файла по умолчанию
+DEFAULT_WRITE_BUFFER = 8 << 20
+
+# Блок большего размера кодируется частями по столько строк:
+# так промежуточные строки остаются в кэше процессора
+ENCODE_BLOCK_ROWS = 2048
+
+# Окончание строки такое же, как у csv.writer по умолчанию
+LINE_TERMINATOR = '\r\n'
+
+COMPRESSIONS = {
+    'gzip': ('.gz', '.gzip'),
+    'bz2': ('.bz2',),
+    'xz': ('.xz', '.lzma'),
+}
+
+# Уровни сжатия по умолчанию - самые быстрые. Даже с ними сжатие ограничивает
+# скорость записи (на одном ядре gzip - десятки МБ/с, bz2 и xz - единицы МБ/с),
+# поэтому для максимальной скорости CSV пишется без сжатия
+DEFAULT_COMPRESSLEVEL = {'gzip': 1, 'bz2': 1, 'xz': 1}
+
+
+def infer_compression(path: str) -> str:
+    """
+    Сжатие по расширению файла; None - без сжатия
+    """
+    lowered = path.lower()
+    for name, extensions in COMPRESSIONS.items():
+        if lowered.endswith(extensions):
+            return name
+    return None
+
+
+def open_output(path: str, compression: str = 'infer', buffer_size: int = DEFAULT_WRITE_BUFFER,
+                compresslevel: int = None, append: bool = False) -> BinaryIO:
+    """
+    Открывает файл для двоичной записи с буфером buffer_size байт.
+    compression: 'infer' (по расширению), None, 'gzip', 'bz2' или 'xz'.
+    append: дописывать в конец файла (сжатые данные - отдельным потоком,
+    который gzip, bz2 и xz читают как продолжение файла).
+    """
+    if compression == 'infer':
+        compression = infer_compression(path)
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(f"Неизвестный формат сжатия: {compression}")
+
+    raw = open(path, mode='ab' if append else 'wb', buffering=buffer_size)
+    if compression is None:
+        return raw
+    if compresslevel is None:
+        compresslevel = DEFAULT_COMPRESSLEVEL[compression]
+    # Сжимающий поток пишет в буферизованный файл и закрывается вместе с ним
+    if compression == 'gzip':
+        return _Closing(gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=compresslevel, mtime=0), raw)
+    if compression == 'bz2':
+        return _Closing(bz2.BZ2File(raw, mode='wb', compresslevel=compresslevel), raw)
+    return _Closing(lzma.LZMAFile(raw, mode='wb', preset=compresslevel), raw)
+
+
+class _Closing(io.RawIOBase):
+    """
+    Обёртка над сжимающим потоком: при закрытии закрывает и исходный файл
+    """
+
+    def __init__(self, stream, raw: BinaryIO):
+        super().__init__()
+        self.stream = stream
+        self.raw = raw
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        return self.stream.write(data)
+
+    def flush(self):
+        if self.closed:
+            return
+        self.stream.flush()
+        self.raw.flush()
+
+    def close(self):
+        if not self.closed:
+            super().close()
+            self.stream.close()
+            self.raw.close()
+
+
+class BulkCsvWriter:
+    """
+    Запись блоков строк в двоичный файл: быстрый путь - прямое склеивание полей,
+    запасной - csv.writer для блоков со специальными символами.
+    """
+    __slots__ = ('file', 'delimiter', 'encoding', 'rows_written', 'bytes_written',
+                 'fast_blocks', 'fallback_blocks')
+
+    def __init__(self, file: BinaryIO, delimiter: str = ';', encoding: str = 'utf-8'):
+        self.file = file
+        self.delimiter = delimiter
+        self.encoding = encoding
+        self.rows_written = 0
+        self.bytes_written = 0
+        self.fast_blocks = 0
+        self.fallback_blocks = 0
+
+    def _encode_fast(self, rows: List[List[str]]) -> bytes:
+        """
+        Блок, склеенный напрямую, или None, если нужно экранирование
+        """
+        delimiter = self.delimiter
+        try:
+            text = LINE_TERMINATOR.join([delimiter.join(row) for row in rows])
+        except TypeError:
+            # Нестроковые поля - пусть их преобразует csv.writer
+            return None
+        # Кавычки, переводы строк и разделители внутри полей выдают себя
+        # лишними символами по сравнению с количеством строк и полей
+        lengths = list(map(len, rows))
+        if ('"' in text or text.count('\n') != len(rows) - 1 or text.count('\r') != len(rows) - 1
+                or text.count(delimiter) != sum(lengths) - len(rows)):
+            return None
+        # Строку из одного пустого поля csv.writer записывает как ""
+        if min(lengths) == 1 and any(len(row) == 1 and not row[0] for row in rows):
+            return None
+        return (text + LINE_TERMINATOR).encode(self.encoding)
+
+    def _encode_csv(self, rows: List[List[str]]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer, delimiter=self.delimiter, quoting=csv.QUOTE_MINIMAL,
+                   lineterminator=LINE_TERMINATOR).writerows(rows)
+        return buffer.getvalue().encode(self.encoding)
+
+    def write_bytes(self, data: bytes):
+        self.file.write(data)
+        self.bytes_written += len(data)
+
+    def writerow(self, row: List[str]):
+        self.writerows([row])
+
+    def writerows(self, rows: List[List[str]]) -> int:
+        """
+        Пишет строки блоками по ENCODE_BLOCK_ROWS; возвращает количество строк
+        """
+        for start in range(0, len(rows), ENCODE_BLOCK_ROWS):
+            block = rows[start:start + ENCODE_BLOCK_ROWS]
+            data = self._encode_fast(block)
+            if data is None:
+                data = self._encode_csv(block)
+                self.fallback_blocks += 1
+            else:
+                self.fast_blocks += 1
+            self.write_bytes(data)
+        self.rows_written += len(rows)
+        return len(rows)
+
+
+def write_csv_fast(chunks: Iterable[List[List[str]]], path: str = 'output/medical_dataset.csv',
+                   on_chunk=None, headers: List[str] = CSV_HEADERS, bom: bool = True,
+                   buffer_size: int = DEFAULT_WRITE_BUFFER, compression: str = 'infer',
+                   compresslevel: int = None, append: bool = False) -> int:
+    """
+    Аналог write_csv_stream на BulkCsvWriter: каждый блок кодируется целиком
+    и пишется одним куском. bom=True - метка UTF-8 в начале, как у utf-8-sig.
+    append: дописывать строки в конец существующего файла (без метки и заголовка).
+    on_chunk(rows_written) вызывается после записи каждого блока.
+    Возвращает количество записанных строк (без заголовка).
+    """
+    append = append and os.path.isfile(path) and os.path.getsize(path) > 0
+    if append:
+        bom, headers = False, None
+    with open_output(path, compression, buffer_size, compresslevel, append) as file:
+        writer = BulkCsvWriter(file)
+        if bom:
+            writer.write_bytes(codecs.BOM_UTF8)
+        if headers:
+            writer.writerow(headers)
+        for chunk in chunks:
+            writer.writerows(chunk)
+            if on_chunk is not None:
+                on_chunk(writer.rows_written - (1 if headers else 0))
+        return writer.rows_written - (1 if headers else 0)